@@ -1,6 +1,9 @@
 from .simulators import *
+from .headless import HeadlessRenderer, RenderStats
 
 __all__ = ["ForwardKinematicsPreview",
            "InverseKinematicsFixedBody",
            "InverseKinematicsFixedLegs",
-           "Animator"]
\ No newline at end of file
+           "Animator",
+           "HeadlessRenderer",
+           "RenderStats"]
\ No newline at end of file
@@ -0,0 +1,181 @@
+import itertools
+import os
+import shutil
+import subprocess
+import time
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+from mpl_toolkits.mplot3d import Axes3D  # noqa: F401, registers the 3d projection.
+from typing import Callable, NamedTuple, Optional
+from kinematics import Hexapod
+import utils
+
+
+"""Offscreen rendering of precomputed trajectories. The figure is drawn straight onto an Agg canvas, without pyplot or
+any GUI backend, so it runs on machines without a display. The static part of the scene (panes, grid, axes) is rendered
+once, every frame goes through the blitted Hexapod.draw, which restores it and redraws the robot artists on top."""
+
+
+class RenderStats(NamedTuple):
+    frames: int
+    seconds: float
+    fps: float
+
+
+class HeadlessRenderer:
+
+    """ Offscreen figure of the given size in pixels. Build the robot on the ax of the renderer, then pass it to one of
+    the render methods together with a (frames, legs, 3) array of joint angles and, optionally, a (frames, 3) array of
+    body offsets (foot fixed, as in the Animator)."""
+
+    __slots__ = {"figure",
+                 "ax",
+                 "_canvas",
+                 "_depthshade"}
+
+    def __init__(self, width: int = 640, height: int = 480, dpi: int = 100, limits: float = 40,
+                 title: Optional[str] = None, depthshade: bool = False):
+
+        """ Depth shading of the joint markers dominates the cost of a frame, so it is off unless requested."""
+
+        self.figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        self._canvas = FigureCanvasAgg(self.figure)
+        self._depthshade = depthshade
+        self.ax = self.figure.add_subplot(111, projection="3d")
+
+        self.ax.set_xlim3d([-limits, limits])
+        self.ax.set_ylim3d([-limits, limits])
+        self.ax.set_zlim3d([-limits, limits])
+
+        if title:
+            self.ax.set_title(title)
+
+    @property
+    def size(self):
+
+        """ Width and height of the rendered frames in pixels."""
+
+        return self._canvas.get_width_height()
+
+    @utils.profiled
+    def render(self, robot: Hexapod, angles: np.ndarray, sink: Callable[[np.ndarray], None],
+               offsets: Optional[np.ndarray] = None, frames: Optional[int] = None) -> RenderStats:
+
+        """ Render frames and pass each of them to the sink as an (height, width, 4) RGBA uint8 array. The array is a
+        view of the canvas buffer, valid only until the sink returns. Frames defaults to the length of the trajectory,
+        a longer count loops over it, which suits periodic gait tables."""
+
+        angles = np.asarray(angles, dtype=float)
+        frames = angles.shape[0] if frames is None else frames
+
+        # The first draw creates the artists and switches the robot to blitting on this canvas.
+        robot.draw()
+
+        for artist in robot.artists:
+            if hasattr(artist, "set_depthshade"):
+                artist.set_depthshade(self._depthshade)
+
+        # Full draw of the static scene, captured by the robot as its background.
+        self._canvas.draw()
+        buffer = np.asarray(self._canvas.buffer_rgba())
+
+        start = time.perf_counter()
+
+        for frame in range(frames):
+
+            if offsets is not None:
+                robot.translate_core(offsets[frame % offsets.shape[0]])
+
+            robot.update_leg_positions(angles[frame % angles.shape[0]])
+            robot.draw()
+
+            sink(buffer)
+
+        seconds = time.perf_counter() - start
+
+        return RenderStats(frames, seconds, frames / seconds if seconds else float("inf"))
+
+    def render_array(self, robot: Hexapod, angles: np.ndarray, offsets: Optional[np.ndarray] = None,
+                     frames: Optional[int] = None) -> np.ndarray:
+
+        """ Render into a single (frames, height, width, 3) RGB uint8 array."""
+
+        frames = np.asarray(angles).shape[0] if frames is None else frames
+        width, height = self.size
+        video = np.empty((frames, height, width, 3), dtype=np.uint8)
+        index = iter(range(frames))
+
+        def store(buffer):
+            video[next(index)] = buffer[..., :3]
+
+        self.render(robot, angles, store, offsets, frames)
+
+        return video
+
+    def export_frames(self, robot: Hexapod, angles: np.ndarray, directory: str, offsets: Optional[np.ndarray] = None,
+                      frames: Optional[int] = None) -> RenderStats:
+
+        """ Render to numbered PNG files in the directory. The reported rate includes the PNG encoding."""
+
+        os.makedirs(directory, exist_ok=True)
+        index = itertools.count()
+
+        def save(buffer):
+            imsave(os.path.join(directory, f"frame_{next(index):06d}.png"), buffer)
+
+        return self.render(robot, angles, save, offsets, frames)
+
+    def export_video(self, robot: Hexapod, angles: np.ndarray, path: str, fps: float = 60,
+                     offsets: Optional[np.ndarray] = None, frames: Optional[int] = None,
+                     codec: str = "libx264") -> RenderStats:
+
+        """ Render to a video file by piping the raw frames into ffmpeg, which has to be on the PATH. The reported rate
+        includes the encoding, as far as ffmpeg keeps up with the pipe."""
+
+        ffmpeg = shutil.which("ffmpeg")
+
+        if ffmpeg is None:
+            raise RuntimeError("Exporting a video requires ffmpeg on the PATH, use export_frames instead.")
+
+        width, height = self.size
+
+        command = [ffmpeg, "-y", "-loglevel", "error",
+                   "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+                   "-an", "-vcodec", codec, "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", path]
+
+        with subprocess.Popen(command, stdin=subprocess.PIPE) as encoder:
+
+            def write(buffer):
+                encoder.stdin.write(buffer.data)
+
+            try:
+                stats = self.render(robot, angles, write, offsets, frames)
+            finally:
+                encoder.stdin.close()
+
+        if encoder.returncode:
+            raise RuntimeError(f"ffmpeg exited with code {encoder.returncode}.")
+
+        return stats
+
+
+if __name__ == '__main__':
+
+    import sys
+    from kinematics import GaitGenerator, RobotConfig
+
+    renderer = HeadlessRenderer(title="Tripod gait.")
+    geometry = RobotConfig.default().compile()
+
+    bot = geometry.build_robot(renderer.ax)
+    gait = GaitGenerator("tripod").compile(geometry.kinematics())
+    output = sys.argv[1] if len(sys.argv) > 1 else "frames"
+
+    if output.endswith((".mp4", ".mkv", ".avi")):
+        result = renderer.export_video(bot, gait.angles, output, frames=3 * gait.frames)
+    else:
+        result = renderer.export_frames(bot, gait.angles, output, frames=3 * gait.frames)
+
+    print(f"Rendered {result.frames} frames in {result.seconds:.2f} s, {result.fps:.1f} FPS.")
@@ -1,8 +1,11 @@
+import time
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider
+from typing import Optional
 from kinematics import Hexapod, Leg
 import numpy as np
 import kinematics as ik
+import utils
 
 class ForwardKinematicsPreview:
 
@@ -41,6 +44,7 @@ class ForwardKinematicsPreview:
         self.ax.set_ylim3d([-lim, lim])  # todo: Automate adjusting the limits, since set_aspect doesn't work on 3d axes.
         self.ax.set_zlim3d([-lim, lim])
 
+        self.robot.add_sliders(self.leg_ang, self.fem_ang, self.tib_ang)
         self.leg_ang.on_changed(self.update)
         self.fem_ang.on_changed(self.update)
         self.tib_ang.on_changed(self.update)
@@ -49,6 +53,7 @@ class ForwardKinematicsPreview:
 
         plt.show()
 
+    @utils.profiled
     def update(self, _):
 
         angles = [[(ang * 60 + self.leg_ang.val) / 180 * np.pi,
@@ -61,9 +66,12 @@ class ForwardKinematicsPreview:
 
 class InverseKinematicsFixedBody:
 
-    def __init__(self, ax: plt.Axes, robot: Hexapod):
+    def __init__(self, ax: plt.Axes, robot: Hexapod, cache: Optional[ik.OffsetCache] = None):
+
+        """ Slider positions are solved through the cache, a private one is created unless one is given."""
 
         self.bot = robot
+        self.cache = cache if cache is not None else ik.OffsetCache()
 
         ax.set_title("Inverse kinematics preview, fixed body.")
 
@@ -99,18 +107,15 @@ class InverseKinematicsFixedBody:
 
         self.bot.draw()
 
-        keys = self.bot.bodyparts["legs"].keys()
-        self.legs = [ik.LegKinematics(self.bot.bodyparts["legs"][key].femur_length,
-                                      self.bot.bodyparts["legs"][key].tibia_length) for key in keys]
-
-        for leg, key in zip(self.legs, keys):
-            leg.set_default_position(self.bot.bodyparts["legs"][key].joints)
+        self.legs = ik.HexapodKinematics.from_hexapod(self.bot)
 
+        self.bot.add_sliders(self.x_slider, self.y_slider, self.z_slider)
         self.x_slider.on_changed(self.update)
         self.y_slider.on_changed(self.update)
         self.z_slider.on_changed(self.update)
         plt.show()
 
+    @utils.profiled
     def update(self, _):
 
         x_offset = self.x_slider.val
@@ -119,22 +124,23 @@ class InverseKinematicsFixedBody:
 
         offsets = np.array([x_offset, y_offset, z_offset])
 
-        angles = [model.angles_from_rel_position(offsets, False, False) for model in self.legs]
-
-        if None not in [ang for result in angles for ang in result]:
+        angles, reachable = self.cache.angles_from_rel_position(self.legs, offsets, False)
 
+        if reachable.all():
             self.bot.update_leg_positions(angles)
-            self.bot.draw()
 
-        else:
-            pass
+        # Also when the robot stays put, the sliders are drawn with it.
+        self.bot.draw()
 
 
 class InverseKinematicsFixedLegs:
 
-    def __init__(self, ax: plt.Axes, robot: Hexapod):
+    def __init__(self, ax: plt.Axes, robot: Hexapod, cache: Optional[ik.OffsetCache] = None):
+
+        """ Slider positions are solved through the cache, a private one is created unless one is given."""
 
         self.bot = robot
+        self.cache = cache if cache is not None else ik.OffsetCache()
 
         ax.set_title("Inverse kinematics preview, fixed feet.")
 
@@ -170,44 +176,45 @@ class InverseKinematicsFixedLegs:
 
         self.bot.draw()
 
-        keys = self.bot.bodyparts["legs"].keys()
-        self.legs = [ik.LegKinematics(self.bot.bodyparts["legs"][key].femur_length,
-                                      self.bot.bodyparts["legs"][key].tibia_length) for key in keys]
-
-        for leg, key in zip(self.legs, keys):
-            leg.set_default_position(self.bot.bodyparts["legs"][key].joints)
+        self.legs = ik.HexapodKinematics.from_hexapod(self.bot)
 
+        self.bot.add_sliders(self.x_slider, self.y_slider, self.z_slider)
         self.x_slider.on_changed(self.update)
         self.y_slider.on_changed(self.update)
         self.z_slider.on_changed(self.update)
 
         plt.show()
 
+    @utils.profiled
     def update(self, _):
 
         x_offset = self.x_slider.val
         y_offset = self.y_slider.val
         z_offset = self.z_slider.val
 
-        offsets = np.array([x_offset, y_offset, z_offset])
-
-        angles = [model.angles_from_rel_position(offsets,
-                                                 True,
-                                                 False) for model in self.legs]
+        # The body moves by the offset the legs were solved for, so the feet stay where they are.
+        offsets = self.cache.quantize(np.array([x_offset, y_offset, z_offset]))
 
-        if None not in [ang for result in angles for ang in result]:
+        angles, reachable = self.cache.angles_from_rel_position(self.legs, offsets, True)
 
+        if reachable.all():
             self.bot.translate_core(offsets)
             self.bot.update_leg_positions(angles)
-            self.bot.draw()
 
-        else:
-            pass
+        # Also when the robot stays put, the sliders are drawn with it.
+        self.bot.draw()
 
 
 class Animator:
 
-    def __init__(self, ax: plt.Axes, robot: Hexapod):
+    def __init__(self, ax: plt.Axes, robot: Hexapod, gait: Optional[ik.GaitTable] = None):
+
+        """ Without a gait the body follows a circle above the fixed feet, solved frame by frame. With a precomputed
+        gait table the legs replay the gait cycle in real time. Gaits with unreachable frames are refused unless they were compiled
+        with clamp, their NaN angles would throw the legs out of the figure."""
+
+        if gait is not None and np.isnan(gait.angles).any():
+            raise ValueError("The gait has unreachable frames, shorten the steps or compile it with clamp.")
 
         self.bot = robot
 
@@ -220,38 +227,38 @@ class Animator:
 
         self.bot.draw()
 
-        keys = self.bot.bodyparts["legs"].keys()
-        self.legs = [ik.LegKinematics(self.bot.bodyparts["legs"][key].femur_length,
-                                      self.bot.bodyparts["legs"][key].tibia_length) for key in keys]
-
-        for leg, key in zip(self.legs, keys):
-            leg.set_default_position(self.bot.bodyparts["legs"][key].joints)
+        self.legs = ik.HexapodKinematics.from_hexapod(self.bot)
+        self.cache = ik.OffsetCache()  # The circular motion repeats the same offsets every cycle.
 
         plt.show()
 
         off = 0
         radius = 7
+        start = time.perf_counter()
 
         while True:
 
-            offsets = np.array([radius*np.cos(off), 0 , radius*np.sin(off)])
-
-            off += np.pi/20
+            frame_start = time.perf_counter()
 
-            angles = [model.angles_from_rel_position(np.array(offsets),
-                                                     True,
-                                                     False) for model in self.legs]
+            if gait is not None:
 
-            if None not in [ang for result in angles for ang in result]:
-
-                self.bot.translate_core(offsets)
-                self.bot.update_leg_positions(angles)
+                self.bot.update_leg_positions(gait.angles_at(frame_start - start))
                 self.bot.draw()
 
             else:
-                pass
 
-            plt.pause(1/60)
+                offsets = self.cache.quantize(np.array([radius*np.cos(off), 0 , radius*np.sin(off)]))
 
+                off += np.pi/20
 
+                angles, reachable = self.cache.angles_from_rel_position(self.legs, offsets, True)
 
+                if reachable.all():
+
+                    self.bot.translate_core(offsets)
+                    self.bot.update_leg_positions(angles)
+                    self.bot.draw()
+
+            utils.profiling.record("animators.simulators.Animator.frame", time.perf_counter() - frame_start)
+
+            plt.pause(1/60)
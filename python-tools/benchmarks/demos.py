@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import control
+import kinematics as ik
+
+
+"""End to end demos of the kinematics and control modules on the default robot of RobotConfig, each printing its
+throughput. They used to live in the __main__ blocks of the modules themselves.
+
+Run from the python-tools directory with: python -m benchmarks.demos <demo> [--seconds S] [--workers N]"""
+
+
+def _circle(times: np.ndarray, radius: float = 7) -> np.ndarray:
+
+    """ (..., 3) body offsets of a vertical circle, one turn per second."""
+
+    return np.stack([radius * np.cos(2 * np.pi * times), np.zeros_like(times), radius * np.sin(2 * np.pi * times)], -1)
+
+
+def chain(args: argparse.Namespace):
+
+    """ Damped least squares on four joint legs with a tarsus, in a default stance with the tarsus straight down."""
+
+    rng = np.random.default_rng(0)
+    mounts = np.radians([leg.mount for leg in ik.RobotConfig.default().legs])
+    legs = mounts.shape[0]
+
+    lengths = np.tile([20.0, 30.0, 15.0], (legs, 1))
+    default = np.stack((mounts, np.full(legs, np.pi / 4), np.full(legs, -np.pi / 2), np.full(legs, -np.pi / 4)), -1)
+    pitch = np.cumsum(default[:, 1:], axis=-1)
+    reach = np.cumsum(lengths * np.cos(pitch), axis=-1)
+    joints = np.zeros((legs, 4, 3))
+    joints[:, 1:, 0] = reach * np.cos(mounts)[:, np.newaxis]
+    joints[:, 1:, 1] = reach * np.sin(mounts)[:, np.newaxis]
+    joints[:, 1:, 2] = np.cumsum(lengths * np.sin(pitch), axis=-1)
+
+    model = ik.ChainKinematics(lengths)
+    model.set_default_position(joints)
+    offsets = rng.uniform(-5, 5, (10000, 1, 3))
+
+    start = time.perf_counter()
+    angles, reachable = model.angles_from_rel_position(offsets, True)
+    elapsed = time.perf_counter() - start
+    targets = model.targets_from_offsets(offsets, True)
+    error = np.linalg.norm(ik.chain_feet_from_angles(angles, lengths) - targets, axis=-1)
+
+    print(f"4 joint legs, {reachable.size} targets in {elapsed * 1e3:.1f} ms, {reachable.mean():.1%} converged, "
+          f"{model.mean_iterations:.1f} iterations on average, max error {np.nanmax(error):.1e}.")
+
+
+def fleet(args: argparse.Namespace):
+
+    """ Sweep of femur and tibia lengths driven through one circle, with one and with all workers."""
+
+    config = ik.RobotConfig.default()
+    sweep = ik.design_grid([config.length], [config.width], [config.front], np.linspace(10, 30, 40),
+                           np.linspace(20, 60, 50))
+    circle = _circle(np.linspace(0, 1, 200))
+
+    for workers in ([args.workers] if args.workers else [1, os.cpu_count() or 1]):
+        start = time.perf_counter()
+        result = ik.FleetSimulator(sweep, workers).run(circle)
+        elapsed = time.perf_counter() - start
+
+        print(f"{workers} workers: {len(sweep)} designs x {circle.shape[0]} frames in {elapsed:.2f} s, "
+              f"{len(sweep) / elapsed:.0f} designs/s, {result.reachable.all(axis=(1, 2)).mean():.0%} fully reachable.")
+
+
+def loop(args: argparse.Namespace):
+
+    """ Fixed rate control loop solving the circle without output, reporting its timing statistics."""
+
+    model = ik.RobotConfig.default().compile().kinematics()
+
+    control_loop = control.ControlLoop(lambda t: _circle(np.asarray(t)),
+                                       lambda offsets: model.angles_from_rel_position(offsets, True),
+                                       lambda angles: None)
+
+    print(json.dumps(control_loop.run(duration=args.seconds or 5), indent=2))
+
+
+def recording(args: argparse.Namespace):
+
+    """ Record a long session of the circle at 200 Hz in one second chunks, then replay one second of it."""
+
+    geometry = ik.RobotConfig.default().compile()
+    robot = geometry.build_robot()
+    model = geometry.kinematics()
+    rate = 200
+    seconds = args.seconds or 600
+
+    path = os.path.join(tempfile.mkdtemp(), "session.hexrec")
+    times = np.arange(int(seconds * rate)) / rate
+    start = time.perf_counter()
+
+    with control.TrajectoryRecorder(path, rate) as recorder:
+        for chunk in np.array_split(times, max(1, times.shape[0] // rate)):
+            offsets = _circle(chunk)
+            solution = model.angles_from_rel_position(offsets[:, np.newaxis], True)
+            joints = ik.joints_from_angles(robot.core_vertices[1:] + offsets[:, np.newaxis], solution.angles,
+                                           geometry.femur_lengths, geometry.tibia_lengths)
+            recorder.append(chunk, offsets, solution.angles, joints, solution.reachable)
+
+    print(f"Recorded {len(recorder)} frames ({os.path.getsize(path) / 2 ** 20:.1f} MiB) "
+          f"in {time.perf_counter() - start:.2f} s to {path}.")
+
+    reader = control.TrajectoryReader(path)
+    window = reader.between(seconds / 10, seconds / 10 + 1)
+    print(f"Replay of {len(reader)} frames at {reader.rate} Hz, one second from t={seconds / 10:g} s has "
+          f"{len(window)} frames, all reachable: {bool(window['reachable'].all())}.")
+
+
+def servo(args: argparse.Namespace):
+
+    """ Stream random frames through a loopback pty, read them back on a thread and compare."""
+
+    controller_fd, device_fd = control.loopback_pty()
+    received = bytearray()
+    frame_count = 20000
+
+    def read():
+        while len(received) < frame_count * control.PACKET_SIZE:
+            received.extend(os.read(device_fd, 1 << 16))
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+
+    stream = control.ServoStream(controller_fd, max_pending_frames=frame_count)
+    frames = np.random.default_rng(0).uniform(-1, 1, (frame_count, 6, 3))
+
+    for frame in frames:
+        stream.write(frame)
+
+    while stream.pending:
+        stream.flush()
+
+    reader.join()
+    print(stream.stats())
+
+    angles, sequence = control.decode_frames(bytes(received), control.ServoCalibration())
+    print(f"Round trip error {np.abs(angles - frames).max():.2e} rad over {len(sequence)} frames.")
+
+
+def trajectory(args: argparse.Namespace):
+
+    """ Slider like input, random jumps held for a random number of 30 Hz frames, smoothed to the control rate."""
+
+    rate = 200
+    rng = np.random.default_rng(0)
+    legs = len(ik.RobotConfig.default().legs)
+
+    holds = rng.integers(1, 30, 2000)
+    jumps = rng.uniform(-1, 1, (holds.shape[0], legs, 3))
+    angles = np.repeat(jumps, holds, axis=0)
+
+    start = time.perf_counter()
+    smoothed = control.smooth_trajectory(angles, rate, rate_in=30, chunk_frames=4096)
+    elapsed = time.perf_counter() - start
+
+    velocity = np.diff(smoothed, axis=0) * rate
+    acceleration = np.diff(velocity, axis=0) * rate
+
+    print(f"{angles.shape[0]} frames at 30 Hz to {smoothed.shape[0]} frames at {rate} Hz in {elapsed:.2f} s, "
+          f"max velocity {np.abs(velocity).max():.2f} rad/s, max acceleration {np.abs(acceleration).max():.1f} rad/s^2.")
+
+
+def server(args: argparse.Namespace):
+
+    """ Eight loopback clients sending bursts of offsets, every answer checked against a direct solve."""
+
+    model = ik.RobotConfig.default().compile().kinematics()
+    rng = np.random.default_rng(0)
+
+    async def plan(client: control.CommandClient, bursts: int, size: int):
+        for _ in range(bursts):
+            offsets = rng.uniform(-10, 10, (size, 3))
+            angles, reachable = await client.offsets(offsets)
+            expected = model.angles_from_rel_position(offsets[:, np.newaxis], True)
+
+            assert np.array_equal(reachable, expected.reachable)
+            assert np.allclose(angles[reachable], expected.angles[reachable])
+
+    async def main():
+        async with control.loopback(model, clients=8) as (command_server, clients):
+            start = time.perf_counter()
+            await asyncio.gather(*(plan(client, 200, 64) for client in clients))
+            elapsed = time.perf_counter() - start
+
+            stats = command_server.stats()
+            stats["requests_per_s"] = stats["requests"] / elapsed
+            print(json.dumps(stats, indent=2))
+
+    asyncio.run(main())
+
+
+DEMOS = {"chain": chain,
+         "fleet": fleet,
+         "loop": loop,
+         "recording": recording,
+         "servo": servo,
+         "trajectory": trajectory,
+         "server": server}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Kinematics and control demos on the default robot.")
+    parser.add_argument("demo", choices=sorted(DEMOS), nargs="+")
+    parser.add_argument("--seconds", type=float, help="Duration of the loop and recording demos.")
+    parser.add_argument("--workers", type=int, help="Worker processes of the fleet demo, one and all by default.")
+    arguments = parser.parse_args()
+
+    for name in arguments.demo:
+        DEMOS[name](arguments)
@@ -0,0 +1,106 @@
+import timeit
+import numpy as np
+from multipledispatch import dispatch
+import kinematics as ik
+
+
+"""Per call latency of the single leg solver: the dispatched angles_from_rel_position path, as it was before the typed
+entry points were added, against angles_from_offset and angles_from_positions.
+
+Run from the python-tools directory with: python -m benchmarks.ik_dispatch"""
+
+
+FEMUR = 20
+TIBIA = 40
+
+
+class _DispatchedLegKinematics(ik.LegKinematics):
+
+    """ Reference copy of the former dispatched solver, including its numpy math on 3 element arrays."""
+
+    __slots__ = set()
+
+    @dispatch(np.ndarray, bool, bool)
+    def angles_from_rel_position(self, offsets: np.ndarray, foot_fixed: bool, dynamic: bool) -> np.ndarray:
+
+        if foot_fixed:
+            target = self._foot - offsets - self.origin
+        else:
+            target = self._foot + offsets - self.origin
+
+        if np.linalg.norm(target) > self._femur + self._tibia:
+            return np.array((None, None, None))
+
+        leg_proj = np.sqrt(target[0]**2 + target[1]**2)
+        origin_to_foot = np.sqrt(target[2]**2 + leg_proj**2)
+
+        beta_ang = np.arccos((origin_to_foot ** 2 + self._femur ** 2 - self._tibia ** 2) /
+                             (2 * origin_to_foot * self._femur))
+
+        gamma_ang = np.arccos((origin_to_foot ** 2 + self._tibia ** 2 - self._femur ** 2) /
+                              (2 * self._tibia * origin_to_foot))
+
+        alpha_ang = np.arcsin(np.abs(target[2])/origin_to_foot)
+
+        leg_ang = np.arccos(target[0] / leg_proj)
+
+        if target[2] > 0:
+            alpha_ang *= -1
+
+        if target[1] < 0:
+            leg_ang *= -1
+
+        return np.array((leg_ang, beta_ang - alpha_ang, -(beta_ang + gamma_ang)))
+
+
+def default_joints(femur: float = FEMUR, tibia: float = TIBIA) -> np.ndarray:
+
+    """ Joints of the first leg of the preview robot in its default pose (femur at 45 deg, tibia at -90 deg)."""
+
+    origin = np.array([10.0, 0.0, 0.0])
+    knee = origin + femur * np.array([np.cos(np.pi / 4), 0, np.sin(np.pi / 4)])
+    foot = knee + tibia * np.array([np.cos(-np.pi / 4), 0, np.sin(-np.pi / 4)])
+
+    return np.array((origin, knee, foot))
+
+
+def per_call(statement, number: int, repeat: int) -> float:
+
+    """ Best per call time in seconds out of the repeats."""
+
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number
+
+
+def run(number: int = 20000, repeat: int = 5) -> dict:
+
+    joints = default_joints()
+
+    reference = _DispatchedLegKinematics(FEMUR, TIBIA)
+    reference.set_default_position(joints)
+
+    leg = ik.LegKinematics(FEMUR, TIBIA)
+    leg.set_default_position(joints)
+
+    offsets = np.array([3.0, -2.0, 1.5])
+    origin = joints[0] + offsets
+    foot = joints[2]
+
+    return {"former dispatched (offset)": per_call(lambda: reference.angles_from_rel_position(offsets, True, False),
+                                                   number, repeat),
+            "dispatched (offset)": per_call(lambda: leg.angles_from_rel_position(offsets, True, False),
+                                            number, repeat),
+            "angles_from_offset": per_call(lambda: leg.angles_from_offset(offsets, True),
+                                           number, repeat),
+            "dispatched (positions)": per_call(lambda: leg.angles_from_rel_position(origin, foot),
+                                               number, repeat),
+            "angles_from_positions": per_call(lambda: leg.angles_from_positions(origin, foot),
+                                              number, repeat)}
+
+
+if __name__ == '__main__':
+
+    results = run()
+    baseline = results["former dispatched (offset)"]
+
+    for name, latency in results.items():
+        print(f"{name:<28} {latency * 1e6:8.2f} us/call  {baseline / latency:5.2f}x")
@@ -0,0 +1,75 @@
+import argparse
+import json
+import subprocess
+import sys
+import numpy as np
+from typing import Dict, List
+
+
+"""Import cost of the packages as seen by a fresh interpreter: wall time of the import statement and the peak resident
+memory of the process, together with whether matplotlib got loaded. Every target is imported in its own subprocess,
+repeated to get stable medians.
+
+Run from the python-tools directory with: python -m benchmarks.import_time [--repeat 20] [--output results.json]"""
+
+
+TARGETS = {"kinematics": "import kinematics",
+           "control": "import control",
+           "kinematics_headless_robot": "import kinematics as ik\n"
+                                        "robot = ik.Hexapod(ik.Core(None, 20, 20, 15))\n"
+                                        "robot.add_leg(20, 40)\n"
+                                        "robot.draw()",
+           "animators": "import animators",
+           "matplotlib_pyplot": "import matplotlib.pyplot"}
+
+_PROBE = """
+import resource, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "matplotlib" in sys.modules)
+"""
+
+
+def measure(statement: str, repeat: int) -> Dict:
+
+    seconds: List[float] = []
+    memory: List[int] = []
+    matplotlib = False
+
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _PROBE, statement], capture_output=True, text=True, check=True)
+        elapsed, resident, loaded = output.stdout.split()
+        seconds.append(float(elapsed))
+        memory.append(int(resident))
+        matplotlib |= loaded == "True"
+
+    # ru_maxrss is in KiB on Linux.
+    return {"median_s": float(np.median(seconds)),
+            "min_s": float(np.min(seconds)),
+            "peak_rss_kib": int(np.median(memory)),
+            "loads_matplotlib": matplotlib}
+
+
+def run(repeat: int = 10) -> Dict:
+    return {name: measure(statement, repeat) for name, statement in TARGETS.items()}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Import time and memory benchmark.")
+    parser.add_argument("--repeat", type=int, default=10, help="Fresh interpreters per target.")
+    parser.add_argument("--output", help="Save the results to this JSON file.")
+    arguments = parser.parse_args()
+
+    results = run(arguments.repeat)
+
+    print(f"{'target':<28}{'median ms':>11}{'min ms':>9}{'peak RSS MiB':>14}{'matplotlib':>12}")
+
+    for name, result in results.items():
+        print(f"{name:<28}{result['median_s'] * 1e3:>11.1f}{result['min_s'] * 1e3:>9.1f}"
+              f"{result['peak_rss_kib'] / 1024:>14.1f}{str(result['loads_matplotlib']):>12}")
+
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
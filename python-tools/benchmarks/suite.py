@@ -0,0 +1,236 @@
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import matplotlib
+import numpy as np
+from typing import Callable, Dict, List, Optional
+import kinematics as ik
+from matplotlib.widgets import Slider
+from animators import HeadlessRenderer
+from benchmarks.ik_dispatch import default_joints
+
+
+"""Reproducible throughput benchmarks of the inverse kinematics, the forward kinematics and the headless rendering.
+Every case reports the time per iteration (mean and percentiles), the throughput in solves per second and the peak
+memory allocated by one iteration. Results are saved to JSON together with the commit and the library versions, and a
+previous result file can be passed to print the relative change of every case.
+
+Run from the python-tools directory with: python -m benchmarks.suite --output results.json [--compare old.json]"""
+
+
+CONFIG = ik.RobotConfig.default()
+FEMUR = CONFIG.legs[0].femur
+TIBIA = CONFIG.legs[0].tibia
+BATCH = 10000
+
+
+def _build_robot(ax=None) -> ik.Hexapod:
+    return CONFIG.compile().build_robot(ax)
+
+
+def _slider_preview(blit_sliders: bool) -> Callable[[], None]:
+
+    """ One slider drag step of the fixed feet preview, drawn on an Agg canvas, where the draw_idle of a Slider draws
+    the figure right away. Without blit_sliders every change redraws the whole figure, as before add_sliders."""
+
+    renderer = HeadlessRenderer()
+    robot = _build_robot(renderer.ax)
+    model = ik.HexapodKinematics.from_hexapod(robot)
+    cache = ik.OffsetCache()
+    sliders = [Slider(renderer.figure.add_axes([0.25, 0.02 + 0.05 * index, 0.65, 0.03]), name, -10, 10, valinit=0)
+               for index, name in enumerate("XYZ")]
+
+    if blit_sliders:
+        robot.add_sliders(*sliders)
+
+    def update(_):
+        offsets = cache.quantize(np.array([slider.val for slider in sliders]))
+        angles, reachable = cache.angles_from_rel_position(model, offsets, True)
+
+        if reachable.all():
+            robot.translate_core(offsets)
+            robot.update_leg_positions(angles)
+
+        robot.draw()
+
+    for slider in sliders:
+        slider.on_changed(update)
+
+    robot.draw()
+    renderer.figure.canvas.draw()
+    values = itertools.cycle(np.linspace(-8, 8, 97))
+
+    return lambda: sliders[0].set_val(next(values))
+
+
+def _measure(func: Callable[[], None], iterations: int, warmup: int) -> np.ndarray:
+
+    for _ in range(warmup):
+        func()
+
+    times = np.empty(iterations)
+
+    for iteration in range(iterations):
+        start = time.perf_counter()
+        func()
+        times[iteration] = time.perf_counter() - start
+
+    return times
+
+
+def _peak_memory(func: Callable[[], None]) -> int:
+
+    """ Peak of the memory traced while running one iteration, in bytes."""
+
+    tracemalloc.start()
+
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(name: str, func: Callable[[], None], solves: int, iterations: int, warmup: int = 10) -> Dict:
+
+    """ Benchmark func, which performs the given number of leg solves (or frames) per call."""
+
+    times = _measure(func, iterations, warmup)
+
+    return {"name": name,
+            "iterations": iterations,
+            "solves_per_iteration": solves,
+            "mean_s": float(times.mean()),
+            "p50_s": float(np.percentile(times, 50)),
+            "p90_s": float(np.percentile(times, 90)),
+            "p99_s": float(np.percentile(times, 99)),
+            "max_s": float(times.max()),
+            "solves_per_s": float(solves / np.median(times)),
+            "peak_memory_bytes": _peak_memory(func)}
+
+
+def cases(scale: float = 1.0) -> List[Dict]:
+
+    def count(iterations: int) -> int:
+        return max(10, int(iterations * scale))
+
+    rng = np.random.default_rng(0)
+    offsets = np.array([3.0, -2.0, 1.5])
+    batch_offsets = rng.uniform(-10, 10, (BATCH, 1, 3))
+
+    leg_model = ik.LegKinematics(FEMUR, TIBIA)
+    leg_model.set_default_position(default_joints())
+
+    robot = _build_robot()
+    robot_model = ik.HexapodKinematics.from_hexapod(robot)
+    angles = robot_model.angles_from_rel_position(offsets, True).angles
+    batch_angles = robot_model.angles_from_rel_position(batch_offsets, True).angles
+    leg = robot.bodyparts["legs"]["1"]
+    chain_model = ik.ChainKinematics.from_hexapod(robot)
+    batch_targets = robot_model.targets_from_offsets(batch_offsets, True)
+
+    def dls_warm():
+        # Every target starts from its closed form solution perturbed by a small step, like consecutive frames.
+        chain_model.solve(batch_targets, initial=batch_angles + 0.05)
+
+    renderer = HeadlessRenderer()
+    drawn_robot = _build_robot(renderer.ax)
+    gait = ik.GaitGenerator("tripod").compile(ik.HexapodKinematics.from_hexapod(drawn_robot))
+    drawn_robot.draw()
+    renderer.figure.canvas.draw()
+    frame = itertools.count()
+
+    def draw_frame():
+        drawn_robot.update_leg_positions(gait.frame(next(frame)))
+        drawn_robot.draw()
+
+    return [
+        run_case("ik_single_dispatched", lambda: leg_model.angles_from_rel_position(offsets, True, False),
+                 1, count(20000)),
+        run_case("ik_single_offset", lambda: leg_model.angles_from_offset(offsets, True),
+                 1, count(20000)),
+        run_case("ik_batched_1x6", lambda: robot_model.angles_from_rel_position(offsets, True),
+                 6, count(20000)),
+        run_case(f"ik_batched_{BATCH}x6", lambda: robot_model.angles_from_rel_position(batch_offsets, True),
+                 6 * BATCH, count(200)),
+        run_case(f"ik_dls_cold_{BATCH}x6", lambda: chain_model.solve(batch_targets, initial=chain_model.default_angles),
+                 6 * BATCH, count(20)),
+        run_case(f"ik_dls_warm_{BATCH}x6", dls_warm, 6 * BATCH, count(20)),
+        run_case("fk_leg_update_joints_position", lambda: leg.update_joints_position(angles[0]),
+                 1, count(20000)),
+        run_case("fk_hexapod_update_leg_positions", lambda: robot.update_leg_positions(angles),
+                 6, count(20000)),
+        run_case(f"fk_batched_{BATCH}x6", lambda: ik.joints_from_angles(robot.core_vertices[1:], batch_angles,
+                                                                         FEMUR, TIBIA),
+                 6 * BATCH, count(200)),
+        run_case("draw_headless_frame", draw_frame, 1, count(300)),
+        run_case("draw_slider_preview_full_redraw", _slider_preview(False), 1, count(100)),
+        run_case("draw_slider_preview_blitted", _slider_preview(True), 1, count(300)),
+    ]
+
+
+def _git_commit() -> Optional[str]:
+
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scale: float = 1.0) -> Dict:
+
+    return {"timestamp": time.time(),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "matplotlib": matplotlib.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cases": cases(scale)}
+
+
+def report(results: Dict, baseline: Optional[Dict] = None):
+
+    previous = {case["name"]: case for case in baseline["cases"]} if baseline else {}
+
+    print(f"{'case':<34}{'solves/s':>14}{'p50 us':>11}{'p99 us':>11}{'peak KiB':>11}{'vs base':>9}")
+
+    for case in results["cases"]:
+        line = (f"{case['name']:<34}{case['solves_per_s']:>14.0f}{case['p50_s'] * 1e6:>11.2f}"
+                f"{case['p99_s'] * 1e6:>11.2f}{case['peak_memory_bytes'] / 1024:>11.1f}")
+
+        if case["name"] in previous:
+            line += f"{case['solves_per_s'] / previous[case['name']]['solves_per_s']:>8.2f}x"
+
+        print(line)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Kinematics and rendering benchmarks.")
+    parser.add_argument("--output", help="Save the results to this JSON file.")
+    parser.add_argument("--compare", help="Print the throughput relative to this earlier result file.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the iteration counts.")
+    arguments = parser.parse_args()
+
+    results = run(arguments.scale)
+
+    baseline = None
+
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+
+    report(results, baseline)
+
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,27 @@
+from .loop import *
+from .servo import ServoCalibration, ServoStream, encode_frames, decode_frames, loopback_pty, PACKET_SIZE
+from .recording import TrajectoryRecorder, TrajectoryReader, RECORD_DTYPE
+from .server import CommandServer, CommandClient, loopback, REQUEST_DTYPE, RESPONSE_DTYPE
+from .trajectory import MotionLimits, Resampler, RateLimiter, TrajectoryFilter, smooth_trajectory
+
+__all__ = ["FixedRateScheduler",
+           "ControlLoop",
+           "ServoCalibration",
+           "ServoStream",
+           "encode_frames",
+           "decode_frames",
+           "loopback_pty",
+           "PACKET_SIZE",
+           "TrajectoryRecorder",
+           "TrajectoryReader",
+           "RECORD_DTYPE",
+           "MotionLimits",
+           "Resampler",
+           "RateLimiter",
+           "TrajectoryFilter",
+           "smooth_trajectory",
+           "CommandServer",
+           "CommandClient",
+           "loopback",
+           "REQUEST_DTYPE",
+           "RESPONSE_DTYPE"]
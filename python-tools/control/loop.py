@@ -0,0 +1,227 @@
+import threading
+import time
+import numpy as np
+from typing import Callable, Dict, Optional
+from utils import LatencyHistogram
+
+
+"""Headless real time control loop: trajectory -> inverse kinematics -> joint output at a fixed rate, timed by the
+monotonic clock and independent of matplotlib. Visualization, when wanted, runs in another thread at its own lower rate
+and only ever reads the latest computed frame, so it can never delay a control tick."""
+
+
+class FixedRateScheduler:
+
+    """ Deadline based scheduler, tick k is due at start + k * period, so waiting never accumulates drift. When a tick
+    is reached after its successor was already due, the ticks in between are skipped and counted as missed instead of
+    being run back to back. Sleeping stops spin seconds before the deadline and busy waits the rest, which trades CPU
+    time for lower jitter."""
+
+    __slots__ = {"period",
+                 "spin",
+                 "_clock",
+                 "_start",
+                 "_tick",
+                 "missed"}
+
+    def __init__(self, rate_hz: float, spin: float = 0.0, clock: Callable[[], float] = time.monotonic):
+
+        if rate_hz <= 0:
+            raise ValueError("The rate has to be positive.")
+
+        self.period: float = 1 / rate_hz
+        self.spin: float = spin
+        self._clock = clock
+        self._start: Optional[float] = None
+        self._tick: int = 0
+        self.missed: int = 0
+
+    @property
+    def start_time(self) -> Optional[float]:
+        return self._start
+
+    def start(self):
+        self._start = self._clock()
+        self._tick = 0
+        self.missed = 0
+
+    def wait(self):
+
+        """ Block until the next tick is due. Returns the tick index, its scheduled time relative to the start and how
+        late, in seconds, the call returned after the scheduled time."""
+
+        if self._start is None:
+            self.start()
+
+        deadline = self._start + self._tick * self.period
+        now = self._clock()
+
+        if now - deadline >= self.period:
+            skipped = int((now - deadline) // self.period)
+            self.missed += skipped
+            self._tick += skipped
+            deadline += skipped * self.period
+
+        remaining = deadline - now - self.spin
+
+        if remaining > 0:
+            time.sleep(remaining)
+
+        while self._clock() < deadline:
+            pass
+
+        tick = self._tick
+        self._tick += 1
+
+        return tick, deadline - self._start, self._clock() - deadline
+
+
+class ControlLoop:
+
+    """ Runs output(solver(trajectory(t))) on every tick of a FixedRateScheduler, t being the scheduled time in seconds
+    since the start. The solver may return plain angles or an IKSolution, in which case ticks with unreachable legs keep
+    the previous output and are counted. A tick overruns when its work ends after the next tick was due.
+
+    Every run starts its counters and histograms afresh, so the stats describe the last run only."""
+
+    __slots__ = {"_trajectory",
+                 "_solver",
+                 "_output",
+                 "_scheduler",
+                 "_clock",
+                 "_running",
+                 "_thread",
+                 "_latest",
+                 "ticks",
+                 "overruns",
+                 "unreachable",
+                 "jitter",
+                 "compute"}
+
+    def __init__(self, trajectory: Callable[[float], np.ndarray], solver: Callable[[np.ndarray], object],
+                 output: Callable[[np.ndarray], None], rate_hz: float = 200, spin: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic):
+
+        self._trajectory = trajectory
+        self._solver = solver
+        self._output = output
+        self._scheduler = FixedRateScheduler(rate_hz, spin, clock)
+        self._clock = clock
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._latest: Optional[np.ndarray] = None
+        self.ticks: int = 0
+        self.overruns: int = 0
+        self.unreachable: int = 0
+        self.jitter = LatencyHistogram()
+        self.compute = LatencyHistogram()
+
+    @property
+    def latest(self) -> Optional[np.ndarray]:
+
+        """ Most recently output angles, safe to read from other threads."""
+
+        return self._latest
+
+    def run(self, duration: Optional[float] = None, ticks: Optional[int] = None) -> Dict[str, float]:
+
+        """ Run in the calling thread until stop is called, the duration has elapsed or the number of ticks ran."""
+
+        self._running.set()
+        self.ticks = 0
+        self.overruns = 0
+        self.unreachable = 0
+        self.jitter = LatencyHistogram()
+        self.compute = LatencyHistogram()
+        self._scheduler.start()
+        period = self._scheduler.period
+        clock = self._clock
+
+        try:
+            while self._running.is_set():
+                # Checked before waiting, the last tick must not cost another period.
+                if ticks is not None and self.ticks >= ticks:
+                    break
+
+                tick, scheduled, late = self._scheduler.wait()
+
+                if duration is not None and scheduled >= duration:
+                    break
+
+                start = clock()
+                result = self._solver(self._trajectory(scheduled))
+                reachable = getattr(result, "reachable", None)
+
+                if reachable is None or np.all(reachable):
+                    angles = getattr(result, "angles", result)
+                    self._output(angles)
+                    self._latest = angles
+
+                else:
+                    self.unreachable += 1
+
+                compute = clock() - start
+
+                self.ticks += 1
+                self.jitter.record(late)
+                self.compute.record(compute)
+
+                if late + compute > period:
+                    self.overruns += 1
+
+        finally:
+            self._running.clear()
+
+        return self.stats()
+
+    def start(self, duration: Optional[float] = None, ticks: Optional[int] = None) -> threading.Thread:
+
+        """ Run in a background thread, e.g. to keep the main thread free for a visualization."""
+
+        self._running.set()
+        self._thread = threading.Thread(target=self.run, args=(duration, ticks), name="control-loop", daemon=True)
+        self._thread.start()
+
+        return self._thread
+
+    def stop(self):
+        self._running.clear()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    def run_visualizer(self, callback: Callable[[np.ndarray], None], rate_hz: float = 30):
+
+        """ Call back with the latest angles at the given rate, in the calling thread, for as long as the loop started
+        with start is running. Slow callbacks only lower the visualization rate."""
+
+        scheduler = FixedRateScheduler(rate_hz)
+        shown = None
+
+        while self.running:
+            scheduler.wait()
+            latest = self._latest
+
+            if latest is not None and latest is not shown:
+                callback(latest)
+                shown = latest
+
+    def stats(self) -> Dict[str, float]:
+
+        """ Tick counts and timing, jitter being how late ticks started and compute the time spent in a tick."""
+
+        return {"ticks": self.ticks,
+                "rate_hz": 1 / self._scheduler.period,
+                "missed": self._scheduler.missed,
+                "overruns": self.overruns,
+                "unreachable": self.unreachable,
+                "jitter_p50_s": self.jitter.percentile(50),
+                "jitter_p99_s": self.jitter.percentile(99),
+                "jitter_max_s": self.jitter.max,
+                "compute_p50_s": self.compute.percentile(50),
+                "compute_p99_s": self.compute.percentile(99),
+                "compute_max_s": self.compute.max}
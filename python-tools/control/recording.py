@@ -0,0 +1,202 @@
+import os
+import numpy as np
+from typing import Optional
+
+
+"""Fixed record binary format for long recordings of computed poses. A 64 byte header is followed by records of
+RECORD_DTYPE, one per control tick:
+
+    time        float64         seconds since the start of the recording
+    offset      float32[3]      body offset
+    angles      float32[6, 3]   joint angles
+    joints      float32[6, 3, 3] forward kinematics joint positions
+    reachable   bool[6]         reachability flag of every leg
+
+Both the writer and the reader memory map the file, so hours of 200 Hz data never have to fit into memory. The reader
+hands out numpy views straight into the mapping, e.g. reader.angles[start:stop] can be rendered by the headless renderer
+or written to a ServoStream without copying."""
+
+
+MAGIC = b"HEXTRAJ1"
+VERSION = 1
+
+HEADER_DTYPE = np.dtype([("magic", "S8"),
+                         ("version", "<u4"),
+                         ("record_size", "<u4"),
+                         ("count", "<u8"),
+                         ("rate", "<f8"),
+                         ("reserved", "V32")])
+
+RECORD_DTYPE = np.dtype([("time", "<f8"),
+                         ("offset", "<f4", (3,)),
+                         ("angles", "<f4", (6, 3)),
+                         ("joints", "<f4", (6, 3, 3)),
+                         ("reachable", "?", (6,))])
+
+HEADER_SIZE = HEADER_DTYPE.itemsize
+
+
+class TrajectoryRecorder:
+
+    """ Appends records to a new file. The file grows by chunk_records at a time and the header count is updated after
+    every append, so a reader, or a recovery after a crash, always sees the complete records. Closing truncates the
+    preallocated tail."""
+
+    __slots__ = {"path",
+                 "_chunk",
+                 "_header",
+                 "_records",
+                 "_capacity",
+                 "_count"}
+
+    def __init__(self, path: str, rate: float = 0.0, chunk_records: int = 65536):
+
+        self.path = path
+        self._chunk = chunk_records
+        self._count = 0
+        self._capacity = 0
+        self._records: Optional[np.memmap] = None
+
+        with open(path, "wb") as file:
+            file.truncate(HEADER_SIZE)
+
+        self._header = np.memmap(path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        self._header["magic"] = MAGIC
+        self._header["version"] = VERSION
+        self._header["record_size"] = RECORD_DTYPE.itemsize
+        self._header["count"] = 0
+        self._header["rate"] = rate
+        self._header.flush()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _reserve(self, count: int):
+
+        if self._count + count <= self._capacity:
+            return
+
+        capacity = self._capacity + max(self._chunk, count)
+
+        if self._records is not None:
+            self._records.flush()
+
+        with open(self.path, "r+b") as file:
+            file.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+
+        self._records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r+", offset=HEADER_SIZE, shape=(capacity,))
+        self._capacity = capacity
+
+    def append(self, time, offset: np.ndarray, angles: np.ndarray, joints: np.ndarray, reachable: np.ndarray):
+
+        """ Append one frame, or N frames when the arguments carry a leading (N,) axis."""
+
+        time = np.atleast_1d(time)
+        count = time.shape[0]
+
+        self._reserve(count)
+
+        records = self._records[self._count:self._count + count]
+        records["time"] = time
+        records["offset"] = np.reshape(offset, (count, 3))
+        records["angles"] = np.reshape(angles, (count, 6, 3))
+        records["joints"] = np.reshape(joints, (count, 6, 3, 3))
+        records["reachable"] = np.reshape(reachable, (count, 6))
+
+        self._count += count
+        self._header["count"] = self._count
+
+    def flush(self):
+
+        if self._records is not None:
+            self._records.flush()
+
+        self._header.flush()
+
+    def close(self):
+
+        if self._header is None:
+            return
+
+        self.flush()
+        self._records = None
+        self._header = None
+
+        with open(self.path, "r+b") as file:
+            file.truncate(HEADER_SIZE + self._count * RECORD_DTYPE.itemsize)
+
+
+class TrajectoryReader:
+
+    """ Read only view of a recording. Indexing and the field properties return views into the memory mapping, copy
+    them if they have to outlive the reader. Call refresh to pick up records appended by a recorder since opening."""
+
+    __slots__ = {"path",
+                 "rate",
+                 "records"}
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: np.ndarray = np.empty(0, dtype=RECORD_DTYPE)
+        self.rate = 0.0
+        self.refresh()
+
+    def refresh(self):
+
+        header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)
+
+        if header.shape[0] != 1 or header["magic"][0] != MAGIC:
+            raise ValueError(f"{self.path} is not a trajectory recording.")
+
+        if header["version"][0] != VERSION or header["record_size"][0] != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Unsupported recording version {header['version'][0]} in {self.path}.")
+
+        # The file can be longer than the header count while it is being recorded, never shorter.
+        available = (os.path.getsize(self.path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        count = int(min(header["count"][0], available))
+        self.rate = float(header["rate"][0])
+
+        if count:
+            self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    def __len__(self) -> int:
+        return self.records.shape[0]
+
+    def __getitem__(self, index) -> np.ndarray:
+        return self.records[index]
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.records["time"]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.records["offset"]
+
+    @property
+    def angles(self) -> np.ndarray:
+        return self.records["angles"]
+
+    @property
+    def joints(self) -> np.ndarray:
+        return self.records["joints"]
+
+    @property
+    def reachable(self) -> np.ndarray:
+        return self.records["reachable"]
+
+    def between(self, start: float, stop: float) -> np.ndarray:
+
+        """ Records with start <= time < stop, found by bisection of the monotonic time column."""
+
+        first, last = np.searchsorted(self.records["time"], (start, stop))
+
+        return self.records[first:last]
@@ -0,0 +1,473 @@
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+import numpy as np
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from kinematics import HexapodKinematics, IKSolution
+from utils import LatencyHistogram
+
+
+"""Asyncio server sharing one inverse kinematics model between many planning clients over a local socket, a unix
+socket when a path is given and TCP on the loopback interface otherwise. Requests and responses are fixed size little
+endian records:
+
+    request     id          uint32      chosen by the client, echoed in the response
+                kind        uint8       OFFSET_BODY (feet fixed), OFFSET_FEET or POSE
+                values      float64[6]  the (x, y, z) offset, or the (x, y, z, roll, pitch, yaw) pose
+
+    response    id          uint32
+                reachable   bool[6]     reachability of every leg
+                angles      float64[6, 3]
+
+Requests from all connections are coalesced into batches and solved with one batched call per request kind, so a burst
+of requests costs about as much as a single one. Every connection can have at most max_pending requests in flight,
+after which the server stops reading from it until responses have been written, so a flooding or slowly reading client
+is throttled by the socket flow control without delaying the others."""
+
+
+OFFSET_BODY = 0
+OFFSET_FEET = 1
+POSE = 2
+
+REQUEST_DTYPE = np.dtype([("id", "<u4"),
+                          ("kind", "u1"),
+                          ("reserved", "V3"),
+                          ("values", "<f8", (6,))])
+
+RESPONSE_DTYPE = np.dtype([("id", "<u4"),
+                           ("reachable", "?", (6,)),
+                           ("reserved", "V6"),
+                           ("angles", "<f8", (6, 3))])
+
+REQUEST_SIZE = REQUEST_DTYPE.itemsize
+RESPONSE_SIZE = RESPONSE_DTYPE.itemsize
+
+
+class _Connection:
+
+    __slots__ = {"writer",
+                 "pending",
+                 "space",
+                 "responses"}
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.pending: int = 0
+        self.space = asyncio.Event()
+        self.responses: asyncio.Queue = asyncio.Queue()
+
+
+class CommandServer:
+
+    """ Serves body offset and pose requests with a HexapodKinematics model of six legs. The batcher takes whatever
+    requests have arrived, up to max_batch, waiting linger seconds after the first one for more to join. Latency is
+    measured per request from its arrival until its response has been handed to the socket."""
+
+    __slots__ = {"kinematics",
+                 "path",
+                 "host",
+                 "port",
+                 "max_batch",
+                 "max_pending",
+                 "linger",
+                 "_server",
+                 "_queue",
+                 "_batcher",
+                 "_connections",
+                 "requests",
+                 "batches",
+                 "largest_batch",
+                 "throttled",
+                 "latency",
+                 "solve"}
+
+    def __init__(self, kinematics: HexapodKinematics, path: Optional[str] = None, host: str = "127.0.0.1",
+                 port: int = 0, max_batch: int = 4096, max_pending: int = 1024, linger: float = 0.0):
+
+        if kinematics.legs != 6:
+            raise ValueError("The command server needs a model of six legs.")
+
+        self.kinematics = kinematics
+        self.path = path
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.linger = linger
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._connections: Dict[asyncio.Task, _Connection] = {}
+        self.requests: int = 0
+        self.batches: int = 0
+        self.largest_batch: int = 0
+        self.throttled: int = 0
+        self.latency = LatencyHistogram()
+        self.solve = LatencyHistogram()
+
+    @property
+    def address(self):
+
+        """ The socket path, or the (host, port) the server listens on, with the port assigned by the system."""
+
+        if self.path is not None:
+            return self.path
+
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(self._serve, self.path)
+        else:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port)
+
+    async def close(self):
+
+        """ Stop listening and drop the connections. Their handlers are not cancelled but see the end of the stream,
+        so they finish on their own."""
+
+        self._server.close()
+
+        for connection in self._connections.values():
+            connection.writer.transport.abort()
+
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+        self._batcher.cancel()
+        await asyncio.gather(self._batcher, return_exceptions=True)
+        await self._server.wait_closed()
+
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+        connection = _Connection(writer)
+        self._connections[asyncio.current_task()] = connection
+        sender = asyncio.create_task(self._send(connection))
+        buffer = b""
+
+        try:
+            while True:
+                if connection.pending >= self.max_pending:
+                    self.throttled += 1
+                    await self._wait_for_space(connection, sender, self.max_pending)
+
+                data = await reader.read(min(self.max_pending - connection.pending, self.max_batch) * REQUEST_SIZE)
+
+                if not data:
+                    break
+
+                buffer += data
+                count = len(buffer) // REQUEST_SIZE
+
+                if not count:
+                    continue
+
+                requests = np.frombuffer(buffer, dtype=REQUEST_DTYPE, count=count)
+                buffer = buffer[count * REQUEST_SIZE:]
+                connection.pending += count
+                self._queue.put_nowait((connection, requests, time.monotonic()))
+
+            # The client has finished sending, answer what is in flight before closing.
+            await self._wait_for_space(connection, sender, 1)
+
+        except ConnectionError:
+            pass
+
+        finally:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+            writer.close()
+            del self._connections[asyncio.current_task()]
+
+    @staticmethod
+    async def _wait_for_space(connection: _Connection, sender: asyncio.Task, limit: int):
+
+        """ Wait until fewer than limit requests of the connection are in flight. Raises ConnectionError when the
+        responses can no longer be sent."""
+
+        while connection.pending >= limit:
+            if sender.done():
+                raise ConnectionError("The client stopped receiving responses.")
+
+            connection.space.clear()
+            await connection.space.wait()
+
+    async def _send(self, connection: _Connection):
+
+        clock = time.monotonic
+
+        try:
+            while True:
+                data, count, arrival = await connection.responses.get()
+
+                connection.writer.write(data)
+                await connection.writer.drain()
+
+                latency = clock() - arrival
+
+                for _ in range(count):
+                    self.latency.record(latency)
+
+                connection.pending -= count
+                connection.space.set()
+
+        finally:
+            # Wakes up the reader of the connection, which notices that responses are no longer sent.
+            connection.space.set()
+
+    async def _run_batches(self):
+
+        while True:
+            batch = [await self._queue.get()]
+
+            if self.linger > 0:
+                await asyncio.sleep(self.linger)
+
+            count = batch[0][1].shape[0]
+
+            while count < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                count += batch[-1][1].shape[0]
+
+            start = time.monotonic()
+            requests = np.concatenate([requests for _, requests, _ in batch])
+            responses = self.respond(requests)
+            self.solve.record(time.monotonic() - start)
+
+            first = 0
+
+            for connection, requests, arrival in batch:
+                last = first + requests.shape[0]
+                connection.responses.put_nowait((responses[first:last].tobytes(), requests.shape[0], arrival))
+                first = last
+
+            self.requests += count
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, count)
+
+            # Let the connections read and write before the next batch is taken.
+            await asyncio.sleep(0)
+
+    def respond(self, requests: np.ndarray) -> np.ndarray:
+
+        """ Responses to a batch of requests, one batched solve per request kind. Requests of unknown kinds are
+        answered with NaN angles and no reachable leg."""
+
+        responses = np.zeros(requests.shape[0], dtype=RESPONSE_DTYPE)
+        responses["id"] = requests["id"]
+        responses["angles"] = np.nan
+
+        kinds = requests["kind"]
+        values = requests["values"]
+
+        for kind in np.unique(kinds):
+            selected = kinds == kind
+
+            if kind == POSE:
+                solution = self.kinematics.angles_from_pose(values[selected])
+
+            elif kind in (OFFSET_BODY, OFFSET_FEET):
+                solution = self.kinematics.angles_from_rel_position(values[selected, np.newaxis, :3],
+                                                                    kind == OFFSET_BODY)
+            else:
+                continue
+
+            responses["angles"][selected] = solution.angles
+            responses["reachable"][selected] = solution.reachable
+
+        return responses
+
+    def stats(self) -> Dict[str, float]:
+
+        """ Request and batch counts, the latency of the requests and the time spent solving batches."""
+
+        return {"requests": self.requests,
+                "batches": self.batches,
+                "mean_batch": self.requests / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "connections": len(self._connections),
+                "throttled": self.throttled,
+                "latency_p50_s": self.latency.percentile(50),
+                "latency_p99_s": self.latency.percentile(99),
+                "latency_max_s": self.latency.max,
+                "solve_p50_s": self.solve.percentile(50),
+                "solve_p99_s": self.solve.percentile(99)}
+
+
+class CommandClient:
+
+    """ Client of a CommandServer. Requests of one call are sent in a single write and their responses matched by id,
+    so several calls can be in flight at once. Round trip latencies are recorded per request."""
+
+    __slots__ = {"_reader",
+                 "_writer",
+                 "_receiver",
+                 "_waiting",
+                 "_next_id",
+                 "latency"}
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+        self._reader = reader
+        self._writer = writer
+        self._waiting: Dict[int, Tuple[asyncio.Future, float]] = {}
+        self._next_id = 0
+        self.latency = LatencyHistogram()
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, address) -> "CommandClient":
+
+        """ Connect to a socket path or a (host, port) pair, e.g. CommandServer.address."""
+
+        if isinstance(address, str):
+            reader, writer = await asyncio.open_unix_connection(address)
+        else:
+            reader, writer = await asyncio.open_connection(*address)
+
+        return cls(reader, writer)
+
+    async def close(self):
+
+        self._writer.close()
+        self._receiver.cancel()
+        await asyncio.gather(self._receiver, return_exceptions=True)
+
+    async def _receive(self):
+
+        """ Resolve the futures of the responses as they arrive. However the receiver ends, the server closing the
+        connection, a broken response or close, every request still waiting fails instead of hanging."""
+
+        clock = time.monotonic
+        buffer = b""
+        reason = "the client was closed"
+
+        try:
+            while True:
+                data = await self._reader.read(1024 * RESPONSE_SIZE)
+
+                if not data:
+                    raise ConnectionError("closed by the server")
+
+                buffer += data
+                count = len(buffer) // RESPONSE_SIZE
+                responses = np.frombuffer(buffer, dtype=RESPONSE_DTYPE, count=count)
+                buffer = buffer[count * RESPONSE_SIZE:]
+                now = clock()
+
+                for response in responses:
+                    # Responses nobody waits for, e.g. a duplicate id, are dropped.
+                    waiting = self._waiting.pop(int(response["id"]), None)
+
+                    if waiting is None:
+                        continue
+
+                    future, sent = waiting
+                    self.latency.record(now - sent)
+
+                    if not future.done():
+                        future.set_result(response)
+
+        except ConnectionError as error:
+            reason = str(error)
+
+        except Exception as error:
+            reason = repr(error)
+            raise
+
+        finally:
+            waiting, self._waiting = self._waiting, {}
+
+            for future, _ in waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Connection to the command server lost: {reason}"))
+
+    async def request(self, kind: int, values: np.ndarray) -> IKSolution:
+
+        """ Send N requests of one kind, values of shape (N, 3) or (N, 6), or a single (3,) or (6,) request, and wait
+        for all responses. Returns (N, 6, 3) angles with the (N, 6) reachability mask, without the leading axis for a
+        single request."""
+
+        if self._receiver.done():
+            raise ConnectionError("Connection to the command server lost, no responses can be received.")
+
+        values = np.asarray(values, dtype=float)
+        single = values.ndim == 1
+        values = np.atleast_2d(values)
+
+        requests = np.zeros(values.shape[0], dtype=REQUEST_DTYPE)
+        requests["id"] = (self._next_id + np.arange(values.shape[0])) & 0xFFFFFFFF
+        requests["kind"] = kind
+        requests["values"][:, :values.shape[1]] = values
+        self._next_id = (self._next_id + values.shape[0]) & 0xFFFFFFFF
+
+        loop = asyncio.get_running_loop()
+        sent = time.monotonic()
+        futures = []
+
+        for request_id in requests["id"].tolist():
+            future = loop.create_future()
+            self._waiting[request_id] = (future, sent)
+            futures.append(future)
+
+        self._writer.write(requests.tobytes())
+        await self._writer.drain()
+
+        responses = np.array(await asyncio.gather(*futures), dtype=RESPONSE_DTYPE)
+
+        if single:
+            return IKSolution(responses["angles"][0], responses["reachable"][0])
+
+        return IKSolution(responses["angles"], responses["reachable"])
+
+    async def offsets(self, offsets: np.ndarray, foot_fixed: bool = True) -> IKSolution:
+
+        """ See HexapodKinematics.angles_from_rel_position, one request per (3,) offset."""
+
+        return await self.request(OFFSET_BODY if foot_fixed else OFFSET_FEET, offsets)
+
+    async def poses(self, poses: np.ndarray) -> IKSolution:
+
+        """ See HexapodKinematics.angles_from_pose, one request per (6,) pose."""
+
+        return await self.request(POSE, poses)
+
+
+@contextlib.asynccontextmanager
+async def loopback(kinematics: HexapodKinematics, clients: int = 1,
+                   **kwargs) -> AsyncIterator[Tuple[CommandServer, List[CommandClient]]]:
+
+    """ A server on a temporary unix socket, TCP where unix sockets are not available, with connected clients, for
+    tests and benchmarks. Keyword arguments go to the server."""
+
+    # Removed also when the server or a client fails to start.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ik.sock") if hasattr(asyncio, "start_unix_server") else None
+
+        async with CommandServer(kinematics, path, **kwargs) as server:
+            connected = []
+
+            try:
+                for _ in range(clients):
+                    connected.append(await CommandClient.connect(server.address))
+
+                yield server, connected
+
+            finally:
+                for client in connected:
+                    await client.close()
@@ -0,0 +1,255 @@
+import os
+import time
+import numpy as np
+from typing import Dict, Optional, Tuple, Union
+from kinematics import wrap_angles
+
+
+"""Streaming output of joint angles to servo controllers. Every (6, 3) angle frame is calibrated, quantized to 16 bits
+and packed into a fixed size little endian packet:
+
+    magic       uint16      0x55AA
+    sequence    uint16      frame counter, wraps around
+    positions   uint16[18]  legs in Hexapod order, (leg, femur, tibia) per leg
+    checksum    uint16      sum of the sequence and position words, modulo 2**16
+
+Packets are encoded in bulk with numpy and written to a file descriptor in non-blocking mode, so a slow sink (a serial
+port, a pipe, a pty) never blocks the control loop."""
+
+
+MAGIC = 0x55AA
+JOINTS = 18
+
+PACKET_DTYPE = np.dtype([("magic", "<u2"),
+                         ("sequence", "<u2"),
+                         ("positions", "<u2", (JOINTS,)),
+                         ("checksum", "<u2")])
+
+PACKET_SIZE = PACKET_DTYPE.itemsize
+
+
+class ServoCalibration:
+
+    """ Per joint calibration, servo = (angle + offset) * scale, wrapped to within pi of the middle of [lower, upper] and
+    mapped linearly from [lower, upper] radians onto the full 16 bit range. Offsets and scales broadcast against the
+    (6, 3) angle frames, a negative scale flips a servo. Wrapping first makes angles that differ by whole turns, e.g. a
+    coxa pointing backwards flipping between +-pi, land on the same position, while angles just outside a range
+    narrower than a turn still saturate at the nearer end."""
+
+    __slots__ = {"offsets",
+                 "scales",
+                 "lower",
+                 "upper"}
+
+    def __init__(self, offsets: Union[float, np.ndarray] = 0.0, scales: Union[float, np.ndarray] = 1.0,
+                 lower: float = -np.pi, upper: float = np.pi):
+
+        if upper <= lower:
+            raise ValueError("The upper bound of the servo range has to be above the lower one.")
+
+        self.offsets = np.broadcast_to(np.asarray(offsets, dtype=float), (6, 3)).copy()
+        self.scales = np.broadcast_to(np.asarray(scales, dtype=float), (6, 3)).copy()
+        self.lower = lower
+        self.upper = upper
+
+    def quantize(self, angles: np.ndarray) -> np.ndarray:
+
+        """ (..., 6, 3) angles to (..., 18) uint16 servo positions, saturating at the ends of the range. Raises
+        ValueError on NaN angles, which have no position."""
+
+        angles = np.asarray(angles, dtype=float)
+
+        if np.isnan(angles).any():
+            raise ValueError("NaN angles, e.g. of unreachable legs, can not be sent to the servos.")
+
+        center = (self.lower + self.upper) / 2
+        servo = center + wrap_angles((angles + self.offsets) * self.scales - center)
+        position = np.rint((servo - self.lower) / (self.upper - self.lower) * 0xFFFF)
+
+        return np.clip(position, 0, 0xFFFF).astype(np.uint16).reshape(servo.shape[:-2] + (JOINTS,))
+
+    def dequantize(self, positions: np.ndarray) -> np.ndarray:
+
+        """ Inverse of quantize, up to the quantization step of (upper - lower) / 65535 and whole turns."""
+
+        servo = np.asarray(positions, dtype=float) / 0xFFFF * (self.upper - self.lower) + self.lower
+
+        return servo.reshape(servo.shape[:-1] + (6, 3)) / self.scales - self.offsets
+
+
+def encode_frames(angles: np.ndarray, calibration: ServoCalibration, first_sequence: int = 0) -> np.ndarray:
+
+    """ Encode (6, 3) or (N, 6, 3) angles into an array of N packets, use .tobytes() for the wire format."""
+
+    positions = calibration.quantize(angles).reshape(-1, JOINTS)
+
+    packets = np.empty(positions.shape[0], dtype=PACKET_DTYPE)
+    packets["magic"] = MAGIC
+    packets["sequence"] = (first_sequence + np.arange(positions.shape[0])) & 0xFFFF
+    packets["positions"] = positions
+    packets["checksum"] = (packets["sequence"].astype(np.uint32) + positions.sum(axis=1, dtype=np.uint32)) & 0xFFFF
+
+    return packets
+
+
+def decode_frames(data: bytes, calibration: ServoCalibration) -> Tuple[np.ndarray, np.ndarray]:
+
+    """ Decode whole packets back into (N, 6, 3) angles and their sequence numbers. Raises ValueError on a corrupted
+    stream, it does not try to resynchronize."""
+
+    if len(data) % PACKET_SIZE:
+        raise ValueError(f"The data is not a whole number of {PACKET_SIZE} byte packets.")
+
+    packets = np.frombuffer(data, dtype=PACKET_DTYPE)
+    checksum = (packets["sequence"].astype(np.uint32) + packets["positions"].sum(axis=1, dtype=np.uint32)) & 0xFFFF
+
+    if (packets["magic"] != MAGIC).any() or (packets["checksum"] != checksum).any():
+        raise ValueError("Corrupted packet in the stream.")
+
+    return calibration.dequantize(packets["positions"]), packets["sequence"].copy()
+
+
+class ServoStream:
+
+    """ Non-blocking packet writer. Frames are encoded and appended to a pending buffer, which is written out with as
+    few os.write calls as the sink accepts. When the sink falls behind by more than max_pending_frames, the oldest
+    frames are dropped, stale servo targets are worth less than fresh ones. The sink is a file descriptor or any object
+    with a fileno method, e.g. an open serial port, a pipe or a pty, and is switched to non-blocking mode.
+
+    NaN angles, e.g. of unreachable legs, hold the last valid command of their joint, such frames are counted as held.
+    Frames with joints that never had a valid command are rejected and counted as dropped."""
+
+    __slots__ = {"_fd",
+                 "_calibration",
+                 "_pending",
+                 "_max_pending",
+                 "_sequence",
+                 "_start",
+                 "_last",
+                 "frames",
+                 "written",
+                 "dropped",
+                 "held"}
+
+    def __init__(self, sink, calibration: Optional[ServoCalibration] = None, max_pending_frames: int = 64):
+
+        self._fd: int = sink if isinstance(sink, int) else sink.fileno()
+        self._calibration = calibration if calibration is not None else ServoCalibration()
+        self._pending = bytearray()
+        self._max_pending = max_pending_frames * PACKET_SIZE
+        self._sequence = 0
+        self._start: Optional[float] = None
+        self._last: Optional[np.ndarray] = None
+        self.frames = 0
+        self.written = 0
+        self.dropped = 0
+        self.held = 0
+
+        os.set_blocking(self._fd, False)
+
+    @property
+    def pending(self) -> int:
+
+        """ Bytes accepted but not yet written to the sink."""
+
+        return len(self._pending)
+
+    def write(self, angles: np.ndarray) -> int:
+
+        """ Queue one (6, 3) frame or a (N, 6, 3) batch and write as much as the sink takes. Returns the number of
+        bytes written by this call."""
+
+        if self._start is None:
+            self._start = time.monotonic()
+
+        frames = np.array(angles, dtype=float).reshape(-1, 6, 3)
+        valid = ~np.isnan(frames)
+
+        if not valid.all():
+            frames = self._hold(frames, valid)
+
+        if not frames.shape[0]:
+            return self.flush()
+
+        self._last = frames[-1].copy()
+
+        packets = encode_frames(frames, self._calibration, self._sequence)
+        self._sequence = (self._sequence + packets.shape[0]) & 0xFFFF
+        self.frames += packets.shape[0]
+        self._pending += packets.tobytes()
+
+        overflow = len(self._pending) - self._max_pending
+
+        if overflow > 0:
+            # Whole packets only, the rest of a partially written one is at the front and always kept.
+            partial = len(self._pending) % PACKET_SIZE
+            count = min((len(self._pending) - partial) // PACKET_SIZE, -(-overflow // PACKET_SIZE))
+            del self._pending[partial:partial + count * PACKET_SIZE]
+            self.dropped += count
+
+        return self.flush()
+
+    def _hold(self, frames: np.ndarray, valid: np.ndarray) -> np.ndarray:
+
+        """ Frames with NaN joints replaced by the last valid command of the joint, in this batch or before it."""
+
+        # Index of the latest valid frame of every joint, -1 where there was none in this batch.
+        latest = np.maximum.accumulate(np.where(valid, np.arange(frames.shape[0])[:, np.newaxis, np.newaxis], -1), axis=0)
+        held = np.take_along_axis(frames, np.maximum(latest, 0), axis=0)
+
+        if self._last is not None:
+            held = np.where(latest < 0, self._last, held)
+
+        complete = ~np.isnan(held).any(axis=(1, 2))
+        self.held += int(np.count_nonzero(~valid.all(axis=(1, 2)) & complete))
+        self.dropped += int(np.count_nonzero(~complete))
+
+        return held[complete]
+
+    def flush(self) -> int:
+
+        written = 0
+
+        while self._pending:
+            try:
+                count = os.write(self._fd, self._pending)
+
+            except BlockingIOError:
+                break
+
+            if not count:
+                break
+
+            del self._pending[:count]
+            written += count
+
+        self.written += written
+
+        return written
+
+    def stats(self) -> Dict[str, float]:
+
+        elapsed = time.monotonic() - self._start if self._start is not None else 0.0
+
+        return {"frames": self.frames,
+                "dropped": self.dropped,
+                "held": self.held,
+                "bytes_written": self.written,
+                "pending_bytes": len(self._pending),
+                "elapsed_s": elapsed,
+                "fps": (self.written / PACKET_SIZE) / elapsed if elapsed else 0.0}
+
+
+def loopback_pty() -> Tuple[int, int]:
+
+    """ A raw pty pair standing in for a serial port: write packets to the first descriptor, read them back from the
+    second one."""
+
+    import pty
+    import tty
+
+    controller, device = pty.openpty()
+    tty.setraw(device)
+    tty.setraw(controller)
+
+    return controller, device
@@ -0,0 +1,280 @@
+import numpy as np
+from typing import Iterable, Iterator, Optional, Union
+from kinematics import wrap_angles
+import utils
+
+
+"""Post processing of joint angle trajectories before they reach the servos. Angle frames of shape (N, legs, 3), as
+produced by the batched solvers, a GaitTable or a TrajectoryReader, are resampled to the control rate and then passed
+through a rate limiter enforcing per joint velocity and acceleration limits, so slider jumps or unreachable frames turn
+into motions the servos can actually follow.
+
+Both stages keep their state between calls and work chunk by chunk, so a recording of any length is processed in one
+pass with memory bounded by the chunk size."""
+
+
+class MotionLimits:
+
+    """ Per joint velocity (rad/s) and acceleration (rad/s^2) limits. Scalars apply to every joint, (3,) arrays to the
+    (leg, femur, tibia) joints of all legs and (legs, 3) arrays to every joint separately."""
+
+    __slots__ = {"velocity",
+                 "acceleration"}
+
+    def __init__(self, velocity: Union[float, np.ndarray] = 6.0, acceleration: Union[float, np.ndarray] = 60.0):
+
+        self.velocity = np.asarray(velocity, dtype=float)
+        self.acceleration = np.asarray(acceleration, dtype=float)
+
+        if np.any(self.velocity <= 0) or np.any(self.acceleration <= 0):
+            raise ValueError("Velocity and acceleration limits have to be positive.")
+
+
+class Resampler:
+
+    """ Streaming linear interpolation of frames sampled at rate_in onto rate_out. Output frame k lies at input time
+    k * rate_in / rate_out, computed from integer counters, so long streams do not drift. The last frame of every chunk
+    is kept to interpolate across the chunk boundary. NaN frames stay NaN in the output frames next to them.
+
+    Interpolation goes along the shorter arc, like GaitTable.angles_at, so a joint crossing +-pi does not sweep through
+    zero. The result starts from the earlier frame and is not wrapped, it may exceed pi by part of one step."""
+
+    __slots__ = {"rate_in",
+                 "rate_out",
+                 "_last",
+                 "_consumed",
+                 "_emitted"}
+
+    def __init__(self, rate_in: float, rate_out: float):
+
+        if rate_in <= 0 or rate_out <= 0:
+            raise ValueError("The rates have to be positive.")
+
+        self.rate_in = float(rate_in)
+        self.rate_out = float(rate_out)
+        self.reset()
+
+    def reset(self):
+        self._last: Optional[np.ndarray] = None
+        self._consumed: int = 0  # Input index of the first frame of the next chunk.
+        self._emitted: int = 0
+
+    def process(self, frames: np.ndarray) -> np.ndarray:
+
+        """ Resample the next (n, ...) chunk, returns the (m, ...) output frames that fall inside the input received
+        so far."""
+
+        frames = np.asarray(frames, dtype=float)
+
+        if frames.shape[0] == 0:
+            return frames
+
+        if self._last is None:
+            window = frames
+            first = self._consumed
+        else:
+            window = np.concatenate((self._last[np.newaxis], frames))
+            first = self._consumed - 1
+
+        last_index = self._consumed + frames.shape[0] - 1
+        step = self.rate_in / self.rate_out
+        count = int(np.floor(last_index / step + 1e-9)) + 1 - self._emitted
+
+        if count <= 0:
+            self._last = frames[-1].copy()
+            self._consumed += frames.shape[0]
+            return np.empty((0,) + frames.shape[1:])
+
+        position = (self._emitted + np.arange(count)) * step - first
+        lower = np.minimum(position.astype(np.intp), window.shape[0] - 1)
+        upper = np.minimum(lower + 1, window.shape[0] - 1)
+        weight = (position - lower).reshape((-1,) + (1,) * (frames.ndim - 1))
+
+        resampled = window[lower] + weight * wrap_angles(window[upper] - window[lower])
+        # Frames landing exactly on an input frame take it as is, even when its neighbour is NaN.
+        exact = weight.reshape(-1) == 0
+        resampled[exact] = window[lower[exact]]
+
+        self._emitted += count
+        self._last = frames[-1].copy()
+        self._consumed += frames.shape[0]
+
+        return resampled
+
+
+class RateLimiter:
+
+    """ Follows the target angles as closely as the MotionLimits allow. Every step the velocity towards the target is
+    bounded by the velocity limit and by the speed from which the joint can still brake to a stop on the target, then
+    changed by at most one acceleration step, so jumps become acceleration limited ramps without overshoot.
+
+    Errors are measured along the shorter arc, so a target crossing +-pi is followed the short way round. The commanded
+    angles are continuous and therefore not wrapped, they can leave [-pi, pi) by the distance travelled past it.
+
+    The limiter works frame by frame, since every step depends on the previous one, but on all joints at once. NaN
+    targets, e.g. unreachable legs, hold the last valid target of the joint. The first frame sets the state unless
+    reset was given initial angles."""
+
+    __slots__ = {"limits",
+                 "rate",
+                 "position",
+                 "velocity",
+                 "_target"}
+
+    def __init__(self, limits: MotionLimits, rate: float):
+
+        if rate <= 0:
+            raise ValueError("The rate has to be positive.")
+
+        self.limits = limits
+        self.rate = float(rate)
+        self.position: Optional[np.ndarray] = None
+        self.velocity: Optional[np.ndarray] = None
+        self._target: Optional[np.ndarray] = None
+
+    def reset(self, angles: Optional[np.ndarray] = None):
+
+        """ Start at rest at the given angles, or at the first frame of the next chunk."""
+
+        if angles is None:
+            self.position = self.velocity = self._target = None
+            return
+
+        self.position = np.array(angles, dtype=float)
+        self.velocity = np.zeros_like(self.position)
+        self._target = self.position.copy()
+
+    @utils.profiled
+    def process(self, targets: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+
+        """ Limit the next (n, legs, 3) chunk of targets, sampled at the rate of the limiter. Returns the (n, legs, 3)
+        commanded angles, written into out when given."""
+
+        targets = np.asarray(targets, dtype=float)
+
+        if out is None:
+            out = np.empty(targets.shape)
+
+        if targets.shape[0] == 0:
+            return out
+
+        if self.position is None:
+            self.reset(np.where(np.isnan(targets[0]), 0.0, targets[0]))
+
+        dt = 1 / self.rate
+        limits = self.limits
+        velocity_limit = np.broadcast_to(limits.velocity, self.position.shape)
+        acceleration = np.broadcast_to(limits.acceleration, self.position.shape)
+        acceleration_step = acceleration * dt
+        half_step = acceleration_step / 2
+
+        position = self.position
+        velocity = self.velocity
+        target = self._target
+        error = np.empty(position.shape)
+        bound = np.empty(position.shape)
+        desired = np.empty(position.shape)
+
+        for frame in range(targets.shape[0]):
+            np.copyto(target, targets[frame], where=~np.isnan(targets[frame]))
+
+            error[:] = wrap_angles(target - position)
+            # Fastest speed v that still stops on the target, decelerating by at most one acceleration step per tick.
+            # Moving v * dt now and braking from any v - a * dt afterwards covers at most v ** 2 / (2 * a) + v * dt / 2 +
+            # a * dt ** 2 / 8, which gives sqrt(2 * a * error) - a * dt / 2. Within a * dt ** 2 / 2 of the target, where
+            # that bound drops below error / dt, the joint lands on the target in one tick and stops in the next.
+            np.multiply(2 * acceleration, np.abs(error), out=bound)
+            np.sqrt(bound, out=bound)
+            bound -= half_step
+            np.copyto(bound, np.abs(error) * self.rate, where=np.abs(error) <= half_step * dt)
+            np.minimum(bound, velocity_limit, out=bound)
+            np.multiply(error, self.rate, out=desired)
+            np.clip(desired, -bound, bound, out=desired)
+            np.clip(desired, velocity - acceleration_step, velocity + acceleration_step, out=velocity)
+
+            position += velocity * dt
+            out[frame] = position
+
+        return out
+
+
+class TrajectoryFilter:
+
+    """ Resampling to the control rate followed by rate limiting. Without rate_in the input is taken to be at the
+    control rate already and only limited."""
+
+    __slots__ = {"resampler",
+                 "limiter"}
+
+    def __init__(self, limits: MotionLimits = MotionLimits(), rate: float = 200, rate_in: Optional[float] = None):
+
+        self.resampler = Resampler(rate_in, rate) if rate_in is not None and rate_in != rate else None
+        self.limiter = RateLimiter(limits, rate)
+
+    def reset(self, angles: Optional[np.ndarray] = None):
+
+        if self.resampler is not None:
+            self.resampler.reset()
+
+        self.limiter.reset(angles)
+
+    def output_frames(self, frames: int) -> int:
+
+        """ Number of frames at the control rate produced from a trajectory of the given length, after a reset."""
+
+        if self.resampler is None or frames == 0:
+            return frames
+
+        return int(np.floor((frames - 1) * self.resampler.rate_out / self.resampler.rate_in + 1e-9)) + 1
+
+    def process(self, angles: np.ndarray) -> np.ndarray:
+
+        """ Filter the next (n, legs, 3) chunk of angles, returns the frames at the control rate it produced."""
+
+        if self.resampler is not None:
+            angles = self.resampler.process(angles)
+
+        return self.limiter.process(angles)
+
+    def stream(self, chunks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+
+        """ Filter an iterable of chunks lazily, e.g. slices of TrajectoryReader.angles, yielding one output chunk per
+        input chunk."""
+
+        for chunk in chunks:
+            yield self.process(chunk)
+
+
+def smooth_trajectory(angles: np.ndarray, rate: float, limits: MotionLimits = MotionLimits(),
+                      rate_in: Optional[float] = None, chunk_frames: int = 65536,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
+
+    """ Filter a whole (N, legs, 3) trajectory, e.g. a memory mapped recording, chunk by chunk. Returns the angles at
+    the control rate, see TrajectoryFilter.
+
+    The result is concatenated in memory unless out is given, e.g. a np.memmap of TrajectoryFilter.output_frames(N)
+    frames, which is then written chunk by chunk and returned, so memory stays bounded by the chunk size. For input of
+    unknown length use TrajectoryFilter.stream instead."""
+
+    trajectory = TrajectoryFilter(limits, rate, rate_in)
+    chunks = (angles[start:start + chunk_frames] for start in range(0, angles.shape[0], chunk_frames))
+
+    if out is None:
+        return np.concatenate(list(trajectory.stream(chunks)) or [np.empty((0,) + angles.shape[1:])])
+
+    expected = (trajectory.output_frames(angles.shape[0]),) + angles.shape[1:]
+
+    if out.shape != expected:
+        raise ValueError(f"Expected an output array of shape {expected}, got {out.shape}.")
+
+    written = 0
+
+    # The limiter writes straight into out, only the resampled chunk is a temporary.
+    for chunk in chunks:
+        if trajectory.resampler is not None:
+            chunk = trajectory.resampler.process(chunk)
+
+        trajectory.limiter.process(chunk, out[written:written + chunk.shape[0]])
+        written += chunk.shape[0]
+
+    return out
@@ -1,7 +1,52 @@
 from .inverse_kinematics import *
+from .forward_kinematics import joints_from_angles, feet_from_angles, chain_feet_from_angles, round_trip_error, \
+    rotation_from_euler
 from .robot import *
+from .numerical import ChainKinematics, ChainSolution, solve_chain_dls
+from .gait import GaitGenerator, GaitTable, GAITS
+from .cache import OffsetCache, OffsetGrid
+from .workspace import LegWorkspace, Workspace
+from .tracking import OffsetTracker
+from .stability import SupportPolygon, support_polygon, ground_contacts, body_center
+from .config import RobotConfig, LegConfig, CompiledGeometry
+from .fleet import FleetSimulator, FleetResult, RobotDesign, design_grid
 
 __all__ = ["LegKinematics",
+           "HexapodKinematics",
+           "IKSolution",
+           "solve_leg_angles",
+           "solve_leg_candidates",
+           "select_candidates",
+           "wrap_angles",
+           "JointLimits",
+           "WarmStartSolver",
+           "ChainKinematics",
+           "ChainSolution",
+           "solve_chain_dls",
+           "joints_from_angles",
+           "feet_from_angles",
+           "chain_feet_from_angles",
+           "round_trip_error",
+           "rotation_from_euler",
            "Leg",
            "Core",
-           "Hexapod"]
\ No newline at end of file
+           "Hexapod",
+           "GaitGenerator",
+           "GaitTable",
+           "GAITS",
+           "OffsetCache",
+           "OffsetGrid",
+           "LegWorkspace",
+           "Workspace",
+           "OffsetTracker",
+           "SupportPolygon",
+           "support_polygon",
+           "ground_contacts",
+           "body_center",
+           "RobotConfig",
+           "LegConfig",
+           "CompiledGeometry",
+           "FleetSimulator",
+           "FleetResult",
+           "RobotDesign",
+           "design_grid"]
\ No newline at end of file
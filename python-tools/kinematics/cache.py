@@ -0,0 +1,166 @@
+import itertools
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Sequence, Union
+from .inverse_kinematics import HexapodKinematics, IKSolution
+import utils
+
+
+"""Memoization layers in front of the batched leg inverse kinematics. OffsetCache remembers the solutions of recently
+requested body offsets, rounded to a quantum, with least recently used eviction. OffsetGrid solves a dense grid of
+offsets up front and answers lookups by trilinear interpolation between the grid points."""
+
+
+class OffsetCache:
+
+    """ Bounded LRU cache of solutions keyed by the leg geometry, the offset mode and the quantized offset. Offsets are
+    rounded to the nearest multiple of quantum before solving, so every offset within the same cell gets the same
+    answer. A single cache can serve several models, entries of different geometries never collide."""
+
+    __slots__ = {"_quantum",
+                 "_capacity",
+                 "_entries",
+                 "hits",
+                 "misses"}
+
+    def __init__(self, quantum: float = 0.01, capacity: int = 4096):
+
+        if quantum <= 0 or capacity <= 0:
+            raise ValueError("Cache quantum and capacity have to be positive.")
+
+        self._quantum: float = quantum
+        self._capacity: int = capacity
+        self._entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def quantize(self, offsets: np.ndarray) -> np.ndarray:
+
+        """ The offset the cache actually solves for instead of the given one, callers moving the body along with the
+        legs have to move it by this one, or the feet drift by up to half a quantum."""
+
+        return self._cell(offsets) * self._quantum
+
+    def _cell(self, offsets: np.ndarray) -> np.ndarray:
+        return np.rint(np.asarray(offsets, dtype=float) / self._quantum).astype(np.int64)
+
+    @utils.profiled
+    def angles_from_rel_position(self, kinematics: HexapodKinematics, offsets: np.ndarray,
+                                 foot_fixed: bool = False) -> IKSolution:
+
+        """ Cached HexapodKinematics.angles_from_rel_position for a single (3,) body offset, solved at the offset
+        returned by quantize. The returned arrays are shared with the cache and therefore read only."""
+
+        cell = self._cell(offsets)
+        key = (kinematics.geometry_key, foot_fixed, cell.tobytes())
+
+        solution = self._entries.get(key)
+
+        if solution is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return solution
+
+        self.misses += 1
+
+        angles, reachable = kinematics.angles_from_rel_position(cell * self._quantum, foot_fixed)
+        angles.flags.writeable = False
+        reachable.flags.writeable = False
+
+        solution = self._entries[key] = IKSolution(angles, reachable)
+
+        if len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+        return solution
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+
+        requests = self.hits + self.misses
+
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "size": len(self._entries),
+                "capacity": self._capacity}
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class OffsetGrid:
+
+    """ Solutions precomputed on a dense grid of body offsets spanning the box between lower and upper, with resolution
+    points along every axis. Lookups inside the box interpolate trilinearly between the 8 surrounding grid points, cells
+    touching an unreachable grid point are reported unreachable. Offsets outside of the box are solved directly."""
+
+    __slots__ = {"_kinematics",
+                 "_foot_fixed",
+                 "_lower",
+                 "_upper",
+                 "_step",
+                 "_shape",
+                 "angles",
+                 "reachable"}
+
+    def __init__(self, kinematics: HexapodKinematics, lower: Sequence[float], upper: Sequence[float],
+                 resolution: Union[int, Sequence[int]] = 21, foot_fixed: bool = False):
+
+        self._kinematics = kinematics
+        self._foot_fixed = foot_fixed
+        self._lower = np.asarray(lower, dtype=float)
+        self._upper = np.asarray(upper, dtype=float)
+        self._shape = tuple(np.broadcast_to(resolution, 3).astype(int))
+
+        if min(self._shape) < 2 or (self._upper <= self._lower).any():
+            raise ValueError("The grid needs at least 2 points along every axis of a non empty box.")
+
+        self._step = (self._upper - self._lower) / (np.array(self._shape) - 1)
+
+        axes = [np.linspace(low, high, points) for low, high, points in zip(self._lower, self._upper, self._shape)]
+        offsets = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1)
+
+        # One batched solve for the whole grid, (nx, ny, nz, legs, 3).
+        self.angles, self.reachable = kinematics.angles_from_rel_position(offsets[..., np.newaxis, :], foot_fixed)
+
+    @utils.profiled
+    def angles_from_rel_position(self, offsets: np.ndarray) -> IKSolution:
+
+        """ Interpolated angles for body offsets of shape (..., 3), returned with shape (..., legs, 3)."""
+
+        offsets = np.asarray(offsets, dtype=float)
+
+        position = (offsets - self._lower) / self._step
+        inside = ((position >= 0) & (position <= np.array(self._shape) - 1)).all(axis=-1)
+
+        index = np.clip(np.floor(position).astype(int), 0, np.array(self._shape) - 2)
+        weight = np.clip(position - index, 0, 1)
+
+        base = self.angles[index[..., 0], index[..., 1], index[..., 2]]
+        delta = np.zeros(base.shape)
+
+        for corner in itertools.product((0, 1), repeat=3):
+            if not any(corner):
+                continue
+
+            corner_weight = np.prod(np.where(corner, weight, 1 - weight), axis=-1)[..., np.newaxis, np.newaxis]
+            corner_index = index + corner
+            corner_angles = self.angles[corner_index[..., 0], corner_index[..., 1], corner_index[..., 2]]
+
+            # Differences along the shorter arc, so legs pointing backwards do not spin around +-pi.
+            delta += corner_weight * (np.mod(corner_angles - base + np.pi, 2 * np.pi) - np.pi)
+
+        angles = np.mod(base + delta + np.pi, 2 * np.pi) - np.pi
+        reachable = ~np.isnan(angles).any(axis=-1)
+
+        if not inside.all():
+            exact = self._kinematics.angles_from_rel_position(offsets[~inside][..., np.newaxis, :], self._foot_fixed)
+            angles[~inside] = exact.angles
+            reachable[~inside] = exact.reachable
+
+        return IKSolution(angles, reachable)
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import numpy as np
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Tuple
+from .forward_kinematics import joints_from_angles, rotation_from_euler
+from .inverse_kinematics import HexapodKinematics, JointLimits, WarmStartSolver
+from .robot import Core, Hexapod
+from .workspace import Workspace
+import utils
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+
+
+"""Robot geometry as data. A RobotConfig holds the core dimensions, the lengths, mounting angle and default pose of
+every leg and the joint limits, and is stored as JSON with angles in degrees:
+
+    {"core": {"length": 20, "width": 20, "front": 15},
+     "legs": [{"femur": 20, "tibia": 40, "mount": 0, "femur_angle": 45, "tibia_angle": -90}, ...],
+     "limits": {"coxa": [-90, 90], "femur": [-120, 120], "tibia": [-120, 120]}}
+
+Compiling a config runs the forward kinematics of the default pose once and stores the resulting arrays on disk under
+the hash of the config, so later starts load them instead of solving, and within a process every config is compiled
+only once."""
+
+
+FORMAT_VERSION = 2
+
+
+class LegConfig(NamedTuple):
+
+    """ Limb lengths and default pose of one leg, the mounting direction and the default joint angles in degrees."""
+
+    femur: float
+    tibia: float
+    mount: float
+    femur_angle: float = 45
+    tibia_angle: float = -90
+
+
+class RobotConfig(NamedTuple):
+
+    length: float
+    width: float
+    front: float
+    legs: Tuple[LegConfig, ...]
+    limits: JointLimits = JointLimits()
+
+    @classmethod
+    def default(cls, femur: float = 20, tibia: float = 40) -> "RobotConfig":
+
+        """ The robot of the previews, six equal legs mounted 60 degrees apart."""
+
+        return cls(20, 20, 15, tuple(LegConfig(femur, tibia, 60 * index) for index in range(6)))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RobotConfig":
+
+        core = data["core"]
+        legs = tuple(LegConfig(**leg) for leg in data["legs"])
+        limits = JointLimits(**{joint: tuple(np.radians(bounds)) for joint, bounds in data.get("limits", {}).items()})
+
+        if not 1 <= len(legs) <= 6:
+            raise ValueError(f"A robot config needs between 1 and 6 legs, got {len(legs)}.")
+
+        return cls(float(core["length"]), float(core["width"]), float(core["front"]), legs, limits)
+
+    def to_dict(self) -> Dict:
+
+        return {"core": {"length": float(self.length), "width": float(self.width), "front": float(self.front)},
+                "legs": [{field: float(value) for field, value in leg._asdict().items()} for leg in self.legs],
+                # Rounded, the limits are stored in radians and 120 degrees would come back as 119.99999999999999.
+                "limits": {joint: [round(float(bound), 9) for bound in np.degrees(bounds)]
+                           for joint, bounds in self.limits._asdict().items()}}
+
+    @classmethod
+    def load(cls, path: str) -> "RobotConfig":
+
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+    def save(self, path: str):
+
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def key(self) -> str:
+
+        """ Hash of the canonical JSON of the config, equal configs have equal keys however their files are
+        formatted."""
+
+        canonical = json.dumps({"version": FORMAT_VERSION, "config": self.to_dict()}, sort_keys=True)
+
+        return hashlib.sha1(canonical.encode()).hexdigest()
+
+    def compile(self, cache_dir: Optional[str] = None) -> "CompiledGeometry":
+        return CompiledGeometry.load_or_compute(self, cache_dir)
+
+
+# Geometries compiled in this process, by config key.
+_compiled: Dict[str, "CompiledGeometry"] = {}
+
+
+class CompiledGeometry:
+
+    """ Read only arrays of the default pose of a config: the (7, 3) core vertices, the (legs, 3, 3) leg joints, the
+    (legs, 3) angles in radians, the limb lengths and the (legs, 4, 4) mount transforms from the frame of every leg
+    (origin at its core vertex, x along its mounting direction) to the body frame. Robots, kinematics models, solvers
+    and workspaces are built from them and the joint limits of the config without running the forward kinematics,
+    their own buffers being filled by copying."""
+
+    __slots__ = {"config",
+                 "key",
+                 "core_positions",
+                 "leg_joints",
+                 "leg_angles",
+                 "femur_lengths",
+                 "tibia_lengths",
+                 "mount_transforms"}
+
+    _FIELDS = ("core_positions", "leg_joints", "leg_angles", "femur_lengths", "tibia_lengths", "mount_transforms")
+
+    def __init__(self, config: RobotConfig, arrays: Dict[str, np.ndarray]):
+
+        self.config = config
+        self.key = config.key()
+
+        for name in self._FIELDS:
+            array = np.array(arrays[name], dtype=float)
+            array.flags.writeable = False
+            setattr(self, name, array)
+
+    @classmethod
+    def compute(cls, config: RobotConfig) -> "CompiledGeometry":
+
+        core = Core(None, config.length, config.width, config.front)
+        legs = len(config.legs)
+        femur = np.array([leg.femur for leg in config.legs])
+        tibia = np.array([leg.tibia for leg in config.legs])
+        angles = np.radians([(leg.mount, leg.femur_angle, leg.tibia_angle) for leg in config.legs])
+
+        mounts = np.zeros((legs, 4, 4))
+        mounts[:, :3, :3] = rotation_from_euler(np.stack((np.zeros(legs), np.zeros(legs), angles[:, 0]), -1))
+        mounts[:, :3, 3] = core.positions[1:legs + 1]
+        mounts[:, 3, 3] = 1
+
+        return cls(config, {"core_positions": core.positions,
+                            "leg_joints": joints_from_angles(core.positions[1:legs + 1], angles, femur, tibia),
+                            "leg_angles": angles,
+                            "femur_lengths": femur,
+                            "tibia_lengths": tibia,
+                            "mount_transforms": mounts})
+
+    @classmethod
+    def load_or_compute(cls, config: RobotConfig, cache_dir: Optional[str] = None) -> "CompiledGeometry":
+
+        """ The compiled geometry of the config, from this process, then from the cache directory, computing and
+        storing it on a miss."""
+
+        key = config.key()
+
+        if key in _compiled:
+            return _compiled[key]
+
+        directory = cache_dir if cache_dir is not None else utils.cache_directory("geometry")
+        path = os.path.join(directory, f"{key}.npz")
+
+        if os.path.exists(path):
+            with np.load(path) as data:
+                geometry = cls(config, {name: data[name] for name in cls._FIELDS})
+
+        else:
+            geometry = cls.compute(config)
+
+            utils.save_arrays(path, **{name: getattr(geometry, name) for name in cls._FIELDS})
+
+        _compiled[key] = geometry
+
+        return geometry
+
+    @property
+    def legs(self) -> int:
+        return self.leg_angles.shape[0]
+
+    @property
+    def limits(self) -> JointLimits:
+        return self.config.limits
+
+    def build_robot(self, ax: Optional["Axes"] = None) -> Hexapod:
+
+        """ Hexapod in the default pose of the config, drawn on the axes if given."""
+
+        robot = Hexapod(Core(ax, self.config.length, self.config.width, self.config.front))
+
+        for leg, joints in zip(self.config.legs, self.leg_joints):
+            robot.add_leg(leg.femur, leg.tibia, leg.mount, leg.femur_angle, leg.tibia_angle, solved_joints=joints)
+
+        return robot
+
+    def kinematics(self) -> HexapodKinematics:
+
+        """ Batched inverse kinematics model referenced to the default pose."""
+
+        model = HexapodKinematics(self.femur_lengths, self.tibia_lengths)
+        model.set_default_position(self.leg_joints)
+        model.center = self.core_positions[0].copy()
+
+        return model
+
+    def warm_start_solver(self) -> WarmStartSolver:
+
+        """ Joint limit aware solver with the limits of the config, warm started from the default pose."""
+
+        return WarmStartSolver(self.kinematics(), self.limits, self.leg_angles)
+
+    def workspace(self, voxel: float = 1.0, cache_dir: Optional[str] = None) -> Workspace:
+
+        """ Reachability of the legs within the limits of the config."""
+
+        return Workspace(self.kinematics(), self.limits, voxel, cache_dir)
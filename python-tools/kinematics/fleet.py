@@ -0,0 +1,173 @@
+import os
+import time
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from .forward_kinematics import joints_from_angles, rotation_from_euler
+from .inverse_kinematics import HexapodKinematics
+from .robot import Core, Hexapod
+
+
+"""Design space sweeps over many robot geometries. Every design is built as a headless Hexapod and driven through the
+same body trajectory, designs are split into chunks which worker processes solve in bulk. The workers write angles,
+joints and reachability straight into shared memory blocks allocated by the parent, so only chunk indices travel through
+the pool."""
+
+
+class RobotDesign(NamedTuple):
+    length: float
+    width: float
+    front: float
+    femur: float
+    tibia: float
+
+
+class FleetResult(NamedTuple):
+
+    """ Arrays of shape (designs, frames, 6, 3), (designs, frames, 6, 3, 3) and (designs, frames, 6), in the order of
+    the designs, with the solve time of each design in seconds."""
+
+    angles: np.ndarray
+    joints: np.ndarray
+    reachable: np.ndarray
+    seconds: np.ndarray
+
+
+def build_design(design: RobotDesign) -> Tuple[Hexapod, HexapodKinematics]:
+
+    """ Headless robot of the design, in its default position, and its batched kinematics model."""
+
+    robot = Hexapod(Core(None, design.length, design.width, design.front))
+
+    for _ in range(6):
+        robot.add_leg(design.femur, design.tibia)
+
+    return robot, HexapodKinematics.from_hexapod(robot)
+
+
+def simulate_design(design: RobotDesign, poses: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+
+    """ Angles, joints and reachability of the design for (frames, 6) body poses with the feet fixed."""
+
+    robot, model = build_design(design)
+    angles, reachable = model.angles_from_pose(poses)
+
+    rotations = rotation_from_euler(poses[:, 3:])
+    center = robot.core_vertices[0]
+    origins = (robot.core_vertices[1:] - center) @ np.swapaxes(rotations, -1, -2) + center + poses[:, np.newaxis, :3]
+    joints = joints_from_angles(origins, angles, model.femur_lengths, model.tibia_lengths, rotations=rotations)
+
+    return angles, joints, reachable
+
+
+# Per worker state, set once by the pool initializer.
+_worker: Dict[str, object] = {}
+
+
+def _attach(names: Sequence[str], shapes: Sequence[Tuple[int, ...]], dtypes: Sequence[str], designs: np.ndarray,
+            poses: np.ndarray):
+
+    from multiprocessing import shared_memory
+
+    segments = [shared_memory.SharedMemory(name=name) for name in names]
+
+    _worker["segments"] = segments
+    _worker["arrays"] = [np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+                         for shape, dtype, segment in zip(shapes, dtypes, segments)]
+    _worker["designs"] = designs
+    _worker["poses"] = poses
+
+
+def _simulate_range(arrays: Sequence[np.ndarray], designs: np.ndarray, poses: np.ndarray, bounds: Tuple[int, int]):
+
+    angles, joints, reachable, seconds = arrays
+
+    for index in range(*bounds):
+        start = time.perf_counter()
+        angles[index], joints[index], reachable[index] = simulate_design(RobotDesign(*designs[index]), poses)
+        seconds[index] = time.perf_counter() - start
+
+
+def _simulate_chunk(bounds: Tuple[int, int]) -> int:
+
+    _simulate_range(_worker["arrays"], _worker["designs"], _worker["poses"], bounds)
+
+    return bounds[1] - bounds[0]
+
+
+class FleetSimulator:
+
+    """ Runs a trajectory on every design across a pool of worker processes, the number of CPUs by default. With one
+    worker everything runs in the calling process, which is the baseline for scaling measurements."""
+
+    __slots__ = {"designs",
+                 "workers",
+                 "chunk_size"}
+
+    def __init__(self, designs: Sequence[RobotDesign], workers: Optional[int] = None,
+                 chunk_size: Optional[int] = None):
+
+        self.designs = np.array([tuple(design) for design in designs], dtype=float).reshape(-1, 5)
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        # A few chunks per worker balance the load without making the chunks tiny.
+        self.chunk_size = chunk_size if chunk_size is not None else max(1, -(-len(self.designs) // (4 * self.workers)))
+
+    def run(self, trajectory: np.ndarray) -> FleetResult:
+
+        """ Simulate a (frames, 3) body offset or a (frames, 6) body pose trajectory, feet fixed, on all designs. The
+        returned arrays are copied out of the shared memory, which is released before returning."""
+
+        trajectory = np.asarray(trajectory, dtype=float)
+        poses = np.zeros((trajectory.shape[0], 6))
+        poses[:, :trajectory.shape[1]] = trajectory
+
+        count = len(self.designs)
+        frames = poses.shape[0]
+        layout = [((count, frames, 6, 3), "f8"),
+                  ((count, frames, 6, 3, 3), "f8"),
+                  ((count, frames, 6), "?"),
+                  ((count,), "f8")]
+
+        if self.workers <= 1:
+            arrays = [np.empty(shape, dtype=dtype) for shape, dtype in layout]
+            _simulate_range(arrays, self.designs, poses, (0, count))
+
+            return FleetResult(*arrays)
+
+        # The pool machinery is imported here, not with the package, it costs more than the rest of kinematics.
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import shared_memory
+
+        segments: List["shared_memory.SharedMemory"] = []
+
+        try:
+            for shape, dtype in layout:
+                segments.append(shared_memory.SharedMemory(create=True,
+                                                           size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)))
+
+            chunks = [(start, min(start + self.chunk_size, count)) for start in range(0, count, self.chunk_size)]
+
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_attach,
+                                     initargs=([segment.name for segment in segments], [shape for shape, _ in layout],
+                                               [dtype for _, dtype in layout], self.designs, poses)) as pool:
+                solved = sum(pool.map(_simulate_chunk, chunks))
+
+            if solved != count:
+                raise RuntimeError(f"Workers solved {solved} of {count} designs.")
+
+            return FleetResult(*(np.ndarray(shape, dtype=dtype, buffer=segment.buf).copy()
+                                 for (shape, dtype), segment in zip(layout, segments)))
+
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+
+def design_grid(lengths: Sequence[float], widths: Sequence[float], fronts: Sequence[float], femurs: Sequence[float],
+                tibias: Sequence[float]) -> List[RobotDesign]:
+
+    """ Cartesian product of the parameter values, e.g. for a sweep over leg geometries."""
+
+    mesh = np.meshgrid(lengths, widths, fronts, femurs, tibias, indexing="ij")
+
+    return [RobotDesign(*values) for values in np.stack([axis.ravel() for axis in mesh], axis=-1)]
@@ -0,0 +1,127 @@
+import numpy as np
+from typing import Optional
+import utils
+
+
+"""Vectorized forward kinematics of the coxa/femur/tibia legs. Works on any number of legs and poses at once and is
+the exact inverse of solve_leg_angles, which makes it usable both for the per frame robot updates and for validating
+inverse kinematics output in bulk."""
+
+
+def rotation_from_euler(rotations: np.ndarray) -> np.ndarray:
+
+    """ Rotation matrices of shape (..., 3, 3) for (roll, pitch, yaw) angles of shape (..., 3), in radians. The body is
+    rotated about x by roll, then about y by pitch and last about z by yaw, R = Rz(yaw) @ Ry(pitch) @ Rx(roll)."""
+
+    rotations = np.asarray(rotations, dtype=float)
+
+    cos = np.cos(rotations)
+    sin = np.sin(rotations)
+    cos_r, cos_p, cos_y = cos[..., 0], cos[..., 1], cos[..., 2]
+    sin_r, sin_p, sin_y = sin[..., 0], sin[..., 1], sin[..., 2]
+
+    matrix = np.empty(rotations.shape[:-1] + (3, 3))
+    matrix[..., 0, 0] = cos_y * cos_p
+    matrix[..., 0, 1] = cos_y * sin_p * sin_r - sin_y * cos_r
+    matrix[..., 0, 2] = cos_y * sin_p * cos_r + sin_y * sin_r
+    matrix[..., 1, 0] = sin_y * cos_p
+    matrix[..., 1, 1] = sin_y * sin_p * sin_r + cos_y * cos_r
+    matrix[..., 1, 2] = sin_y * sin_p * cos_r - cos_y * sin_r
+    matrix[..., 2, 0] = -sin_p
+    matrix[..., 2, 1] = cos_p * sin_r
+    matrix[..., 2, 2] = cos_p * cos_r
+
+    return matrix
+
+
+@utils.profiled
+def joints_from_angles(origins: np.ndarray, angles: np.ndarray, femur_lengths, tibia_lengths,
+                       out: Optional[np.ndarray] = None, rotations: Optional[np.ndarray] = None) -> np.ndarray:
+
+    """ Joint positions (origin, knee, foot) for (leg, femur, tibia) angles of shape (..., legs, 3), typically
+    (N, 6, 3). Origins broadcast against the angles and the femur and tibia lengths against (legs,). Returns an array
+    of shape (..., legs, 3, 3), written into out when given.
+
+    The angles are measured in the body frame. For a rotated body pass its rotation matrices, (3, 3) or (..., 3, 3)
+    with one matrix per pose, to turn the links into the world frame; the origins are world positions either way."""
+
+    angles = np.asarray(angles, dtype=float)
+    femur = np.asarray(femur_lengths, dtype=float)
+    tibia = np.asarray(tibia_lengths, dtype=float)
+
+    if out is None:
+        out = np.empty(angles.shape[:-1] + (3, 3))
+
+    leg_ang = angles[..., 0]
+    femur_ang = angles[..., 1]
+    tibia_ang = femur_ang + angles[..., 2]
+
+    leg_cos = np.cos(leg_ang)
+    leg_sin = np.sin(leg_ang)
+
+    femur_xy = femur * np.cos(femur_ang)
+    tibia_xy = tibia * np.cos(tibia_ang)
+
+    out[..., 0, :] = origins
+    out[..., 1, 0] = femur_xy * leg_cos
+    out[..., 1, 1] = femur_xy * leg_sin
+    out[..., 1, 2] = femur * np.sin(femur_ang)
+    out[..., 2, 0] = tibia_xy * leg_cos
+    out[..., 2, 1] = tibia_xy * leg_sin
+    out[..., 2, 2] = tibia * np.sin(tibia_ang)
+
+    if rotations is not None:
+        # Row vectors, v @ R.T == (R @ v).T, one matrix per pose shared by all its legs and links.
+        out[..., 1:, :] = out[..., 1:, :] @ np.swapaxes(rotations, -1, -2)[..., np.newaxis, :, :]
+
+    # Link vectors to positions.
+    out[..., 1, :] += out[..., 0, :]
+    out[..., 2, :] += out[..., 1, :]
+
+    return out
+
+
+def feet_from_angles(angles: np.ndarray, femur_lengths, tibia_lengths) -> np.ndarray:
+
+    """ Foot positions relative to the leg origins, shape (..., legs, 3). Cheaper than joints_from_angles when only
+    the feet are needed."""
+
+    angles = np.asarray(angles, dtype=float)
+    femur_lengths = np.asarray(femur_lengths, dtype=float)
+    tibia_lengths = np.asarray(tibia_lengths, dtype=float)
+
+    leg_ang = angles[..., 0]
+    femur_ang = angles[..., 1]
+    tibia_ang = femur_ang + angles[..., 2]
+
+    reach = femur_lengths * np.cos(femur_ang) + tibia_lengths * np.cos(tibia_ang)
+
+    return np.stack((reach * np.cos(leg_ang),
+                     reach * np.sin(leg_ang),
+                     femur_lengths * np.sin(femur_ang) + tibia_lengths * np.sin(tibia_ang)), axis=-1)
+
+
+def round_trip_error(targets: np.ndarray, angles: np.ndarray, femur_lengths, tibia_lengths) -> np.ndarray:
+
+    """ Distance between the targets given to the inverse kinematics, relative to the leg origins, and the feet
+    reached by the solved angles, shape (..., legs). Unreachable legs with NaN angles give NaN errors."""
+
+    return np.linalg.norm(feet_from_angles(angles, femur_lengths, tibia_lengths) - targets, axis=-1)
+
+
+def chain_feet_from_angles(angles: np.ndarray, link_lengths) -> np.ndarray:
+
+    """ Foot positions relative to the leg origins for legs of any number of links, shape (..., legs, 3). The first of
+    the (..., legs, links + 1) angles turns the leg about z, the others are the pitch joints of the links in the leg
+    plane, each relative to the previous link, e.g. (leg, femur, tibia, tarsus). Link lengths broadcast against
+    (legs, links). With two links this is feet_from_angles."""
+
+    angles = np.asarray(angles, dtype=float)
+    link_lengths = np.asarray(link_lengths, dtype=float)
+
+    pitch = np.cumsum(angles[..., 1:], axis=-1)
+    reach = np.sum(link_lengths * np.cos(pitch), axis=-1)
+
+    return np.stack((reach * np.cos(angles[..., 0]),
+                     reach * np.sin(angles[..., 0]),
+                     np.sum(link_lengths * np.sin(pitch), axis=-1)), axis=-1)
@@ -0,0 +1,130 @@
+import numpy as np
+from typing import Dict, Tuple
+from .inverse_kinematics import HexapodKinematics
+
+
+"""Periodic gaits for the six legged robot. A gait cycle is sampled once into foot trajectories, solved through the
+batched inverse kinematics in a single call and stored as a (frames, 6, 3) float32 joint angles table, so playback is a
+table lookup instead of a per frame solve.
+
+Legs are indexed in the order of Hexapod.add_leg, which goes around the body counterclockwise starting from the middle
+right leg: 0 middle right, 1 front right, 2 front left, 3 middle left, 4 rear left, 5 rear right."""
+
+
+# Fraction of the cycle at which every leg starts its swing, and the fraction of the cycle spent on the ground.
+GAITS: Dict[str, Tuple[Tuple[float, ...], float]] = {
+    "tripod": ((0, 1 / 2, 0, 1 / 2, 0, 1 / 2), 1 / 2),
+    "ripple": ((1 / 3, 2 / 3, 1 / 6, 5 / 6, 1 / 2, 0), 2 / 3),
+    "wave": ((1 / 6, 2 / 6, 5 / 6, 4 / 6, 3 / 6, 0), 5 / 6),
+}
+
+
+class GaitTable:
+
+    """ Precomputed joint angles of one gait cycle. Frames are evenly spaced over the period and the cycle wraps
+    around, so angles_at accepts any time."""
+
+    __slots__ = {"angles",
+                 "reachable",
+                 "period"}
+
+    def __init__(self, angles: np.ndarray, reachable: np.ndarray, period: float):
+        self.angles: np.ndarray = np.ascontiguousarray(angles, dtype=np.float32)
+        self.reachable: np.ndarray = reachable
+        self.period: float = period
+
+    @property
+    def frames(self) -> int:
+        return self.angles.shape[0]
+
+    def frame(self, index: int) -> np.ndarray:
+        return self.angles[index % self.frames]
+
+    def angles_at(self, time) -> np.ndarray:
+
+        """ Linearly interpolated angles at the given time in seconds, or at an array of times. Interpolation goes
+        along the shorter arc, so legs pointing backwards do not spin when their angle wraps around +-pi."""
+
+        position = np.mod(np.asarray(time, dtype=float) / self.period, 1.0) * self.frames
+        index = np.floor(position).astype(int)
+        weight = (position - index)[..., np.newaxis, np.newaxis]
+
+        start = self.angles[index % self.frames].astype(float)
+        stop = self.angles[(index + 1) % self.frames]
+        delta = np.mod(stop - start + np.pi, 2 * np.pi) - np.pi
+
+        return start + weight * delta
+
+
+class GaitGenerator:
+
+    """ Foot trajectories of a periodic gait. During the swing the foot travels step_length forward along the heading
+    (in radians, 0 is the +x direction) on a half sine arc of step_height. During the stance it moves back linearly on
+    the ground, which propels the body forward."""
+
+    __slots__ = {"gait",
+                 "step_length",
+                 "step_height",
+                 "period",
+                 "frames",
+                 "heading"}
+
+    def __init__(self, gait: str = "tripod", step_length: float = 10, step_height: float = 5, period: float = 1.0,
+                 frames: int = 60, heading: float = np.pi / 2):
+
+        if gait not in GAITS:
+            raise ValueError(f"Unknown gait {gait}, choose one of: {', '.join(GAITS)}.")
+
+        self.gait = gait
+        self.step_length = step_length
+        self.step_height = step_height
+        self.period = period
+        self.frames = frames
+        self.heading = heading
+
+    def _phase(self) -> np.ndarray:
+
+        """ Position of every leg in its own cycle, starting with the swing, shape (frames, 6)."""
+
+        cycle = np.arange(self.frames)[:, np.newaxis] / self.frames
+
+        return np.mod(cycle - np.array(GAITS[self.gait][0]), 1.0)
+
+    def contacts(self) -> np.ndarray:
+
+        """ (frames, 6) mask of the legs standing on the ground, e.g. the grounded feet for support_polygon."""
+
+        return self._phase() >= 1 - GAITS[self.gait][1]
+
+    def foot_offsets(self) -> np.ndarray:
+
+        """ Offsets of all feet from their default position over one cycle, shape (frames, 6, 3)."""
+
+        swing_start, duty_factor = GAITS[self.gait]
+        swing_duration = 1 - duty_factor
+
+        phase = self._phase()
+
+        swinging = phase < swing_duration
+        swing = np.clip(phase / swing_duration, 0, 1)
+        stance = np.clip((phase - swing_duration) / duty_factor, 0, 1)
+
+        stride = np.where(swinging, -np.cos(np.pi * swing) / 2, 0.5 - stance) * self.step_length
+
+        offsets = np.empty((self.frames, len(swing_start), 3))
+        offsets[..., 0] = stride * np.cos(self.heading)
+        offsets[..., 1] = stride * np.sin(self.heading)
+        offsets[..., 2] = np.where(swinging, self.step_height * np.sin(np.pi * swing), 0)
+
+        return offsets
+
+    def compile(self, kinematics: HexapodKinematics, clamp: bool = False) -> GaitTable:
+
+        """ Solve the whole cycle for the legs of the given model in one batched call."""
+
+        if kinematics.legs != len(GAITS[self.gait][0]):
+            raise ValueError(f"The {self.gait} gait requires {len(GAITS[self.gait][0])} legs.")
+
+        angles, reachable = kinematics.angles_from_rel_position(self.foot_offsets(), False, clamp)
+
+        return GaitTable(angles, reachable, self.period)
@@ -1,7 +1,11 @@
+import math
+import warnings
 import numpy as np
 from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional, Sequence, Tuple
 from multipledispatch import dispatch
 import utils
+from .forward_kinematics import rotation_from_euler
 
 
 class _LimbKinematics(ABC):
@@ -27,7 +31,8 @@ class LegKinematics(_LimbKinematics):
                  "_tibia",
                  "_knee",
                  "_foot",
-                 "_floating"}
+                 "_floating",
+                 "_dynamic"}
 
     def __init__(self, femur_length, tibia_length):
 
@@ -40,77 +45,528 @@ class LegKinematics(_LimbKinematics):
         self._knee: np.ndarray = np.zeros(3)
         self._foot: np.ndarray = np.zeros(3)
         self.vertices: np.ndarray = np.zeros(3)
+        # Row 0 holds the accumulated dynamic offset of the target, row 1 its Kahan compensation.
+        self._dynamic: np.ndarray = np.zeros((2, 3))
 
     def set_default_position(self, joints_positions: np.ndarray):
-        self.origin = joints_positions[0]
-        self._knee = joints_positions[1]
-        self._foot = joints_positions[2]
+        # Copies, the joints of a robot leg are views into its state buffer which changes with every update.
+        self.origin = np.array(joints_positions[0], dtype=float)
+        self._knee = np.array(joints_positions[1], dtype=float)
+        self._foot = np.array(joints_positions[2], dtype=float)
         self.vertices = np.array((self.origin, self._knee, self._foot))
         self._floating = False
+        self.reset_dynamic_offset()
 
-    @dispatch(np.ndarray, bool, bool)
-    @utils.time_it
-    def angles_from_rel_position(self, offsets: np.ndarray, foot_fixed: bool, dynamic: bool) -> np.ndarray:
+    def reset_dynamic_offset(self):
+
+        """ Forget the offsets accumulated by dynamic calls, going back to the default position."""
+
+        self._dynamic = np.zeros((2, 3))
+
+    @utils.profiled
+    def angles_from_offset(self, offsets: np.ndarray, foot_fixed: bool = False, dynamic: bool = False) -> np.ndarray:
 
         """ Calculate the angles based on the offset of the leg from the current position. The offset can
-        can refer to the origin of the leg (shoulder) or the end of the leg (foot)."""
+        can refer to the origin of the leg (shoulder) or the end of the leg (foot). Returns NaN angles when the target
+        is unreachable."""
 
-        if not self._floating:
-            if dynamic:
-                # Dynamic offsets. <- this will eventually be the final version.
+        if self._floating:
+            raise RuntimeError("Before setting the leg offset, you have to establish a"
+                               " reference by calling set_default_position method.")
+
+        if dynamic:
+            # Dynamic offsets accumulate into the displacement of the target from the default one, like OffsetTracker
+            # does for all legs, so the default position itself is never modified.
+            utils.compensated_add(self._dynamic, (-1 if foot_fixed else 1) * np.asarray(offsets, dtype=float))
 
-                if foot_fixed:
-                    self.origin += offsets
-                else:
-                    self._foot += offsets
+            target = self._foot - self.origin + self._dynamic[0]
 
-                target = self._foot - self.origin
+        else:
+            # Static offsets.
+            if foot_fixed:
+                target = self._foot - offsets - self.origin
 
             else:
-                # Static offsets.
-                if foot_fixed:
-                    target = self._foot - offsets - self.origin
+                target = self._foot + offsets - self.origin
 
-                else:
-                    target = self._foot + offsets - self.origin
+        x, y, z = target.tolist()
 
-            if np.linalg.norm(target) > self._femur + self._tibia:
+        return self._solve(x, y, z)
 
-                print("Target position unreachable.")
-                return np.array((None, None, None))  # This is just for error handling.
+    @utils.profiled
+    def angles_from_positions(self, leg_origin_position: np.ndarray, foot_position: np.ndarray) -> np.ndarray:
 
-            else:
+        """ Calculate the angles from absolute positions of the leg origin and the foot. Does not depend on, nor modify,
+        the default position. Returns NaN angles when the target is unreachable."""
 
-                leg_proj = np.sqrt(target[0]**2 + target[1]**2)
-                origin_to_foot = np.sqrt(target[2]**2 + leg_proj**2)
+        x, y, z = (np.asarray(foot_position, dtype=float) - leg_origin_position).tolist()
 
-                beta_ang = np.arccos((origin_to_foot ** 2 + self._femur ** 2 - self._tibia ** 2) /
-                                     (2 * origin_to_foot * self._femur))
+        return self._solve(x, y, z)
 
-                gamma_ang = np.arccos((origin_to_foot ** 2 + self._tibia ** 2 - self._femur ** 2) /
-                                      (2 * self._tibia * origin_to_foot))
+    def _solve(self, x: float, y: float, z: float) -> np.ndarray:
 
-                alpha_ang = np.arcsin(np.abs(target[2])/origin_to_foot)
+        # Scalar version of solve_leg_angles, plain floats are much cheaper than numpy calls on 3 element arrays.
 
-                leg_ang = np.arccos(target[0] / leg_proj)
+        leg_proj = math.hypot(x, y)
+        origin_to_foot = math.hypot(z, leg_proj)
 
-                if target[2] > 0:
-                    alpha_ang *= -1
+        if not abs(self._femur - self._tibia) <= origin_to_foot <= self._femur + self._tibia or origin_to_foot == 0:
+            return np.full(3, np.nan)
 
-                femur_ang = beta_ang - alpha_ang
+        beta_ang = math.acos(min(1.0, max(-1.0, (origin_to_foot ** 2 + self._femur ** 2 - self._tibia ** 2) /
+                                          (2 * origin_to_foot * self._femur))))
 
-                tibia_ang = beta_ang + gamma_ang
+        gamma_ang = math.acos(min(1.0, max(-1.0, (origin_to_foot ** 2 + self._tibia ** 2 - self._femur ** 2) /
+                                           (2 * self._tibia * origin_to_foot))))
 
-                if target[1] < 0:
-                    leg_ang *= -1
+        alpha_ang = math.atan2(z, leg_proj)
 
-                result = np.array((leg_ang, femur_ang, -tibia_ang))
+        return np.array((math.atan2(y, x), beta_ang + alpha_ang, -(beta_ang + gamma_ang)))
 
-                return result
-        else:
-            raise RuntimeError("Before setting the leg offset, you have to establish a"
-                               " reference by calling set_default_position method.")
+    @dispatch(np.ndarray, bool, bool)
+    def angles_from_rel_position(self, offsets: np.ndarray, foot_fixed: bool, dynamic: bool) -> np.ndarray:
+
+        """ Dispatched entry point kept for compatibility, use angles_from_offset instead. Returns an array of None
+        when the target is unreachable."""
+
+        result = self.angles_from_offset(offsets, foot_fixed, dynamic)
+
+        if np.isnan(result[1]):
+            warnings.warn("Target position unreachable.", RuntimeWarning)
+            return np.array((None, None, None))  # This is just for error handling.
+
+        return result
 
     @dispatch(np.ndarray, np.ndarray)
     def angles_from_rel_position(self, leg_origin_position: np.ndarray, foot_position: np.ndarray) -> np.ndarray:
+
+        """ Dispatched entry point kept for compatibility, use angles_from_positions instead."""
+
+        return self.angles_from_positions(leg_origin_position, foot_position)
+
+
+class IKSolution(NamedTuple):
+
+    """ Float only result of the batched solver. Angles has the shape of the targets, reachable has the shape of the
+    targets without the last axis and tells, per leg and pose, whether the requested target lies in the workspace."""
+
+    angles: np.ndarray
+    reachable: np.ndarray
+
+
+class JointLimits(NamedTuple):
+
+    """ (lower, upper) bounds of the joints in radians. The coxa bounds are relative to the mounting angle of the leg,
+    the defaults match the ranges of the ForwardKinematicsPreview sliders."""
+
+    coxa: Tuple[float, float] = (-np.pi / 2, np.pi / 2)
+    femur: Tuple[float, float] = (-2 * np.pi / 3, 2 * np.pi / 3)
+    tibia: Tuple[float, float] = (-2 * np.pi / 3, 2 * np.pi / 3)
+
+    def within(self, angles: np.ndarray) -> np.ndarray:
+
+        """ Mask of shape (...) telling whether (..., 3) angles, coxa relative to the mount, respect the limits. NaN
+        angles never do."""
+
+        lower = np.array([self.coxa[0], self.femur[0], self.tibia[0]])
+        upper = np.array([self.coxa[1], self.femur[1], self.tibia[1]])
+
+        return np.all((angles >= lower) & (angles <= upper), axis=-1)
+
+
+def wrap_angles(angles: np.ndarray) -> np.ndarray:
+
+    """ Angles wrapped into [-pi, pi)."""
+
+    return (angles + np.pi) % (2 * np.pi) - np.pi
+
+
+@utils.profiled
+def solve_leg_angles(targets: np.ndarray, femur_lengths, tibia_lengths, clamp: bool = False) -> IKSolution:
+
+    """ Vectorized closed form solution for any number of legs and poses at once. The targets are the foot positions
+    relative to the leg origins, given as an array of shape (..., legs, 3), typically (N, legs, 3). The femur and tibia
+    lengths are scalars or arrays broadcastable to (legs,).
+
+    Targets out of reach are marked in the reachable mask and get NaN angles, unless clamp is set, in which case they
+    are moved along their direction onto the workspace boundary and solved there. The mask always refers to the
+    requested targets, so clamped legs are still reported as unreachable."""
+
+    targets = np.asarray(targets, dtype=float)
+    femur = np.asarray(femur_lengths, dtype=float)
+    tibia = np.asarray(tibia_lengths, dtype=float)
+
+    origin_to_foot = np.linalg.norm(targets, axis=-1)
+    max_reach = femur + tibia
+    min_reach = np.abs(femur - tibia)
+
+    reachable = (origin_to_foot <= max_reach) & (origin_to_foot >= min_reach) & (origin_to_foot > 0)
+
+    if clamp:
+        clamped = np.clip(origin_to_foot, min_reach, max_reach)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scale = np.where(reachable, 1.0, clamped / origin_to_foot)
+
+        targets = targets * scale[..., np.newaxis]
+        origin_to_foot = np.where(reachable, origin_to_foot, clamped)
+
+    x = targets[..., 0]
+    y = targets[..., 1]
+    z = targets[..., 2]
+
+    leg_proj = np.hypot(x, y)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Clipping only absorbs the rounding errors at the workspace boundary, unreachable legs are masked below.
+        beta_ang = np.arccos(np.clip((origin_to_foot ** 2 + femur ** 2 - tibia ** 2) /
+                                     (2 * origin_to_foot * femur), -1, 1))
+
+        gamma_ang = np.arccos(np.clip((origin_to_foot ** 2 + tibia ** 2 - femur ** 2) /
+                                      (2 * tibia * origin_to_foot), -1, 1))
+
+    # Elevation of the foot as seen from the leg origin, equivalent to the signed alpha angle of the single leg solver.
+    alpha_ang = np.arctan2(z, leg_proj)
+
+    result = np.empty(targets.shape)
+    result[..., 0] = np.arctan2(y, x)
+    result[..., 1] = beta_ang + alpha_ang
+    result[..., 2] = -(beta_ang + gamma_ang)
+
+    if clamp:
+        result[origin_to_foot == 0] = np.nan
+    else:
+        result[~reachable] = np.nan
+
+    return IKSolution(result, reachable)
+
+
+@utils.profiled
+def solve_leg_candidates(targets: np.ndarray, femur_lengths, tibia_lengths) -> IKSolution:
+
+    """ Every closed form solution of the targets at once, angles of shape (..., legs, 4, 3) wrapped into [-pi, pi).
+    The candidates are, in order, knee up (the solution of solve_leg_angles), knee down, and the same two with the coxa
+    turned around by pi, reaching the target backwards over the leg origin. Unreachable targets get NaN candidates."""
+
+    targets = np.asarray(targets, dtype=float)
+    femur = np.asarray(femur_lengths, dtype=float)
+    tibia = np.asarray(tibia_lengths, dtype=float)
+
+    origin_to_foot = np.linalg.norm(targets, axis=-1)
+    reachable = (origin_to_foot <= femur + tibia) & (origin_to_foot >= np.abs(femur - tibia)) & (origin_to_foot > 0)
+
+    x = targets[..., 0]
+    y = targets[..., 1]
+    z = targets[..., 2]
+
+    leg_proj = np.hypot(x, y)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        beta_ang = np.arccos(np.clip((origin_to_foot ** 2 + femur ** 2 - tibia ** 2) /
+                                     (2 * origin_to_foot * femur), -1, 1))
+
+        gamma_ang = np.arccos(np.clip((origin_to_foot ** 2 + tibia ** 2 - femur ** 2) /
+                                      (2 * tibia * origin_to_foot), -1, 1))
+
+    leg_ang = np.arctan2(y, x)
+    knee_ang = beta_ang + gamma_ang
+
+    # Elevation of the foot in the leg plane, facing the target and facing away from it.
+    alpha_ang = np.arctan2(z, leg_proj)
+    alpha_back = np.arctan2(z, -leg_proj)
+
+    candidates = np.empty(targets.shape[:-1] + (4, 3))
+    candidates[..., 0, 0] = candidates[..., 1, 0] = leg_ang
+    candidates[..., 2, 0] = candidates[..., 3, 0] = leg_ang + np.pi
+    candidates[..., 0, 1] = alpha_ang + beta_ang
+    candidates[..., 1, 1] = alpha_ang - beta_ang
+    candidates[..., 2, 1] = alpha_back + beta_ang
+    candidates[..., 3, 1] = alpha_back - beta_ang
+    candidates[..., 0::2, 2] = -knee_ang[..., np.newaxis]
+    candidates[..., 1::2, 2] = knee_ang[..., np.newaxis]
+
+    candidates = wrap_angles(candidates)
+    candidates[~reachable] = np.nan
+
+    return IKSolution(candidates, reachable)
+
+
+def select_candidates(candidates: np.ndarray, feasible: np.ndarray,
+                      previous: Optional[np.ndarray] = None) -> IKSolution:
+
+    """ Pick, per leg, the feasible candidate closest to the previous angles, measured as the squared wrapped angle
+    differences summed over the joints. Candidates are (..., legs, K, 3) with the (..., legs, K) feasibility mask, the
+    previous angles broadcast against (..., legs, 3). Legs without previous angles (None or NaN) take the first feasible
+    candidate. Legs without any feasible candidate get NaN angles and False in the returned mask."""
+
+    order = np.arange(candidates.shape[-2], dtype=float)
+
+    if previous is None:
+        cost = np.broadcast_to(order, feasible.shape)
+
+    else:
+        difference = wrap_angles(candidates - np.asarray(previous, dtype=float)[..., np.newaxis, :])
+        cost = np.sum(difference ** 2, axis=-1)
+        cost = np.where(np.isnan(cost), order, cost)
+
+    best = np.argmin(np.where(feasible, cost, np.inf), axis=-1)
+    angles = np.take_along_axis(candidates, best[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+    found = feasible.any(axis=-1)
+    angles[~found] = np.nan
+
+    return IKSolution(angles, found)
+
+
+class _LegsKinematics(_LimbKinematics):
+
+    """ Reference handling shared by the batched solvers: the default joints of every leg, the mounting angles measured
+    from them and the foot targets, relative to the leg origins, of body offsets and poses. Subclasses hold the limb
+    lengths and provide legs."""
+
+    __slots__ = {"_foot",
+                 "_floating",
+                 "_mounts",
+                 "center"}
+
+    def __init__(self, legs: int, joints: int):
+
+        super().__init__()
+
+        self._floating: bool = True
+        self.origin: np.ndarray = np.zeros((legs, 3))
+        self._foot: np.ndarray = np.zeros((legs, 3))
+        self.vertices: np.ndarray = np.zeros((legs, joints, 3))
+        self.center: np.ndarray = np.zeros(3)
+        self._mounts: np.ndarray = np.zeros(legs)
+
+    @classmethod
+    def _from_limbs(cls, femur_lengths: np.ndarray, tibia_lengths: np.ndarray, **kwargs) -> "_LegsKinematics":
+        return cls(femur_lengths, tibia_lengths, **kwargs)
+
+    @classmethod
+    def from_hexapod(cls, robot, **kwargs):
+
+        """ Create the model from the legs of a Hexapod, using their current joints as the default position. Keyword
+        arguments are passed on to the constructor."""
+
+        legs = list(robot.bodyparts["legs"].values())
+        model = cls._from_limbs(np.array([leg.femur_length for leg in legs]), np.array([leg.tibia_length for leg in legs]),
+                                **kwargs)
+        model.set_default_position([leg.joints for leg in legs])
+        model.center = robot.core_vertices[0].copy()
+
+        return model
+
+    @property
+    @abstractmethod
+    def legs(self) -> int:
         pass
+
+    @property
+    def mount_angles(self) -> np.ndarray:
+
+        """ Direction of every leg in its default position, the angle the coxa limits are relative to."""
+
+        return self._mounts
+
+    def set_default_position(self, joints_positions):
+
+        """ Joints positions are given per leg from the origin to the foot, either as a (legs, joints, 3) array or as a
+        sequence of per leg joints."""
+
+        vertices = np.array([np.array(list(joints), dtype=float) for joints in joints_positions])
+
+        if vertices.shape != self.vertices.shape:
+            raise ValueError(f"Expected joints positions of shape {self.vertices.shape}, got {vertices.shape}.")
+
+        self.vertices = vertices
+        self.origin = vertices[:, 0].copy()
+        self._foot = vertices[:, -1].copy()
+        self.center = self.origin.mean(axis=0)
+        knees = vertices[:, 1] - vertices[:, 0]
+        self._mounts = np.arctan2(knees[:, 1], knees[:, 0])
+        self._floating = False
+
+    def targets_from_offsets(self, offsets: np.ndarray, foot_fixed: bool) -> np.ndarray:
+
+        """ Foot positions relative to the leg origins after offsetting either the body (foot fixed) or the feet.
+        Offsets of shape (..., 3) broadcast against the (legs, 3) reference, so a single (3,) offset moves all legs,
+        (legs, 3) sets a per leg offset and (N, 1, 3) or (N, legs, 3) describe a sequence of N poses."""
+
+        if self._floating:
+            raise RuntimeError("Before setting the legs offset, you have to establish a"
+                               " reference by calling set_default_position method.")
+
+        offsets = np.asarray(offsets, dtype=float)
+
+        if foot_fixed:
+            return self._foot - offsets - self.origin
+
+        return self._foot + offsets - self.origin
+
+    def targets_from_poses(self, poses: np.ndarray) -> np.ndarray:
+
+        """ Foot positions relative to the leg origins, in the body frame, after moving the body by the given poses
+        with the feet fixed. Poses are (x, y, z, roll, pitch, yaw) arrays of shape (..., 6), the rotation being applied
+        about the center of the body, see rotation_from_euler. Returns targets of shape (..., legs, 3)."""
+
+        if self._floating:
+            raise RuntimeError("Before setting the body pose, you have to establish a"
+                               " reference by calling set_default_position method.")
+
+        poses = np.asarray(poses, dtype=float)
+        rotations = rotation_from_euler(poses[..., 3:])
+
+        # With the origins moved to center + R @ (origin - center) + t, the target in the body frame is
+        # R.T @ (foot - origin) = R.T @ (foot - center - t) - (origin - center). Row vectors, v @ R == (R.T @ v).T.
+        feet = self._foot - self.center - poses[..., np.newaxis, :3]
+
+        return feet @ rotations - (self.origin - self.center)
+
+
+class HexapodKinematics(_LegsKinematics):
+
+    """ Batched counterpart of LegKinematics. Holds the reference positions of all legs in (legs, 3) arrays and solves
+    every leg, for one or many body offsets, in a single call to solve_leg_angles."""
+
+    __slots__ = {"_femur",
+                 "_tibia",
+                 "_geometry_key"}
+
+    def __init__(self, femur_lengths: Sequence[float], tibia_lengths: Sequence[float]):
+
+        femur = np.asarray(femur_lengths, dtype=float)
+        tibia = np.asarray(tibia_lengths, dtype=float)
+
+        if femur.shape != tibia.shape or femur.ndim != 1:
+            raise ValueError("Femur and tibia lengths have to be one dimensional sequences of equal length.")
+
+        super().__init__(femur.shape[0], 3)
+
+        self._femur: np.ndarray = femur
+        self._tibia: np.ndarray = tibia
+        self._geometry_key: bytes = b""
+
+    @property
+    def legs(self) -> int:
+        return self._femur.shape[0]
+
+    @property
+    def femur_lengths(self) -> np.ndarray:
+        return self._femur
+
+    @property
+    def tibia_lengths(self) -> np.ndarray:
+        return self._tibia
+
+    @property
+    def geometry_key(self) -> bytes:
+
+        """ Hashable identity of the limb lengths and the default position, two models with equal keys produce the
+        same angles for the same offsets."""
+
+        return self._geometry_key
+
+    def set_default_position(self, joints_positions):
+
+        """ Joints positions are given per leg as (origin, knee, foot), either as a (legs, 3, 3) array or as a sequence
+        of per leg joints."""
+
+        super().set_default_position(joints_positions)
+        self._geometry_key = b"".join(array.tobytes() for array in (self._femur, self._tibia, self.origin, self._foot))
+
+    @utils.profiled
+    def angles_from_rel_position(self, offsets: np.ndarray, foot_fixed: bool = False,
+                                 clamp: bool = False) -> IKSolution:
+
+        """ Calculate the angles of all legs for the given offsets, see targets_from_offsets for accepted shapes.
+        Returns angles of shape (..., legs, 3) with the (..., legs) reachability mask, see solve_leg_angles."""
+
+        return solve_leg_angles(self.targets_from_offsets(offsets, foot_fixed), self._femur, self._tibia, clamp)
+
+    @utils.profiled
+    def angles_from_pose(self, poses: np.ndarray, clamp: bool = False) -> IKSolution:
+
+        """ Angles of all legs for full body poses of shape (6,) or (N, 6) with the feet fixed, see targets_from_poses.
+        Returns angles of shape (..., legs, 3), in the body frame, with the (..., legs) reachability mask."""
+
+        return solve_leg_angles(self.targets_from_poses(poses), self._femur, self._tibia, clamp)
+
+
+class WarmStartSolver:
+
+    """ Joint limit aware solver on top of a HexapodKinematics model. All analytic candidates of every leg are solved
+    in one pass, the ones violating the limits are discarded and the remaining one closest to the last angles of the
+    leg is taken, so legs keep their elbow and coxa configuration instead of jumping between branches. The last angles
+    of every leg are the warm start state, updated by each solve and kept for legs without a feasible solution.
+
+    The selected angles are unwrapped against the warm start, so a sequence stays continuous where a joint crosses +-pi
+    and may leave [-pi, pi) by the distance travelled past it, like the RateLimiter output.
+
+    The returned reachable mask is False for legs that are out of reach or only reachable outside the limits."""
+
+    __slots__ = {"kinematics",
+                 "limits",
+                 "previous"}
+
+    def __init__(self, kinematics: HexapodKinematics, limits: JointLimits = JointLimits(),
+                 previous: Optional[np.ndarray] = None):
+
+        self.kinematics = kinematics
+        self.limits = limits
+        self.previous: np.ndarray = np.full((kinematics.legs, 3), np.nan)
+        self.reset(previous)
+
+    def reset(self, previous: Optional[np.ndarray] = None):
+
+        """ Set the warm start angles, NaN or None for no preference, which selects knee up where feasible."""
+
+        self.previous[:] = np.nan if previous is None else previous
+
+    def solve(self, targets: np.ndarray) -> IKSolution:
+
+        """ Solve (legs, 3) targets relative to the leg origins, or a (N, legs, 3) sequence, which is selected frame by
+        frame so every frame continues from the previous one."""
+
+        candidates, _ = solve_leg_candidates(targets, self.kinematics.femur_lengths, self.kinematics.tibia_lengths)
+
+        relative = candidates.copy()
+        relative[..., 0] = wrap_angles(candidates[..., 0] - self.kinematics.mount_angles[:, np.newaxis])
+        feasible = self.limits.within(relative)
+
+        if candidates.ndim == 3:
+            return self._select(candidates, feasible)
+
+        frames = candidates.shape[:-3]
+        candidates = candidates.reshape((-1,) + candidates.shape[-3:])
+        feasible = feasible.reshape((-1,) + feasible.shape[-2:])
+
+        angles = np.empty(candidates.shape[:-2] + (3,))
+        found = np.empty(candidates.shape[:-2], dtype=bool)
+
+        for frame in range(candidates.shape[0]):
+            angles[frame], found[frame] = self._select(candidates[frame], feasible[frame])
+
+        return IKSolution(angles.reshape(frames + angles.shape[1:]), found.reshape(frames + found.shape[1:]))
+
+    def _select(self, candidates: np.ndarray, feasible: np.ndarray) -> IKSolution:
+
+        angles, reachable = select_candidates(candidates, feasible, self.previous)
+        angles = np.where(np.isnan(self.previous), angles, self.previous + wrap_angles(angles - self.previous))
+        self.previous[reachable] = angles[reachable]
+
+        return IKSolution(angles, reachable)
+
+    @utils.profiled
+    def angles_from_rel_position(self, offsets: np.ndarray, foot_fixed: bool = False) -> IKSolution:
+
+        """ See HexapodKinematics.angles_from_rel_position, a (N, 1, 3) or (N, legs, 3) offset is a sequence."""
+
+        return self.solve(self.kinematics.targets_from_offsets(offsets, foot_fixed))
+
+    @utils.profiled
+    def angles_from_pose(self, poses: np.ndarray) -> IKSolution:
+
+        """ See HexapodKinematics.angles_from_pose, a (N, 6) pose is a sequence."""
+
+        return self.solve(self.kinematics.targets_from_poses(poses))
@@ -0,0 +1,248 @@
+import numpy as np
+from typing import NamedTuple, Optional, Sequence, Tuple
+from .inverse_kinematics import IKSolution, _LegsKinematics, wrap_angles
+import utils
+
+
+"""Numerical inverse kinematics for legs with any number of links, for which there is no closed form, e.g. legs with a
+tarsus segment after the tibia. Legs are a coxa turning about z followed by a chain of pitch joints in the leg plane, see
+chain_feet_from_angles. Targets are solved by damped least squares iterations on the analytic Jacobian, for all legs and
+frames at once; every target stops iterating as soon as it is within tolerance."""
+
+
+class ChainSolution(NamedTuple):
+
+    """ Angles of shape (..., legs, links + 1), the (..., legs) convergence mask and the number of iterations every
+    target took."""
+
+    angles: np.ndarray
+    reachable: np.ndarray
+    iterations: np.ndarray
+
+
+def chain_jacobian(angles: np.ndarray, link_lengths) -> Tuple[np.ndarray, np.ndarray]:
+
+    """ Foot positions (..., 3) and Jacobians (..., 3, links + 1) of the feet with respect to the joint angles, for
+    angles of shape (..., links + 1), see chain_feet_from_angles."""
+
+    pitch = np.cumsum(angles[..., 1:], axis=-1)
+    link_reach = link_lengths * np.cos(pitch)
+    link_height = link_lengths * np.sin(pitch)
+
+    # A pitch joint moves every link after it, so its column sums the links from the joint to the foot.
+    tail_reach = np.cumsum(link_reach[..., ::-1], axis=-1)[..., ::-1]
+    tail_height = np.cumsum(link_height[..., ::-1], axis=-1)[..., ::-1]
+    reach = tail_reach[..., 0]
+
+    cos = np.cos(angles[..., 0])
+    sin = np.sin(angles[..., 0])
+
+    feet = np.stack((reach * cos, reach * sin, tail_height[..., 0]), axis=-1)
+
+    jacobian = np.empty(angles.shape[:-1] + (3, angles.shape[-1]))
+    jacobian[..., 0, 0] = -reach * sin
+    jacobian[..., 1, 0] = reach * cos
+    jacobian[..., 2, 0] = 0
+    jacobian[..., 0, 1:] = -tail_height * cos[..., np.newaxis]
+    jacobian[..., 1, 1:] = -tail_height * sin[..., np.newaxis]
+    jacobian[..., 2, 1:] = tail_reach
+
+    return feet, jacobian
+
+
+@utils.profiled
+def solve_chain_dls(targets: np.ndarray, link_lengths, initial: np.ndarray, tolerance: float = 1e-6,
+                    max_iterations: int = 100, damping: float = 0.5, lower: Optional[np.ndarray] = None,
+                    upper: Optional[np.ndarray] = None, mounts: Optional[np.ndarray] = None,
+                    clamp: bool = False) -> ChainSolution:
+
+    """ Damped least squares solution of (..., legs, 3) targets relative to the leg origins, starting from the
+    (..., legs, links + 1) initial angles. Link lengths broadcast against (legs, links), the optional joint bounds
+    against (legs, links + 1) and are enforced after every step. Like JointLimits, the coxa bounds are relative to the
+    mounting angles, broadcast against (..., legs), when given, and absolute otherwise.
+
+    Every step is dq = J.T @ inv(J @ J.T + damping ** 2 * I) @ error, which stays bounded near singular poses, e.g. a
+    fully stretched leg. Targets whose foot error gets below the tolerance are marked reachable and stop iterating, the
+    others run max_iterations and get NaN angles, unless clamp is set, in which case the closest configuration found is
+    returned while the mask still reports them as unreachable."""
+
+    targets = np.asarray(targets, dtype=float)
+    initial = np.asarray(initial, dtype=float)
+    links = initial.shape[-1] - 1
+    shape = np.broadcast_shapes(targets.shape[:-1], initial.shape[:-1])
+
+    # Flat (M, ...) working arrays, so the iterations only touch the targets that have not converged yet.
+    angles = np.broadcast_to(initial, shape + (links + 1,)).reshape(-1, links + 1).copy()
+    goal = np.broadcast_to(targets, shape + (3,)).reshape(-1, 3)
+    lengths = np.broadcast_to(np.asarray(link_lengths, dtype=float), shape + (links,)).reshape(-1, links)
+    bounds = [None if bound is None else np.broadcast_to(np.asarray(bound, dtype=float),
+                                                           shape + (links + 1,)).reshape(-1, links + 1)
+              for bound in (lower, upper)]
+    mount = None if mounts is None else np.broadcast_to(np.asarray(mounts, dtype=float), shape).reshape(-1)
+
+    iterations = np.zeros(angles.shape[0], dtype=np.int32)
+    converged = np.zeros(angles.shape[0], dtype=bool)
+    active = np.flatnonzero(np.isfinite(goal).all(axis=-1))
+    regularization = damping ** 2 * np.eye(3)
+
+    for iteration in range(max_iterations + 1):
+        if active.shape[0] == 0:
+            break
+
+        feet, jacobian = chain_jacobian(angles[active], lengths[active])
+        error = goal[active] - feet
+
+        done = np.einsum("ij,ij->i", error, error) <= tolerance ** 2
+        converged[active[done]] = True
+
+        active = active[~done]
+
+        if active.shape[0] == 0 or iteration == max_iterations:
+            break
+
+        jacobian = jacobian[~done]
+        error = error[~done]
+
+        system = jacobian @ np.swapaxes(jacobian, -1, -2) + regularization
+        step = np.swapaxes(jacobian, -1, -2) @ np.linalg.solve(system, error[..., np.newaxis])
+
+        angles[active] += step[..., 0]
+        iterations[active] += 1
+
+        if bounds[0] is not None or bounds[1] is not None:
+            bounded = angles[active]
+
+            if mount is not None:
+                bounded[:, 0] = wrap_angles(bounded[:, 0] - mount[active])
+
+            np.clip(bounded, None if bounds[0] is None else bounds[0][active],
+                    None if bounds[1] is None else bounds[1][active], out=bounded)
+
+            if mount is not None:
+                bounded[:, 0] += mount[active]
+
+            angles[active] = bounded
+
+    if not clamp:
+        angles[~converged] = np.nan
+
+    return ChainSolution(angles.reshape(shape + (links + 1,)), converged.reshape(shape), iterations.reshape(shape))
+
+
+class ChainKinematics(_LegsKinematics):
+
+    """ Numerical counterpart of HexapodKinematics for legs with any number of links. Every solve starts from the last
+    converged angles of each leg, the default angles before the first solve, which keeps redundant legs in a consistent
+    configuration and typically converges in a few iterations between neighbouring poses.
+
+    The iterations of the last solve and running totals are kept for instrumentation."""
+
+    __slots__ = {"_lengths",
+                 "default_angles",
+                 "previous",
+                 "tolerance",
+                 "max_iterations",
+                 "damping",
+                 "lower",
+                 "upper",
+                 "last_iterations",
+                 "solves",
+                 "total_iterations"}
+
+    def __init__(self, link_lengths: Sequence[Sequence[float]], tolerance: float = 1e-6, max_iterations: int = 100,
+                 damping: float = 0.5, lower: Optional[np.ndarray] = None, upper: Optional[np.ndarray] = None):
+
+        """ Link lengths of shape (legs, links), e.g. (femur, tibia, tarsus) for every leg. The optional joint bounds
+        broadcast against (legs, links + 1), the coxa bounds are relative to the mounting angles, see JointLimits."""
+
+        lengths = np.asarray(link_lengths, dtype=float)
+
+        if lengths.ndim != 2:
+            raise ValueError("Link lengths have to be given as a (legs, links) array.")
+
+        super().__init__(lengths.shape[0], lengths.shape[1] + 1)
+
+        self._lengths: np.ndarray = lengths
+
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.damping = damping
+        self.lower = lower
+        self.upper = upper
+        self.default_angles: np.ndarray = np.zeros((self.legs, self.links + 1))
+        self.previous: np.ndarray = np.zeros((self.legs, self.links + 1))
+        self.last_iterations: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.solves: int = 0
+        self.total_iterations: int = 0
+
+    @classmethod
+    def _from_limbs(cls, femur_lengths: np.ndarray, tibia_lengths: np.ndarray, **kwargs) -> "ChainKinematics":
+
+        # from_hexapod models the three joint legs of a Hexapod, e.g. to compare against the closed form solver.
+        return cls(np.stack((femur_lengths, tibia_lengths), axis=-1), **kwargs)
+
+    @property
+    def legs(self) -> int:
+        return self._lengths.shape[0]
+
+    @property
+    def links(self) -> int:
+        return self._lengths.shape[1]
+
+    @property
+    def link_lengths(self) -> np.ndarray:
+        return self._lengths
+
+    def set_default_position(self, joints_positions):
+
+        """ Joints positions per leg from the origin to the foot, a (legs, links + 1, 3) array or a sequence of per leg
+        joints. The default angles are measured from them and become the warm start."""
+
+        super().set_default_position(joints_positions)
+
+        segments = np.diff(self.vertices, axis=1)
+        pitch = np.arctan2(segments[..., 2], np.hypot(segments[..., 0], segments[..., 1]))
+
+        self.default_angles = np.concatenate((self._mounts[:, np.newaxis], np.diff(pitch, axis=-1, prepend=0)), axis=-1)
+        self.reset()
+
+    def reset(self, previous: Optional[np.ndarray] = None):
+
+        """ Set the warm start angles, the default angles when none are given."""
+
+        self.previous = np.array(self.default_angles if previous is None else previous, dtype=float)
+
+    def solve(self, targets: np.ndarray, initial: Optional[np.ndarray] = None, clamp: bool = False) -> ChainSolution:
+
+        """ Solve (legs, 3) targets relative to the leg origins, or any (..., legs, 3) batch of them. Every target
+        starts from the initial angles when given, broadcast against (..., legs, links + 1), otherwise from the warm
+        start. The warm start then takes the converged angles of the last frame of the batch."""
+
+        solution = solve_chain_dls(targets, self._lengths, self.previous if initial is None else initial,
+                                   self.tolerance, self.max_iterations, self.damping, self.lower, self.upper,
+                                   self._mounts, clamp)
+
+        last = solution.angles.reshape(-1, self.legs, self.links + 1)[-1]
+        found = solution.reachable.reshape(-1, self.legs)[-1]
+        self.previous[found] = last[found]
+
+        self.last_iterations = solution.iterations
+        self.solves += solution.iterations.size
+        self.total_iterations += int(solution.iterations.sum())
+
+        return solution
+
+    @utils.profiled
+    def angles_from_rel_position(self, offsets: np.ndarray, foot_fixed: bool = False,
+                                 clamp: bool = False) -> IKSolution:
+
+        """ Angles of all legs for the given offsets, see HexapodKinematics.angles_from_rel_position. Returns angles of
+        shape (..., legs, links + 1) with the (..., legs) mask of the targets that converged."""
+
+        angles, reachable, _ = self.solve(self.targets_from_offsets(offsets, foot_fixed), clamp=clamp)
+
+        return IKSolution(angles, reachable)
+
+    @property
+    def mean_iterations(self) -> float:
+        return self.total_iterations / self.solves if self.solves else 0.0
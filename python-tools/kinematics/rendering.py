@@ -0,0 +1,183 @@
+import numpy as np
+from typing import List, Optional
+
+
+"""Matplotlib drawing of the robot model. The model in robot.py is plain numpy and only imports this module from its
+draw methods, so building and solving robots without axes never loads matplotlib. Nothing here imports matplotlib
+either, the artists are created through the axes the parts were given."""
+
+
+class PartArtists:
+
+    """ Line and joint markers of one body part. Updating with the same points as last time leaves the artists
+    untouched."""
+
+    __slots__ = {"ax",
+                 "color",
+                 "line",
+                 "markers",
+                 "_drawn"}
+
+    def __init__(self, ax, color: str):
+        self.ax = ax
+        self.color = color
+        self.line = None
+        self.markers = None
+        self._drawn: Optional[np.ndarray] = None
+
+    @property
+    def artists(self) -> list:
+
+        if self.line is None:
+            return []
+
+        return [self.line, self.markers]
+
+    def update(self, points: np.ndarray) -> bool:
+
+        """ Push the (n, 3) points to the artists, creating them on the first call. Returns False when the points equal
+        the ones drawn last time."""
+
+        if self.line is not None and np.array_equal(points, self._drawn):
+            return False
+
+        # A private copy, the artists keep references to the arrays they are given.
+        self._drawn = np.array(points, dtype=float)
+        x_data, y_data, z_data = self._drawn.T
+
+        if self.line is None:
+            self.line, = self.ax.plot(x_data,
+                                      y_data,
+                                      z_data, self.color[0])
+
+            # Depth shading of the markers costs more than the rest of the redraw.
+            self.markers = self.ax.scatter3D(x_data,
+                                             y_data,
+                                             z_data,
+                                             edgecolor=self.color,
+                                             facecolor=self.color,
+                                             depthshade=False)
+
+        else:
+            self.line.set_data_3d(x_data,
+                                  y_data,
+                                  z_data)
+
+            self.markers.set_offsets(self._drawn[:, :2])
+            self.markers.set_3d_properties(z_data, "z")
+
+        return True
+
+
+class HexapodRenderer:
+
+    """ Figure updates of a Hexapod on its axes. Where the canvas supports blitting, the robot artists are animated:
+    full redraws of the figure only capture the static background, and robot updates restore it and redraw the
+    robot.
+
+    Sliders added with add_sliders are animated as well. A Slider redraws the whole figure on every change by default,
+    which costs far more than the blitted robot update, so here a change only marks them stale and the next draw blits
+    them together with the robot."""
+
+    __slots__ = {"ax",
+                 "sliders",
+                 "_blitting",
+                 "_background",
+                 "_stale"}
+
+    def __init__(self, ax):
+        self.ax = ax
+        self.sliders: List = []
+        self._blitting: Optional[bool] = None  # Decided on the first draw, once the canvas is known.
+        self._background = None
+        self._stale: bool = False
+
+    def add_sliders(self, sliders):
+
+        """ Draw the sliders with the robot, see the class description. Call draw from their callbacks even when the
+        robot does not move, e.g. for unreachable offsets, or the sliders are not redrawn."""
+
+        for slider in sliders:
+            self.sliders.append(slider)
+            slider.on_changed(self._mark_stale)
+
+            if self._blitting:
+                self._animate_slider(slider)
+
+    def _mark_stale(self, _):
+        self._stale = True
+
+    @staticmethod
+    def _slider_artists(slider) -> list:
+
+        # The parts of a Slider that move with its value, the track and the label stay in the background.
+        return [slider.poly, slider._handle, slider.valtext]
+
+    def _animate_slider(self, slider):
+
+        slider.drawon = False
+
+        for artist in self._slider_artists(slider):
+            artist.set_animated(True)
+
+    def _animated_artists(self, robot) -> list:
+        return robot.artists + [artist for slider in self.sliders for artist in self._slider_artists(slider)]
+
+    def _region(self):
+
+        # Sliders live outside of the robot axes, so with sliders the whole figure is restored and blitted.
+        return self.ax.figure.bbox if self.sliders else self.ax.bbox
+
+    def draw(self, robot):
+
+        """ Push the current joints of all parts to their artists and update the figure once, skipping the parts, or
+        the whole update, when nothing moved."""
+
+        changed = self._stale
+
+        for part_type in robot.bodyparts.values():
+            for part in part_type.values():
+                changed |= part.draw()
+
+        if not changed:
+            return
+
+        self._stale = False
+        canvas = self.ax.figure.canvas
+
+        if self._blitting is None:
+            self._blitting = canvas.supports_blit
+
+            if self._blitting:
+                canvas.mpl_connect("draw_event", lambda event: self._on_draw(event, robot))
+
+                for slider in self.sliders:
+                    self._animate_slider(slider)
+
+        if self._blitting:
+            for artist in robot.artists:
+                artist.set_animated(True)
+
+        if self._background is None:
+            # No full draw has happened yet, it will draw the robot through _on_draw.
+            canvas.draw_idle()
+
+        else:
+            canvas.restore_region(self._background)
+            self._draw_artists(self._animated_artists(robot))
+            canvas.blit(self._region())
+
+    def _on_draw(self, event, robot):
+
+        # A full redraw, e.g. after a resize or a view change, invalidates the background.
+        self._background = event.canvas.copy_from_bbox(self._region())
+        self._draw_artists(self._animated_artists(robot))
+
+    def _draw_artists(self, artists: List):
+
+        for artist in artists:
+            if hasattr(artist, "do_3d_projection"):
+                # Collections are projected by the full draw of the axes only, refresh them for the current view.
+                artist.do_3d_projection()
+
+            self.ax.draw_artist(artist)
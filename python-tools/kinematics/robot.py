@@ -1,10 +1,44 @@
-import matplotlib.pyplot as plt
 import numpy as np
 from abc import ABC, abstractmethod
-from typing import Dict, Union
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Union
+import utils
+from .forward_kinematics import joints_from_angles, rotation_from_euler
 
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from .rendering import HexapodRenderer, PartArtists
 
-"""This is a simplistic environment used to visualize the calculated robot's positions based on matplotlib."""
+
+"""This is a simplistic environment used to visualize the calculated robot's positions. The model is plain numpy and
+works without any axes, drawing is delegated to the rendering module, which is only imported once a part with axes is
+drawn."""
+
+
+class _VertexView(Mapping):
+
+    """ String keyed view of the rows of a vertex array, so the per vertex API keeps working on top of a single
+    contiguous buffer. Reading returns a row view, writing copies into the row."""
+
+    __slots__ = {"_array"}
+
+    def __init__(self, array: np.ndarray):
+        self._array = array
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self._array[int(key)]
+
+    def __setitem__(self, key: str, value: np.ndarray):
+        self._array[int(key)] = value
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(index) for index in range(self._array.shape[0]))
+
+    def __len__(self) -> int:
+        return self._array.shape[0]
+
+    def copy(self) -> Dict[str, np.ndarray]:
+        return {key: self._array[int(key)].copy() for key in self}
 
 
 class _BodyPart(ABC):
@@ -15,14 +49,39 @@ class _BodyPart(ABC):
     __slots__ = {"origin",
                  "vertices",
                  "ax",
-                 "_lines",
-                 "_lines_vertices"}
+                 "_artists"}
 
     def __init__(self):
         self.vertices = {}
+        self._artists: Optional["PartArtists"] = None
+
+    def _set_artists_data(self, points: np.ndarray, color: str) -> bool:
+
+        """ Push the (n, 3) points to the artists of the part, see PartArtists.update. Parts without axes draw
+        nothing."""
+
+        if self.ax is None:
+            return False
+
+        if self._artists is None:
+            from .rendering import PartArtists
+
+            self._artists = PartArtists(self.ax, color)
+
+        return self._artists.update(points)
+
+    @property
+    def artists(self) -> list:
+
+        """ Matplotlib artists of the part, empty until the part has been drawn for the first time."""
+
+        if self._artists is None:
+            return []
+
+        return self._artists.artists
 
     @abstractmethod
-    def draw(self, **kwargs):
+    def draw(self, **kwargs) -> bool:
         pass
 
     @abstractmethod
@@ -36,57 +95,40 @@ class Leg(_BodyPart):
                  "parent",
                  "_femur_length",
                  "_tibia_length",
-                 "_leg_angle",
-                 "_femur_angle",
-                 "_tibia_angle"}
+                 "angles"}
 
     # todo: Put angles into a dict.
     # todo: Put limb lengths into a dict.
 
-    def __init__(self, id_: str, parent: _BodyPart, ax_: plt.Axes, attach_point: np.ndarray, femur_len, tibia_len,
-                 leg_angle, femur_ang, tibia_ang):
+    def __init__(self, id_: str, parent: _BodyPart, ax_: Optional["Axes"], attach_point: np.ndarray, femur_len, tibia_len,
+                 leg_angle, femur_ang, tibia_ang, joints: Optional[np.ndarray] = None,
+                 angles: Optional[np.ndarray] = None, solved_joints: Optional[np.ndarray] = None):
+
+        """ The joints (origin, knee, foot) are kept in a (3, 3) array and the current angles, in radians, in a (3,)
+        array. Passing them, e.g. rows of the buffers of a Hexapod, makes the leg a view into those buffers. Solved
+        joints, precomputed for the given angles, are copied instead of running the forward kinematics."""
 
         super().__init__()
         self.id_ = id_
         self.ax = ax_
         self.parent = parent
-        self._lines = None
-        self._lines_vertices = None
         self.origin = attach_point
         self._femur_length = femur_len
         self._tibia_length = tibia_len
-        self._leg_angle = leg_angle / 180 * np.pi
-        self._femur_angle = femur_ang / 180 * np.pi
-        self._tibia_angle = tibia_ang / 180 * np.pi
         self.vertices = {}
-        self.joints = np.array((self.origin, (), ()), dtype=object)
-        self.update_joints_position(np.array([self._leg_angle, self._femur_angle, self._tibia_angle]))
-
-    def draw(self):
-
-        x_data = np.array([x[0] for x in self.joints])
-        y_data = np.array([y[1] for y in self.joints])
-        z_data = np.array([z[2] for z in self.joints])
-
-        if not self._lines:
-            self._lines = self.ax.plot(x_data,
-                                       y_data,
-                                       z_data, "b")
+        self.joints = joints if joints is not None else np.zeros((3, 3))
+        self.angles = angles if angles is not None else np.zeros(3)
+        self.joints[0] = self.origin
 
-            self._lines_vertices = self.ax.scatter3D(x_data,
-                                                     y_data,
-                                                     z_data,
-                                                     edgecolor="blue",
-                                                     facecolor="blue")
+        if solved_joints is not None:
+            self.angles[:] = np.array([leg_angle, femur_ang, tibia_ang]) / 180 * np.pi
+            self.joints[:] = solved_joints
 
         else:
-            self._lines[0].set_data_3d(x_data,
-                                       y_data,
-                                       z_data,)
+            self.update_joints_position(np.array([leg_angle, femur_ang, tibia_ang]) / 180 * np.pi)
 
-            self._lines_vertices._offsets3d = (x_data,
-                                               y_data,
-                                               z_data)
+    def draw(self) -> bool:
+        return self._set_artists_data(self.joints, "blue")
 
     @property
     def femur_length(self):
@@ -96,26 +138,13 @@ class Leg(_BodyPart):
     def tibia_length(self):
         return self._tibia_length
 
-    def update_joints_position(self, angles: np.ndarray):  # todo: This needs cleanup.
+    def update_joints_position(self, angles: np.ndarray):
 
-        self._leg_angle = angles[0]
-        self._femur_angle = angles[1]
-        self._tibia_angle = angles[2]
+        self.angles[:] = angles
         self.origin = self.parent.vertices[self.id_]
-        self.joints[0] = self.origin
-
-        joint1_xy = self._femur_length * np.cos(self._femur_angle)
-        joint_1 = self.origin + np.array([joint1_xy * np.cos(self._leg_angle),
-                                          joint1_xy * np.sin(self._leg_angle),
-                                          self._femur_length * np.sin(self._femur_angle)])
-
-        self.joints[1] = joint_1
-        joint2_xy = self._tibia_length * np.cos(self._femur_angle + self._tibia_angle)
-        joint_2 = joint_1 + np.array([joint2_xy * np.cos(self._leg_angle),
-                                      joint2_xy * np.sin(self._leg_angle),
-                                      self._tibia_length * np.sin(self._femur_angle + self._tibia_angle)])
 
-        self.joints[2] = joint_2
+        joints_from_angles(self.origin, self.angles, self._femur_length, self._tibia_length, out=self.joints,
+                           rotations=self.parent.rotation)
 
 
 class Core(_BodyPart):
@@ -133,20 +162,29 @@ class Core(_BodyPart):
     __slots__ = {"length",
                  "width",
                  "front",
-                 "default"}
+                 "default",
+                 "positions",
+                 "rotation",
+                 "_default_positions"}
+
+    def __init__(self, ax_: Optional["Axes"], length: float, width: float, front: float):
+
+        """ All vertices live in the (7, 3) positions array, row i holding vertex "i". The vertices and default
+        mappings are views of the current and the default positions respectively. The rotation is the (3, 3) matrix
+        of the body orientation relative to the default one."""
 
-    def __init__(self, ax_: plt.Axes, length: float, width: float, front: float):
         super().__init__()
         self.length = length
         self.width = width
         self.front = front
-        self.origin = np.array([0, 0, 0])
-        self.vertices = {"0": self.origin}
+        self.positions = np.zeros((7, 3))
+        self.rotation = np.eye(3)
+        self.origin = self.positions[0]
+        self.vertices = _VertexView(self.positions)
         self._create_vertices()
-        self._lines = None
-        self._lines_vertices = None
         self.ax = ax_
-        self.default = self.vertices.copy()
+        self._default_positions = self.positions.copy()
+        self.default = _VertexView(self._default_positions)
 
     def _create_vertices(self):
 
@@ -159,59 +197,105 @@ class Core(_BodyPart):
         self.vertices["5"] = np.array([origin[0] - self.front / 2, origin[1] - self.length / 2, origin[2]])
         self.vertices["6"] = np.array([origin[0] + self.front / 2, origin[1] - self.length / 2, origin[2]])
 
-    def draw(self):
-
-        labels = ["1", "2", "3", "4", "5", "6", "1"]
-
-        x_data = [self.vertices[x][0] for x in labels]
-        y_data = [self.vertices[y][1] for y in labels]
-        z_data = [self.vertices[z][2] for z in labels]
-
-        if not self._lines:
-
-            self._lines = self.ax.plot(x_data,
-                                       y_data,
-                                       z_data, "r")
-
-            self._lines_vertices = self.ax.scatter3D(x_data,
-                                                     y_data,
-                                                     z_data,
-                                                     edgecolor="red",
-                                                     facecolor="red")
-        else:
-            self._lines[0].set_data_3d(x_data,
-                                       y_data,
-                                       z_data)
-
-            self._lines_vertices._offsets3d = (x_data,
-                                               y_data,
-                                               z_data)
+    def draw(self) -> bool:
+        return self._set_artists_data(self.positions[[1, 2, 3, 4, 5, 6, 1]], "red")
 
     def update_joints_position(self, position):
         pass
 
     def offset_body(self, offset: np.ndarray, dynamic: bool):
 
+        # In place, so the legs attached to the vertices keep seeing the current positions.
         if dynamic:
-            for key in self.vertices:
-                self.vertices[key] = self.vertices[key] + offset
+            self.positions += offset
 
         else:
-            for key in self.vertices:
-                self.vertices[key] = self.default[key] + offset
+            np.add(self._default_positions, offset, out=self.positions)
+            self.rotation[:] = np.eye(3)
+
+    def set_pose(self, pose: np.ndarray):
+
+        """ Move the body from its default position to the (x, y, z, roll, pitch, yaw) pose, rotating about the default
+        center, with a single matrix product over all seven vertices."""
+
+        pose = np.asarray(pose, dtype=float)
+        center = self._default_positions[0]
+
+        self.rotation[:] = rotation_from_euler(pose[3:])
+        np.matmul(self._default_positions - center, self.rotation.T, out=self.positions)
+        self.positions += center + pose[:3]
 
 
 class Hexapod:
+
+    """ The robot state is held in two contiguous buffers, the (7, 3) core vertices and the (6, 3, 3) leg joints
+    (origin, knee, foot per leg). Core and Leg objects are views into them, so whole robot operations can work on the
+    buffers directly."""
+
     __slots__ = {"_ax",
                  "bodyparts",
                  "_default_elevation",
-                 "_leg_origins"}
+                 "_leg_origins",
+                 "_leg_joints",
+                 "_leg_angles",
+                 "_femur_lengths",
+                 "_tibia_lengths",
+                 "_renderer"}
 
     def __init__(self, core: Core):
-        self._ax: plt.axes = core.ax
+        self._ax: Optional["Axes"] = core.ax
         self.bodyparts: Dict[str, Dict[str, Union[Leg, Core]]] = {"legs": {}, "core": {"1": core}}  # Leaving room for expansion to other limbs.
+        self._leg_joints: np.ndarray = np.zeros((6, 3, 3))
+        self._leg_angles: np.ndarray = np.zeros((6, 3))
+        self._femur_lengths: np.ndarray = np.zeros(6)
+        self._tibia_lengths: np.ndarray = np.zeros(6)
+        self._renderer: Optional["HexapodRenderer"] = None
+
+    @property
+    def core_vertices(self) -> np.ndarray:
+        return self.bodyparts["core"]["1"].positions
+
+    @property
+    def leg_joints(self) -> np.ndarray:
+        return self._leg_joints
+
+    @property
+    def leg_angles(self) -> np.ndarray:
+        return self._leg_angles
+
+    def get_state(self) -> np.ndarray:
+
+        """ Copy of the whole robot state as one flat float64 array of the core vertices, the body rotation matrix, the
+        leg joints and the leg angles."""
+
+        core = self.bodyparts["core"]["1"]
+
+        return np.concatenate((core.positions.ravel(), core.rotation.ravel(), self._leg_joints.ravel(),
+                               self._leg_angles.ravel()))
+
+    def set_state(self, state: np.ndarray):
+
+        """ Restore a state produced by get_state, in place, so all views stay valid."""
+
+        core = self.bodyparts["core"]["1"]
+        core_size = core.positions.size
+        body_size = core_size + core.rotation.size
+        joints_size = body_size + self._leg_joints.size
+        state = np.asarray(state, dtype=float)
+
+        if state.shape != (joints_size + self._leg_angles.size,):
+            raise ValueError(f"Expected a state of shape {(joints_size + self._leg_angles.size,)}, got {state.shape}.")
 
-    def add_leg(self, femur_len, tibia_len):
+        core.positions[:] = state[:core_size].reshape(core.positions.shape)
+        core.rotation[:] = state[core_size:body_size].reshape(core.rotation.shape)
+        self._leg_joints[:] = state[body_size:joints_size].reshape(self._leg_joints.shape)
+        self._leg_angles[:] = state[joints_size:].reshape(self._leg_angles.shape)
+
+    def add_leg(self, femur_len, tibia_len, leg_angle: Optional[float] = None, femur_ang: float = 45,
+                tibia_ang: float = -90, solved_joints: Optional[np.ndarray] = None):
+
+        """ Attach a leg to the next free core vertex in its default position, angles in degrees. The leg angle
+        defaults to the direction of the vertex, 60 degrees apart. See Leg for the solved joints."""
 
         if len(self.bodyparts["legs"]) >= 6:
             raise RuntimeError("Hexapod can have a maximum of 6 legs.")
@@ -220,35 +304,85 @@ class Hexapod:
 
         for leg_number in labels:
             if leg_number not in self.bodyparts["legs"]:
+                index = int(leg_number) - 1
+                self._femur_lengths[index] = femur_len
+                self._tibia_lengths[index] = tibia_len
                 self.bodyparts["legs"][leg_number] = Leg(id_=leg_number,
                                                          parent=self.bodyparts["core"]["1"],
                                                          ax_=self._ax,
                                                          attach_point=self.bodyparts["core"]["1"].vertices[leg_number],
                                                          femur_len=femur_len,
                                                          tibia_len=tibia_len,
-                                                         leg_angle=60 * (int(leg_number)-1),
-                                                         femur_ang=45,
-                                                         tibia_ang=-90)
-                # todo: Add possibility to set a default position of the legs.
+                                                         leg_angle=60 * index if leg_angle is None else leg_angle,
+                                                         femur_ang=femur_ang,
+                                                         tibia_ang=tibia_ang,
+                                                         joints=self._leg_joints[index],
+                                                         angles=self._leg_angles[index],
+                                                         solved_joints=solved_joints)
                 break
 
+    @property
+    def artists(self) -> list:
+        return [artist for part_type in self.bodyparts.values() for part in part_type.values() for artist in part.artists]
+
+    def _get_renderer(self) -> "HexapodRenderer":
+
+        if self._renderer is None:
+            from .rendering import HexapodRenderer
+
+            self._renderer = HexapodRenderer(self._ax)
+
+        return self._renderer
+
+    @utils.profiled
     def draw(self):
-        for part_type in self.bodyparts:
-            for part in self.bodyparts[part_type]:
-                self.bodyparts[part_type][part].draw()
 
+        """ Update the figure with the current joints, see HexapodRenderer. Does nothing for a robot without axes."""
+
+        if self._ax is None:
+            return
+
+        self._get_renderer().draw(self)
+
+    def add_sliders(self, *sliders):
+
+        """ Redraw the given matplotlib Sliders as part of draw instead of a full figure redraw on every change, see
+        HexapodRenderer.add_sliders."""
+
+        if self._ax is not None:
+            self._get_renderer().add_sliders(sliders)
+
+    @utils.profiled
     def update_leg_positions(self, angles):
 
-        for i, leg in enumerate(self.bodyparts["legs"]):
-            self.bodyparts["legs"][leg].update_joints_position(angles[i])
-            # print(leg, angles[i])
+        """ Set the (legs, 3) angles of all legs, in the body frame, and recompute their joints with a single forward
+        kinematics call."""
+
+        legs = len(self.bodyparts["legs"])
+
+        self._leg_angles[:legs] = angles
+        joints_from_angles(self.core_vertices[1:legs + 1],
+                           self._leg_angles[:legs],
+                           self._femur_lengths[:legs],
+                           self._tibia_lengths[:legs],
+                           out=self._leg_joints[:legs],
+                           rotations=self.bodyparts["core"]["1"].rotation)
 
     def translate_core(self, offset: np.ndarray, dynamic=False):
         self.bodyparts["core"]["1"].offset_body(offset, dynamic)
 
+    def set_body_pose(self, pose: np.ndarray):
+
+        """ Translate and rotate the core to the (x, y, z, roll, pitch, yaw) pose, see Core.set_pose. The legs follow on
+        the next update_leg_positions, e.g. with angles from HexapodKinematics.angles_from_pose."""
+
+        self.bodyparts["core"]["1"].set_pose(pose)
+
 
 if __name__ == '__main__':
 
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=(8, 12))
     ax = fig.add_subplot(111, projection="3d")
 
@@ -0,0 +1,114 @@
+import numpy as np
+from typing import NamedTuple, Optional
+import utils
+
+
+"""Static stability of the robot over many frames at once. The support polygon is the convex hull of the grounded feet
+projected onto the ground plane, the robot is statically stable when the projection of its center of mass lies inside
+it. Everything here works on (N, legs, 3) foot positions, e.g. the feet of joints_from_angles for a whole trajectory,
+without a per frame loop, so candidate gaits can be screened over thousands of frames in a single call."""
+
+
+class SupportPolygon(NamedTuple):
+
+    """ Per frame stability margin of shape (N,), the signed distance of the center of mass from the nearest edge of
+    the support polygon, positive inside. The (N, legs, legs) edges mask holds the counterclockwise hull edges, edges[n,
+    i, j] meaning that the polygon of frame n goes from foot i to foot j, and grounded the (N, legs) contact mask.
+
+    Frames with fewer than two grounded feet have a margin of -inf, frames whose grounded feet are collinear a margin
+    of minus the distance of the center from their line, so neither is ever stable."""
+
+    margin: np.ndarray
+    edges: np.ndarray
+    grounded: np.ndarray
+
+    def stable(self, min_margin: float = 0.0) -> np.ndarray:
+        return self.margin > min_margin
+
+    def hull(self, feet: np.ndarray, frame: int = 0) -> np.ndarray:
+
+        """ Foot indices of the polygon of one frame in counterclockwise order, e.g. for drawing it, given the feet the
+        polygon was computed from."""
+
+        legs = self.edges.shape[-1]
+        corners = np.flatnonzero(self.edges.reshape(-1, legs, legs)[frame].any(axis=-1))
+        points = np.asarray(feet, dtype=float).reshape(-1, legs, 3)[frame, corners, :2]
+        relative = points - points.mean(axis=0)
+
+        return corners[np.argsort(np.arctan2(relative[:, 1], relative[:, 0]))]
+
+
+def body_center(core_vertices: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+
+    """ Center of mass estimate from core vertices of shape (..., 7, 3), e.g. Core.positions or a stack of them over N
+    frames. The estimate is the, optionally weighted, mean of the six outline vertices, i.e. a body of uniform density
+    without the mass of the legs."""
+
+    outline = np.asarray(core_vertices, dtype=float)[..., 1:, :]
+
+    if weights is None:
+        return outline.mean(axis=-2)
+
+    weights = np.asarray(weights, dtype=float)
+
+    return np.sum(outline * weights[..., np.newaxis], axis=-2) / np.sum(weights, axis=-1)[..., np.newaxis]
+
+
+def ground_contacts(feet: np.ndarray, tolerance: float = 0.5, ground: Optional[float] = None) -> np.ndarray:
+
+    """ (N, legs) mask of the feet within tolerance above the ground height, by default the lowest foot of every
+    frame."""
+
+    height = np.asarray(feet, dtype=float)[..., 2]
+    level = height.min(axis=-1, keepdims=True) if ground is None else ground
+
+    return height <= level + tolerance
+
+
+@utils.profiled
+def support_polygon(feet: np.ndarray, center: np.ndarray, grounded: Optional[np.ndarray] = None,
+                    tolerance: float = 0.5) -> SupportPolygon:
+
+    """ Support polygon and stability margin of (N, legs, 3) foot positions, or a single (legs, 3) frame, with the
+    (N, 3) or (3,) center of mass, in the same world frame. Without a grounded mask the contacts are found by
+    ground_contacts with the given tolerance.
+
+    An ordered pair of grounded feet is a counterclockwise hull edge when no other grounded foot lies to its right,
+    which is decided for all pairs of all frames in one broadcast. For a convex polygon the signed distance of a point
+    from it is the smallest signed distance from the lines of its edges, for a center outside the polygon the margin is
+    the distance from the most violated edge line."""
+
+    feet = np.asarray(feet, dtype=float)
+    center = np.asarray(center, dtype=float)
+
+    if grounded is None:
+        grounded = ground_contacts(feet, tolerance)
+
+    grounded = np.asarray(grounded, dtype=bool)
+    legs = feet.shape[-2]
+
+    points = feet[..., :2]
+    # spans[..., i, j] is the vector from foot i to foot j in the ground plane.
+    spans = points[..., np.newaxis, :, :] - points[..., :, np.newaxis, :]
+    lengths = np.linalg.norm(spans, axis=-1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        directions = spans / lengths[..., np.newaxis]
+
+    # sides[..., i, j, k], signed distance of foot k from the line of the edge i -> j, positive to the left.
+    sides = (directions[..., :, :, np.newaxis, 0] * spans[..., :, np.newaxis, :, 1] -
+             directions[..., :, :, np.newaxis, 1] * spans[..., :, np.newaxis, :, 0])
+
+    others = grounded[..., np.newaxis, np.newaxis, :] & ~np.eye(legs, dtype=bool)[:, np.newaxis, :] & \
+        ~np.eye(legs, dtype=bool)[np.newaxis, :, :]
+    left = np.all((sides >= -1e-9) | ~others, axis=-1)
+
+    edges = left & grounded[..., :, np.newaxis] & grounded[..., np.newaxis, :] & (lengths > 0)
+
+    offset = center[..., np.newaxis, np.newaxis, :2] - points[..., :, np.newaxis, :]
+    distance = directions[..., 0] * offset[..., 1] - directions[..., 1] * offset[..., 0]
+
+    margin = np.min(np.where(edges, distance, np.inf), axis=(-2, -1))
+    margin = np.where(np.isinf(margin), -np.inf, margin)
+
+    return SupportPolygon(margin, edges, grounded)
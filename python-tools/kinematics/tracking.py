@@ -0,0 +1,107 @@
+import numpy as np
+from typing import Optional
+from .inverse_kinematics import HexapodKinematics, IKSolution, WarmStartSolver, solve_leg_angles
+import utils
+
+
+"""Incremental inverse kinematics for streams of small offset deltas, e.g. from a joystick or an odometry filter. The
+state is the displacement of every foot target from the default one, a compact (legs, 3) array accumulated with Kahan
+compensation, so millions of deltas add up to the same targets as their exact sum instead of drifting."""
+
+
+class OffsetTracker:
+
+    """ Accumulates body (foot fixed) or foot deltas of shape (3,), (legs, 3) or a (N, 1, 3) / (N, legs, 3) sequence,
+    and solves the resulting targets of all legs in one batch. With a WarmStartSolver given, the solutions keep the
+    branch of the previous frame and respect its joint limits, otherwise the knee up branch is used.
+
+    reanchor sets the state to an exact absolute offset, the default pose when called without one, snapshot and restore
+    checkpoint the whole state including the warm start angles of the solver."""
+
+    __slots__ = {"kinematics",
+                 "solver",
+                 "_base",
+                 "_state",
+                 "updates_since_anchor"}
+
+    def __init__(self, kinematics: HexapodKinematics, solver: Optional[WarmStartSolver] = None):
+
+        self.kinematics = kinematics
+        self.solver = solver
+        # Default foot targets relative to the leg origins.
+        self._base: np.ndarray = kinematics.targets_from_offsets(np.zeros(3), False)
+        # Row 0 holds the displacement of the targets, row 1 the running Kahan compensation.
+        self._state: np.ndarray = np.zeros((2,) + self._base.shape)
+        self.updates_since_anchor: int = 0
+
+    @property
+    def displacement(self) -> np.ndarray:
+
+        """ Current (legs, 3) displacement of the foot targets from the default ones."""
+
+        return self._state[0]
+
+    @property
+    def targets(self) -> np.ndarray:
+        return self._base + self._state[0]
+
+    def _solve(self, targets: np.ndarray) -> IKSolution:
+
+        if self.solver is not None:
+            return self.solver.solve(targets)
+
+        return solve_leg_angles(targets, self.kinematics.femur_lengths, self.kinematics.tibia_lengths)
+
+    @utils.profiled
+    def update(self, deltas: np.ndarray, foot_fixed: bool = True) -> IKSolution:
+
+        """ Apply one delta, or a sequence of N deltas, and solve. Foot fixed deltas move the body, the targets move
+        the opposite way. A sequence returns the (N, legs, 3) angles of every intermediate frame."""
+
+        deltas = np.asarray(deltas, dtype=float) * (-1 if foot_fixed else 1)
+
+        if deltas.ndim < 3:
+            utils.compensated_add(self._state, deltas)
+            self.updates_since_anchor += 1
+
+            return self._solve(self.targets)
+
+        targets = np.empty(deltas.shape[:1] + self._base.shape)
+
+        for frame, delta in enumerate(deltas):
+            utils.compensated_add(self._state, delta)
+            targets[frame] = self._base + self._state[0]
+
+        self.updates_since_anchor += deltas.shape[0]
+
+        return self._solve(targets)
+
+    def reanchor(self, offsets: Optional[np.ndarray] = None, foot_fixed: bool = True):
+
+        """ Replace the accumulated state by an absolute offset, (3,) or (legs, 3), relative to the default pose. Call
+        it periodically with an absolute estimate, if one is available, to bound errors of the deltas themselves."""
+
+        self._state[0] = 0.0 if offsets is None else (-1 if foot_fixed else 1) * np.asarray(offsets, dtype=float)
+        self._state[1] = 0.0
+        self.updates_since_anchor = 0
+
+    def snapshot(self) -> np.ndarray:
+
+        """ Copy of the state, (2, legs, 3), or (3, legs, 3) with the warm start angles when there is a solver."""
+
+        if self.solver is None:
+            return self._state.copy()
+
+        return np.concatenate((self._state, self.solver.previous[np.newaxis]))
+
+    def restore(self, snapshot: np.ndarray):
+
+        snapshot = np.asarray(snapshot, dtype=float)
+
+        if snapshot.shape[1:] != self._base.shape or snapshot.shape[0] != (2 if self.solver is None else 3):
+            raise ValueError(f"Snapshot of shape {snapshot.shape} does not match the tracker.")
+
+        self._state[:] = snapshot[:2]
+
+        if self.solver is not None:
+            self.solver.reset(snapshot[2])
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import numpy as np
+from typing import Dict, Optional, Tuple
+from .inverse_kinematics import HexapodKinematics, JointLimits, solve_leg_candidates
+import utils
+
+
+"""Precomputed reachability of the legs. The workspace of a leg geometry is sampled once on a voxel grid, taking the
+joint limits into account, and stored on disk, so feasibility of a foot target, a body offset or a whole trajectory is
+answered by indexing instead of solving the inverse kinematics."""
+
+
+FORMAT_VERSION = 2
+
+
+class LegWorkspace:
+
+    """ Boolean voxel grid over the cube of half size femur + tibia around the leg origin, in the mount frame of the leg
+    (x along the mounting direction, z up). A voxel is feasible when the target at its center is reachable by any of the
+    analytic solutions with the joints inside their limits, so answers near the workspace boundary are only accurate to
+    about one voxel."""
+
+    __slots__ = {"femur",
+                 "tibia",
+                 "limits",
+                 "voxel",
+                 "lower",
+                 "grid"}
+
+    def __init__(self, femur: float, tibia: float, limits: JointLimits, voxel: float, grid: np.ndarray):
+
+        self.femur = float(femur)
+        self.tibia = float(tibia)
+        self.limits = limits
+        self.voxel = float(voxel)
+        self.lower = np.full(3, -(self.femur + self.tibia))
+        self.grid = grid
+
+    @staticmethod
+    def key(femur: float, tibia: float, limits: JointLimits, voxel: float) -> str:
+
+        """ Hash of everything the grid depends on, used as the name of the cache file."""
+
+        parameters = np.array([FORMAT_VERSION, femur, tibia, *limits.coxa, *limits.femur, *limits.tibia, voxel])
+
+        return hashlib.sha1(parameters.astype("<f8").tobytes()).hexdigest()
+
+    @classmethod
+    def compute(cls, femur: float, tibia: float, limits: JointLimits = JointLimits(),
+                voxel: float = 1.0) -> "LegWorkspace":
+
+        reach = femur + tibia
+        size = int(np.ceil(2 * reach / voxel))
+        centers = -reach + (np.arange(size) + 0.5) * voxel
+        grid = np.empty((size, size, size), dtype=bool)
+
+        y, z = np.meshgrid(centers, centers, indexing="ij")
+
+        # One x slab at a time keeps the temporaries of the solver small.
+        for index, x in enumerate(centers):
+            targets = np.stack((np.full_like(y, x), y, z), axis=-1)
+            candidates, _ = solve_leg_candidates(targets, femur, tibia)
+            grid[index] = limits.within(candidates).any(axis=-1)
+
+        return cls(femur, tibia, limits, voxel, grid)
+
+    @classmethod
+    def load_or_compute(cls, femur: float, tibia: float, limits: JointLimits = JointLimits(), voxel: float = 1.0,
+                        cache_dir: Optional[str] = None) -> "LegWorkspace":
+
+        """ Load the grid of the geometry from the cache directory, computing and storing it on a miss."""
+
+        directory = cache_dir if cache_dir is not None else utils.cache_directory("workspace")
+        path = os.path.join(directory, f"{cls.key(femur, tibia, limits, voxel)}.npz")
+
+        if os.path.exists(path):
+            with np.load(path) as data:
+                shape = tuple(data["shape"])
+                grid = np.unpackbits(data["bits"], count=int(np.prod(shape))).astype(bool).reshape(shape)
+
+            return cls(femur, tibia, limits, voxel, grid)
+
+        workspace = cls.compute(femur, tibia, limits, voxel)
+
+        utils.save_arrays(path, compressed=True, bits=np.packbits(workspace.grid), shape=np.array(workspace.grid.shape))
+
+        return workspace
+
+    @property
+    def volume(self) -> float:
+        return float(self.grid.sum()) * self.voxel ** 3
+
+    def contains(self, target: np.ndarray) -> bool:
+
+        """ Feasibility of a single (3,) target in the mount frame, relative to the leg origin. Non finite targets,
+        e.g. NaN ones of failed solves, are never feasible."""
+
+        scaled = (np.asarray(target, dtype=float) - self.lower) / self.voxel
+
+        if not np.isfinite(scaled).all():
+            return False
+
+        index = np.floor(scaled).astype(np.intp)
+
+        if np.any(index < 0) or np.any(index >= self.grid.shape[0]):
+            return False
+
+        return bool(self.grid[index[0], index[1], index[2]])
+
+    def contains_many(self, targets: np.ndarray) -> np.ndarray:
+
+        """ Feasibility mask of shape (...) for targets of shape (..., 3), see contains."""
+
+        size = self.grid.shape[0]
+        scaled = (np.asarray(targets, dtype=float) - self.lower) / self.voxel
+        inside = ((scaled >= 0) & (scaled < size)).all(axis=-1)
+
+        # Truncation equals flooring inside the grid, outside targets are masked after the lookup. Non finite targets
+        # are outside and zeroed before the cast, which is undefined for them.
+        index = np.where(inside[..., np.newaxis], scaled, 0).astype(np.intp)
+        np.clip(index, 0, size - 1, out=index)
+        flat = (index[..., 0] * size + index[..., 1]) * size + index[..., 2]
+
+        return inside & self.grid.ravel()[flat]
+
+
+class Workspace:
+
+    """ Reachability of all legs of a HexapodKinematics model. Legs with equal lengths share one LegWorkspace, targets
+    are turned into the mount frame of their leg before the lookup. The mounting angles are taken from the default
+    position of the model."""
+
+    __slots__ = {"kinematics",
+                 "legs",
+                 "_cos",
+                 "_sin"}
+
+    def __init__(self, kinematics: HexapodKinematics, limits: JointLimits = JointLimits(), voxel: float = 1.0,
+                 cache_dir: Optional[str] = None):
+
+        self.kinematics = kinematics
+
+        shared: Dict[Tuple[float, float], LegWorkspace] = {}
+        self.legs = []
+
+        for femur, tibia in zip(kinematics.femur_lengths, kinematics.tibia_lengths):
+            if (femur, tibia) not in shared:
+                shared[(femur, tibia)] = LegWorkspace.load_or_compute(femur, tibia, limits, voxel, cache_dir)
+
+            self.legs.append(shared[(femur, tibia)])
+
+        self._cos = np.cos(kinematics.mount_angles)
+        self._sin = np.sin(kinematics.mount_angles)
+
+    def feasible_targets(self, targets: np.ndarray) -> np.ndarray:
+
+        """ Mask of shape (..., legs) for targets relative to the leg origins of shape (..., legs, 3)."""
+
+        targets = np.asarray(targets, dtype=float)
+        x = targets[..., 0]
+        y = targets[..., 1]
+
+        # Rotation by -mount about z, written out, stacks of 3x3 matrix products are far slower.
+        local = np.stack((x * self._cos + y * self._sin, y * self._cos - x * self._sin, targets[..., 2]), axis=-1)
+
+        if all(leg is self.legs[0] for leg in self.legs):
+            return self.legs[0].contains_many(local)
+
+        return np.stack([leg.contains_many(local[..., index, :]) for index, leg in enumerate(self.legs)], axis=-1)
+
+    def feasible_offsets(self, offsets: np.ndarray, foot_fixed: bool = False, per_leg: bool = False) -> np.ndarray:
+
+        """ Feasibility of body offsets of shape (..., 3), e.g. a (N, 3) trajectory, without solving them, with the
+        offset modes of HexapodKinematics.angles_from_rel_position. Returns a (...) mask of offsets feasible for every
+        leg, or the (..., legs) mask when per_leg is set."""
+
+        offsets = np.asarray(offsets, dtype=float)
+        feasible = self.feasible_targets(self.kinematics.targets_from_offsets(offsets[..., np.newaxis, :], foot_fixed))
+
+        return feasible if per_leg else feasible.all(axis=-1)
+
+    def feasible_poses(self, poses: np.ndarray, per_leg: bool = False) -> np.ndarray:
+
+        """ Feasibility of (..., 6) body poses with the feet fixed, see HexapodKinematics.targets_from_poses."""
+
+        feasible = self.feasible_targets(self.kinematics.targets_from_poses(poses))
+
+        return feasible if per_leg else feasible.all(axis=-1)
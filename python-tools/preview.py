@@ -1,6 +1,8 @@
+import os
+import sys
 import matplotlib.pyplot as plt
 from animators import *
-from kinematics import Hexapod, Core, Leg
+from kinematics import RobotConfig
 
 if __name__ == '__main__':
 
@@ -9,17 +11,8 @@ if __name__ == '__main__':
     fig = plt.figure(figsize=(10, 12))
     ax = fig.add_subplot(111, projection="3d")
 
-    femur = 20
-    tibia = 40
-
-    body = Core(ax, 20, 20, 15)
-    bot = Hexapod(body)
-    bot.add_leg(femur, tibia)
-    bot.add_leg(femur, tibia)
-    bot.add_leg(femur, tibia)
-    bot.add_leg(femur, tibia)
-    bot.add_leg(femur, tibia)
-    bot.add_leg(femur, tibia)
+    # Robot geometry from the config given on the command line, the default robot otherwise.
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "configs", "hexapod.json")
+    bot = RobotConfig.load(path).compile().build_robot(ax)
 
     InverseKinematicsFixedLegs(ax, bot)
-
@@ -0,0 +1,26 @@
+import os
+import sys
+import pytest
+
+# The packages are imported as top level modules from the python-tools directory, as in the scripts.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kinematics as ik  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path, monkeypatch):
+
+    """ Keep the disk caches of the tests out of the user cache directory."""
+
+    monkeypatch.setenv("HEXAPOD_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def robot() -> ik.Hexapod:
+    return ik.RobotConfig.default().compile().build_robot()
+
+
+@pytest.fixture
+def model(robot) -> ik.HexapodKinematics:
+    return ik.HexapodKinematics.from_hexapod(robot)
@@ -0,0 +1,85 @@
+import json
+import os
+import numpy as np
+import utils
+import kinematics as ik
+from kinematics import CompiledGeometry, RobotConfig
+from kinematics import config as config_module
+
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), "configs", "hexapod.json")
+
+
+def test_shipped_config_is_the_default_one():
+
+    with open(CONFIG) as file:
+        data = json.load(file)
+
+    assert data == RobotConfig.default().to_dict()
+    assert data["limits"]["femur"] == [-120, 120]
+    assert RobotConfig.load(CONFIG).key() == RobotConfig.default().key()
+
+
+def test_save_load_round_trip(tmp_path):
+
+    config = RobotConfig.default(femur=18.5, tibia=41.25)
+    path = str(tmp_path / "robot.json")
+    config.save(path)
+    loaded = RobotConfig.load(path)
+
+    assert loaded.key() == config.key()
+    assert loaded.to_dict() == config.to_dict()
+    np.testing.assert_allclose(loaded.limits, config.limits, rtol=1e-12)
+
+
+def test_compiled_geometry_is_cached_on_disk(monkeypatch):
+
+    config = RobotConfig.default(femur=21)
+    computed = config.compile()
+    path = os.path.join(utils.cache_directory("geometry"), f"{config.key()}.npz")
+
+    assert os.path.exists(path)
+    assert not [name for name in os.listdir(os.path.dirname(path)) if ".tmp" in name]
+
+    assert config.compile() is computed
+
+    # A new process only finds the file.
+    monkeypatch.setattr(config_module, "_compiled", {})
+    monkeypatch.setattr(CompiledGeometry, "compute", None)
+    loaded = config.compile()
+
+    assert loaded is not computed
+    for name in CompiledGeometry._FIELDS:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(computed, name))
+
+
+def test_mount_transforms_map_the_leg_frames_to_the_body():
+
+    geometry = RobotConfig.default().compile()
+    feet = np.concatenate((geometry.leg_joints[:, -1], np.ones((geometry.legs, 1))), axis=-1)
+    local = np.einsum("lij,lj->li", np.linalg.inv(geometry.mount_transforms), feet)
+
+    assert geometry.mount_transforms.shape == (geometry.legs, 4, 4)
+    np.testing.assert_allclose(geometry.mount_transforms[:, :3, 3], geometry.leg_joints[:, 0])
+    # Every default foot lies straight ahead of its leg origin, in the x z plane of the leg frame.
+    np.testing.assert_allclose(local[:, 1], 0, atol=1e-9)
+    assert np.all(local[:, 0] > 0)
+
+
+def test_limits_of_the_json_reach_the_solver_and_the_workspace():
+
+    data = RobotConfig.default().to_dict()
+    data["limits"]["coxa"] = [-10, 10]
+    narrow = RobotConfig.from_dict(data).compile()
+    wide = RobotConfig.default().compile()
+
+    # The default feet swung 20 degrees about their leg origins.
+    feet = wide.leg_joints[:, -1] - wide.leg_joints[:, 0]
+    turn = ik.rotation_from_euler(np.radians([0, 0, 20]))
+    targets = feet @ turn.T
+
+    assert narrow.limits.coxa == tuple(np.radians([-10, 10]))
+    assert wide.warm_start_solver().solve(targets).reachable.all()
+    assert not narrow.warm_start_solver().solve(targets).reachable.any()
+    assert wide.workspace(voxel=2.0).feasible_targets(targets).all()
+    assert not narrow.workspace(voxel=2.0).feasible_targets(targets).any()
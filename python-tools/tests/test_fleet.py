@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+from kinematics import FleetSimulator, design_grid
+
+
+def test_workers_match_the_calling_process(monkeypatch):
+
+    created = []
+
+    class RecordingMemory(shared_memory.SharedMemory):
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self.name)
+
+    monkeypatch.setattr(shared_memory, "SharedMemory", RecordingMemory)
+
+    designs = design_grid([20], [20], [15], [18, 22], [35, 45])
+    times = np.linspace(0, 1, 12)
+    trajectory = np.stack((7 * np.cos(2 * np.pi * times), np.zeros_like(times), 7 * np.sin(2 * np.pi * times)), -1)
+
+    local = FleetSimulator(designs, workers=1).run(trajectory)
+    pooled = FleetSimulator(designs, workers=2, chunk_size=1).run(trajectory)
+
+    assert pooled.angles.shape == (4, 12, 6, 3)
+    np.testing.assert_array_equal(pooled.angles, local.angles)
+    np.testing.assert_array_equal(pooled.joints, local.joints)
+    np.testing.assert_array_equal(pooled.reachable, local.reachable)
+    assert np.all(pooled.seconds > 0)
+
+    # One segment per result array, all of them gone once run returns.
+    assert len(created) == 4
+
+    for name in created:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from kinematics import GaitGenerator, GaitTable, wrap_angles
+from animators.simulators import Animator
+
+
+def test_gait_table_wraps_around_the_cycle(model):
+
+    gait = GaitGenerator("ripple", period=0.5).compile(model)
+
+    assert gait.reachable.all()
+    np.testing.assert_array_equal(gait.frame(gait.frames), gait.frame(0))
+    np.testing.assert_array_equal(gait.frame(-1), gait.angles[-1])
+    np.testing.assert_allclose(gait.angles_at(0.5), gait.angles[0], atol=1e-6)
+    np.testing.assert_allclose(gait.angles_at(np.array([0.1, 0.6, -0.4])), np.stack([gait.angles_at(0.1)] * 3),
+                               atol=1e-6)
+
+    # Between the last frame and the first one of the next cycle.
+    last = (gait.frames - 0.5) / gait.frames * gait.period
+    expected = gait.angles[-1] + wrap_angles(gait.angles[0] - gait.angles[-1].astype(float)) / 2
+    np.testing.assert_allclose(wrap_angles(gait.angles_at(last) - expected), 0, atol=1e-6)
+
+
+def test_gait_table_interpolates_along_the_shorter_arc():
+
+    angles = np.zeros((2, 6, 3))
+    angles[0, :, 0] = np.pi - 0.1
+    angles[1, :, 0] = -np.pi + 0.1
+    gait = GaitTable(angles, np.ones((2, 6), dtype=bool), 1.0)
+
+    # Halfway the coxa points straight back instead of sweeping through 0.
+    halfway = gait.angles_at(0.25)[:, 0]
+    np.testing.assert_allclose(np.abs(halfway), np.pi, atol=1e-6)
+    np.testing.assert_allclose(np.abs(gait.angles_at(0.75)[:, 0]), np.pi, atol=1e-6)
+
+
+def test_oversized_stride_is_unreachable(model):
+
+    gait = GaitGenerator("tripod", step_length=200).compile(model)
+
+    assert not gait.reachable.all()
+    assert np.isnan(gait.angles).any()
+
+    with pytest.raises(ValueError):
+        Animator(None, None, gait)
+
+    clamped = GaitGenerator("tripod", step_length=200).compile(model, clamp=True)
+
+    assert not clamped.reachable.all()
+    assert np.isfinite(clamped.angles).all()
@@ -0,0 +1,88 @@
+import numpy as np
+from kinematics import JointLimits, LegKinematics, OffsetCache, OffsetTracker, WarmStartSolver, round_trip_error, \
+    wrap_angles
+
+
+def test_warm_start_is_continuous_across_pi(model):
+
+    # The coxa of the leg mounted at 180 degrees crosses +-pi when the body sweeps sideways through y = 0.
+    offsets = np.zeros((101, 1, 3))
+    offsets[:, 0, 1] = np.linspace(-2, 2, 101)
+
+    plain = model.angles_from_rel_position(offsets, False).angles
+    assert np.abs(np.diff(plain[:, 3, 0])).max() > np.pi
+
+    solver = WarmStartSolver(model, JointLimits())
+    angles, reachable = solver.angles_from_rel_position(offsets, False)
+
+    assert reachable.all()
+    assert np.abs(np.diff(angles, axis=0)).max() < 0.1
+    np.testing.assert_allclose(wrap_angles(angles - plain), 0, atol=1e-12)
+    np.testing.assert_array_equal(solver.previous, angles[-1])
+
+
+def test_cached_offsets_keep_the_feet_in_place(robot, model):
+
+    cache = OffsetCache(quantum=0.5)
+    feet = robot.leg_joints[:, 2].copy()
+    offsets = cache.quantize(np.array([1.3, -2.2, 0.9]))
+
+    angles, reachable = cache.angles_from_rel_position(model, offsets, True)
+    robot.translate_core(offsets)
+    robot.update_leg_positions(angles)
+
+    assert reachable.all()
+    np.testing.assert_allclose(offsets, [1.5, -2.0, 1.0])
+    np.testing.assert_allclose(robot.leg_joints[:, 2], feet, atol=1e-9)
+    assert cache.angles_from_rel_position(model, np.array([1.4, -2.1, 1.1]), True) is cache.angles_from_rel_position(
+        model, offsets, True)
+
+
+def test_dynamic_offsets_do_not_drift(model):
+
+    leg = LegKinematics(model.femur_lengths[0], model.tibia_lengths[0])
+    leg.set_default_position(model.vertices[0])
+    tracker = OffsetTracker(model)
+    delta = np.array([1e-3, -7e-4, 3e-4])
+
+    for _ in range(20000):
+        angles = leg.angles_from_offset(delta, False, True)
+
+    tracked = tracker.update(np.broadcast_to(delta, (20000, 1, 3)), False).angles[-1]
+    expected = model.angles_from_rel_position(20000 * delta, False).angles
+
+    np.testing.assert_allclose(angles, expected[0], atol=1e-12)
+    np.testing.assert_allclose(tracked, expected, atol=1e-12)
+
+
+def test_batched_ik_fk_round_trip(robot, model):
+
+    offsets = np.random.default_rng(3).uniform(-8, 8, (1000, 1, 3))
+    targets = model.targets_from_offsets(offsets, True)
+    angles, reachable = model.angles_from_rel_position(offsets, True)
+
+    assert reachable.all()
+    assert round_trip_error(targets, angles, model.femur_lengths, model.tibia_lengths).max() < 1e-12
+
+    # The robot, moved along with the body, puts its feet back on the default ones.
+    robot.translate_core(offsets[-1, 0])
+    robot.update_leg_positions(angles[-1])
+    np.testing.assert_allclose(robot.leg_joints[:, 2], model.vertices[:, 2], atol=1e-12)
+
+
+def test_pose_ik_fk_round_trip(model):
+
+    poses = np.random.default_rng(4).uniform(-1, 1, (500, 6)) * [4, 4, 4, 0.15, 0.15, 0.3]
+    targets = model.targets_from_poses(poses)
+    angles, reachable = model.angles_from_pose(poses)
+
+    assert reachable.all()
+    assert round_trip_error(targets, angles, model.femur_lengths, model.tibia_lengths).max() < 1e-12
+
+
+def test_unreachable_targets_are_nan(model):
+
+    angles, reachable = model.angles_from_rel_position(np.array([0.0, 0.0, 100.0]), True)
+
+    assert not reachable.any()
+    assert np.isnan(angles).all()
@@ -0,0 +1,82 @@
+import time
+import numpy as np
+from kinematics import IKSolution
+from control import ControlLoop, FixedRateScheduler
+
+
+class _Clock:
+
+    """ Manual clock, time only moves when the test advances it."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_scheduler_skips_missed_ticks():
+
+    clock = _Clock()
+    scheduler = FixedRateScheduler(100, clock=clock)
+    scheduler.start()
+
+    assert scheduler.wait() == (0, 0.0, 0.0)
+
+    clock.now += 0.035
+    tick, scheduled, late = scheduler.wait()
+
+    # Ticks 1 and 2 were due before tick 3, which runs half a period late.
+    assert tick == 3 and scheduler.missed == 2
+    assert np.isclose(scheduled, 0.03) and np.isclose(late, 0.005)
+
+    clock.now += 0.01
+    assert scheduler.wait()[0] == 4 and scheduler.missed == 2
+
+
+def test_loop_holds_the_last_reachable_output():
+
+    clock = _Clock()
+    outputs = []
+
+    def solver(offsets):
+        clock.now += 0.01
+        tick = int(round(offsets[0] * 100))
+        return IKSolution(np.full((6, 3), float(tick)), np.full(6, tick not in (2, 3)))
+
+    loop = ControlLoop(lambda t: np.array([t, 0, 0]), solver, outputs.append, rate_hz=100, clock=clock)
+    stats = loop.run(ticks=5)
+
+    assert stats["ticks"] == 5 and stats["unreachable"] == 2 and stats["missed"] == 0
+    assert [angles[0, 0] for angles in outputs] == [0, 1, 4]
+    assert loop.latest[0, 0] == 4
+
+
+def test_slow_ticks_overrun_and_skip():
+
+    clock = _Clock()
+
+    def solver(offsets):
+        clock.now += 0.025
+        return np.zeros((6, 3))
+
+    stats = ControlLoop(lambda t: np.zeros(3), solver, lambda angles: None, rate_hz=100, clock=clock).run(ticks=3)
+
+    assert stats["ticks"] == 3 and stats["overruns"] == 3 and stats["missed"] == 3
+
+
+def test_repeated_runs_start_afresh():
+
+    outputs = []
+    loop = ControlLoop(lambda t: np.zeros(3), lambda offsets: np.zeros((6, 3)), outputs.append, rate_hz=20)
+
+    for _ in range(2):
+        start = time.monotonic()
+        stats = loop.run(ticks=2)
+        elapsed = time.monotonic() - start
+
+        # Two ticks at 20 Hz take one period, the limit is checked without waiting for a third tick.
+        assert stats["ticks"] == 2 and elapsed < 0.09
+
+    assert len(outputs) == 4
+    assert loop.compute.count == 2
@@ -0,0 +1,35 @@
+import numpy as np
+from kinematics import ChainKinematics, JointLimits, wrap_angles
+
+
+def test_dls_matches_the_closed_form(robot, model):
+
+    chain = ChainKinematics.from_hexapod(robot, tolerance=1e-10)
+    offsets = np.random.default_rng(2).uniform(-5, 5, (500, 1, 3))
+
+    np.testing.assert_array_equal(chain.targets_from_offsets(offsets, True), model.targets_from_offsets(offsets, True))
+    np.testing.assert_array_equal(chain.mount_angles, model.mount_angles)
+    np.testing.assert_array_equal(chain.center, model.center)
+
+    angles, reachable = chain.angles_from_rel_position(offsets, True)
+    expected, expected_reachable = model.angles_from_rel_position(offsets, True)
+
+    assert reachable.all() and expected_reachable.all()
+    np.testing.assert_allclose(wrap_angles(angles - expected), 0, atol=1e-8)
+
+
+def test_coxa_bounds_are_relative_to_the_mount(robot):
+
+    limits = JointLimits()
+    lower = np.array([limits.coxa[0], limits.femur[0], limits.tibia[0]])
+    upper = np.array([limits.coxa[1], limits.femur[1], limits.tibia[1]])
+    chain = ChainKinematics.from_hexapod(robot, lower=lower, upper=upper)
+
+    # Sideways through y = 0, where the coxa of the leg mounted at 180 degrees crosses +-pi.
+    offsets = np.zeros((41, 1, 3))
+    offsets[:, 0, 1] = np.linspace(-4, 4, 41)
+    angles, reachable = chain.angles_from_rel_position(offsets, True)
+
+    assert reachable.all()
+    assert limits.within(np.concatenate((wrap_angles(angles[..., :1] - chain.mount_angles[:, np.newaxis]),
+                                         angles[..., 1:]), axis=-1)).all()
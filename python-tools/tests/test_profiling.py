@@ -0,0 +1,65 @@
+import math
+import pytest
+from utils import profiling, profiled
+from utils.profiling import LatencyHistogram
+
+
+def test_percentiles_within_bucket_error():
+
+    histogram = LatencyHistogram()
+
+    for sample in range(1, 1001):
+        histogram.record(sample * 1e-6)
+
+    assert histogram.percentile(50) == pytest.approx(500e-6, rel=0.04)
+    assert histogram.percentile(99) == pytest.approx(990e-6, rel=0.04)
+    assert histogram.percentile(100) == pytest.approx(1e-3)
+
+
+def test_zero_samples_rank_below_every_other_one():
+
+    histogram = LatencyHistogram()
+
+    for _ in range(90):
+        histogram.record(0.0)
+
+    for _ in range(10):
+        histogram.record(1e-6)
+
+    assert histogram.percentile(50) == 0.0
+    assert histogram.percentile(90) == 0.0
+    assert histogram.percentile(99) == pytest.approx(1e-6, rel=0.04)
+    assert histogram.summary()["max"] == 1e-6
+
+
+def test_merge_keeps_the_underflow_bucket():
+
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.record(0.0)
+    second.record(2e-3)
+    second.record(5e-324)
+    first.merge(second)
+
+    assert first.count == 3 and first.min == 0.0
+    assert first.percentile(60) == 0.0
+    assert first.percentile(100) == pytest.approx(2e-3, rel=0.04)
+
+
+def test_profiled_records_only_while_enabled():
+
+    @profiled(name="test.square")
+    def square(value):
+        return value * value
+
+    profiling.reset()
+    square(2)
+    assert "test.square" not in profiling.snapshot()
+
+    profiling.enable()
+    try:
+        assert square(3) == 9
+    finally:
+        profiling.disable()
+
+    summary = profiling.snapshot()["test.square"]
+    assert summary["calls"] == 1 and not math.isnan(summary["p50"])
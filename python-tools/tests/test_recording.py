@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from kinematics import joints_from_angles
+from control import TrajectoryReader, TrajectoryRecorder
+
+
+def _frames(model, robot, count: int, rate: float):
+
+    times = np.arange(count) / rate
+    offsets = np.stack([7 * np.cos(times), np.zeros_like(times), 7 * np.sin(times)], axis=-1)
+    angles, reachable = model.angles_from_rel_position(offsets[:, np.newaxis], True)
+    joints = joints_from_angles(robot.core_vertices[1:] + offsets[:, np.newaxis], angles, model.femur_lengths,
+                                model.tibia_lengths)
+
+    return times, offsets, angles, joints, reachable
+
+
+def test_recorder_round_trip(tmp_path, model, robot):
+
+    path = str(tmp_path / "session.hexrec")
+    times, offsets, angles, joints, reachable = _frames(model, robot, 1000, 200)
+
+    # Chunks smaller than the batches, and single frames, to cross the growth of the file.
+    with TrajectoryRecorder(path, 200, chunk_records=64) as recorder:
+        recorder.append(times[:300], offsets[:300], angles[:300], joints[:300], reachable[:300])
+
+        for frame in range(300, 310):
+            recorder.append(times[frame], offsets[frame], angles[frame], joints[frame], reachable[frame])
+
+        recorder.append(times[310:], offsets[310:], angles[310:], joints[310:], reachable[310:])
+
+    reader = TrajectoryReader(path)
+
+    assert len(reader) == 1000 and reader.rate == 200
+    np.testing.assert_array_equal(reader.time, times)
+    # Poses are stored in single precision.
+    np.testing.assert_array_equal(reader.offsets, offsets.astype(np.float32))
+    np.testing.assert_array_equal(reader.angles, angles.astype(np.float32))
+    np.testing.assert_array_equal(reader.joints, joints.astype(np.float32))
+    np.testing.assert_array_equal(reader.reachable, reachable)
+    np.testing.assert_array_equal(reader.between(1, 2)["time"], times[200:400])
+
+
+def test_reader_follows_a_live_recording(tmp_path, model, robot):
+
+    path = str(tmp_path / "live.hexrec")
+    frames = _frames(model, robot, 100, 100)
+
+    with TrajectoryRecorder(path, 100) as recorder:
+        recorder.append(*(field[:40] for field in frames))
+        recorder.flush()
+        reader = TrajectoryReader(path)
+        assert len(reader) == 40
+
+        recorder.append(*(field[40:] for field in frames))
+        recorder.flush()
+        reader.refresh()
+
+    np.testing.assert_array_equal(reader.angles, frames[2].astype(np.float32))
+
+
+def test_reader_rejects_other_files(tmp_path):
+
+    path = tmp_path / "other.bin"
+    path.write_bytes(bytes(128))
+
+    with pytest.raises(ValueError):
+        TrajectoryReader(str(path))
@@ -0,0 +1,70 @@
+import numpy as np
+from matplotlib.widgets import Slider
+from animators import HeadlessRenderer
+from kinematics import GaitGenerator, RobotConfig
+
+
+def _slider_preview(blit_sliders: bool):
+
+    renderer = HeadlessRenderer()
+    geometry = RobotConfig.default().compile()
+    robot = geometry.build_robot(renderer.ax)
+    model = geometry.kinematics()
+    slider = Slider(renderer.figure.add_axes([0.25, 0.02, 0.65, 0.03]), "X", -10, 10, valinit=0)
+    full_draws = []
+
+    if blit_sliders:
+        robot.add_sliders(slider)
+
+    def update(value):
+        offsets = np.array([value, 0, 0])
+        robot.translate_core(offsets)
+        robot.update_leg_positions(model.angles_from_rel_position(offsets, True).angles)
+        robot.draw()
+
+    slider.on_changed(update)
+    robot.draw()
+    renderer.figure.canvas.draw()
+    renderer.figure.canvas.mpl_connect("draw_event", full_draws.append)
+
+    return renderer, slider, full_draws
+
+
+def _pixels(renderer) -> np.ndarray:
+    return np.asarray(renderer.figure.canvas.buffer_rgba()).copy()
+
+
+def test_blitted_sliders_match_a_full_redraw():
+
+    blitted, blitted_slider, blitted_draws = _slider_preview(True)
+    full, full_slider, full_draws = _slider_preview(False)
+    before = _pixels(blitted)
+
+    blitted_slider.set_val(5)
+    full_slider.set_val(5)
+
+    assert not blitted_slider.drawon
+    assert not blitted_draws and full_draws
+
+    after = _pixels(blitted)
+    slider_rows = slice(480 - int(0.05 * 480), 480)
+    assert (after[slider_rows] != before[slider_rows]).any()
+
+    # Only antialiased edges may blend in a different order.
+    assert (after != _pixels(full)).any(axis=-1).mean() < 1e-3
+
+
+def test_headless_render_array():
+
+    renderer = HeadlessRenderer(width=320, height=240)
+    geometry = RobotConfig.default().compile()
+    robot = geometry.build_robot(renderer.ax)
+    gait = GaitGenerator("tripod", frames=8).compile(geometry.kinematics())
+
+    video = renderer.render_array(robot, gait.angles, frames=10)
+
+    assert renderer.size == (320, 240)
+    assert video.shape == (10, 240, 320, 3) and video.dtype == np.uint8
+    # The legs move between frames, the cycle repeats after the eight frames of the gait.
+    assert (video[1] != video[0]).any()
+    np.testing.assert_array_equal(video[8], video[0])
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+
+def test_state_round_trip(robot, model):
+
+    state = robot.get_state()
+    joints = robot.leg_joints
+    angles = robot.leg_angles
+    default_angles = angles.copy()
+    pose = np.array([2.0, -1.0, 3.0, 0.1, -0.05, 0.2])
+
+    robot.set_body_pose(pose)
+    robot.update_leg_positions(model.angles_from_pose(pose).angles)
+    moved = robot.get_state()
+    moved_angles = angles.copy()
+
+    assert not np.allclose(moved_angles, default_angles)
+
+    robot.set_state(state)
+
+    # Restored in place, the views handed out before stay valid.
+    assert robot.leg_joints is joints and robot.leg_angles is angles
+    np.testing.assert_array_equal(robot.get_state(), state)
+    np.testing.assert_array_equal(robot.leg_angles, default_angles)
+
+    robot.set_state(moved)
+    np.testing.assert_array_equal(robot.leg_angles, moved_angles)
+
+
+def test_set_state_rejects_other_shapes(robot):
+
+    with pytest.raises(ValueError):
+        robot.set_state(robot.get_state()[:-18])
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import tempfile
+import numpy as np
+import pytest
+from control import CommandClient, RESPONSE_DTYPE, loopback
+
+
+def test_loopback_matches_direct_solves(model):
+
+    rng = np.random.default_rng(5)
+    offsets = [rng.uniform(-10, 10, (size, 3)) for size in (1, 7, 64, 200)]
+    poses = rng.uniform(-1, 1, (50, 6)) * [4, 4, 4, 0.2, 0.2, 0.3]
+
+    async def main():
+        async with loopback(model, clients=4) as (server, clients):
+            # Concurrent clients, so their requests share batches on the server. Batching may only change the last bit.
+            answers = await asyncio.gather(*(client.offsets(batch) for client, batch in zip(clients, offsets)))
+            feet = await clients[0].offsets(offsets[0][0], foot_fixed=False)
+            posed = await clients[1].poses(poses)
+
+            return answers, feet, posed, server.stats()
+
+    answers, feet, posed, stats = asyncio.run(main())
+
+    for batch, (angles, reachable) in zip(offsets, answers):
+        expected = model.angles_from_rel_position(batch[:, np.newaxis], True)
+
+        np.testing.assert_array_equal(reachable, expected.reachable)
+        np.testing.assert_allclose(angles, expected.angles, rtol=0, atol=1e-12)
+
+    expected = model.angles_from_rel_position(offsets[0][0], False)
+    np.testing.assert_array_equal(feet.reachable, expected.reachable)
+    np.testing.assert_allclose(feet.angles, expected.angles, rtol=0, atol=1e-12)
+
+    expected = model.angles_from_pose(poses)
+    np.testing.assert_array_equal(posed.reachable, expected.reachable)
+    np.testing.assert_allclose(posed.angles, expected.angles, rtol=0, atol=1e-12)
+
+    assert stats["requests"] == sum(batch.shape[0] for batch in offsets) + 1 + poses.shape[0]
+
+
+class _Writer:
+
+    """ Stand in for the transport of a client, the responses are fed to its reader by the test."""
+
+    def write(self, data: bytes):
+        pass
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_waiting_requests_fail_when_the_receiver_ends():
+
+    async def main():
+        reader = asyncio.StreamReader()
+        client = CommandClient(reader, _Writer())
+
+        pending = asyncio.ensure_future(client.offsets(np.zeros((2, 3))))
+        await asyncio.sleep(0)
+
+        # The first answer resolves one request, one for an unknown id is dropped without stopping the receiver.
+        responses = np.zeros(2, dtype=RESPONSE_DTYPE)
+        responses["id"] = [0, 99]
+        reader.feed_data(responses.tobytes())
+        await asyncio.sleep(0)
+
+        assert not pending.done()
+        assert not client._receiver.done()
+
+        reader.feed_eof()
+
+        with pytest.raises(ConnectionError, match="closed by the server"):
+            await asyncio.wait_for(pending, 1)
+
+        with pytest.raises(ConnectionError):
+            await client.offsets(np.zeros(3))
+
+        await client.close()
+
+        # Closing the client fails its waiting requests as well.
+        client = CommandClient(asyncio.StreamReader(), _Writer())
+        pending = asyncio.ensure_future(client.poses(np.zeros(6)))
+        await asyncio.sleep(0)
+        await client.close()
+
+        with pytest.raises(ConnectionError, match="client was closed"):
+            await asyncio.wait_for(pending, 1)
+
+    asyncio.run(main())
+
+
+def test_loopback_removes_its_directory_when_setup_fails(model, tmp_path, monkeypatch):
+
+    async def refuse(address):
+        raise ConnectionRefusedError(address)
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(CommandClient, "connect", refuse)
+
+    async def main():
+        async with loopback(model, clients=2):
+            pass
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(main())
+
+    assert not [name for name in os.listdir(tmp_path) if name != "cache"]
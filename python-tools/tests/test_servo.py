@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pytest
+from kinematics import wrap_angles
+from control import ServoCalibration, ServoStream, decode_frames, encode_frames, PACKET_SIZE
+
+
+def test_encode_decode_round_trip():
+
+    calibration = ServoCalibration(offsets=0.1, scales=np.tile([1.0, -1.0, 1.0], (6, 1)))
+    angles = np.random.default_rng(0).uniform(-2.5, 2.5, (500, 6, 3))
+
+    decoded, sequence = decode_frames(encode_frames(angles, calibration, 65530).tobytes(), calibration)
+
+    np.testing.assert_allclose(decoded, angles, atol=2 * np.pi / 0xFFFF)
+    np.testing.assert_array_equal(sequence, (65530 + np.arange(500)) & 0xFFFF)
+
+
+def test_corrupted_packet_is_rejected():
+
+    data = bytearray(encode_frames(np.zeros((2, 6, 3)), ServoCalibration()).tobytes())
+    data[PACKET_SIZE + 5] ^= 0xFF
+
+    with pytest.raises(ValueError):
+        decode_frames(bytes(data), ServoCalibration())
+
+
+def test_coxa_crossing_pi_keeps_its_position(model):
+
+    # The leg mounted at 180 degrees, calibrated to its mount, flips between +-pi when the feet cross y = 0.
+    calibration = ServoCalibration(offsets=-np.stack((model.mount_angles, np.zeros(6), np.zeros(6)), axis=-1))
+    offsets = np.array([[[0.0, -0.5, 0.0]], [[0.0, 0.5, 0.0]]])
+    angles = model.angles_from_rel_position(offsets, False).angles
+    assert abs(angles[1, 3, 0] - angles[0, 3, 0]) > np.pi
+
+    positions = calibration.quantize(angles).astype(int).reshape(2, 6, 3)
+
+    assert np.abs(np.diff(positions[:, :, 0], axis=0)).max() < 0xFFFF * 0.02
+    decoded = calibration.dequantize(positions.reshape(2, -1))
+    np.testing.assert_allclose(wrap_angles(decoded - angles), 0, atol=1e-4)
+
+
+def test_nan_angles_are_rejected_by_the_encoder():
+
+    angles = np.zeros((6, 3))
+    angles[2] = np.nan
+
+    with pytest.raises(ValueError):
+        encode_frames(angles, ServoCalibration())
+
+
+def test_stream_holds_the_last_valid_command():
+
+    read_fd, write_fd = os.pipe()
+
+    try:
+        stream = ServoStream(write_fd, max_pending_frames=16)
+        angles = np.full((4, 6, 3), 0.5)
+        angles[1:3, 2] = np.nan
+        angles[3] = 0.25
+
+        unknown = np.full((6, 3), np.nan)
+        stream.write(unknown)
+        stream.write(angles)
+
+        decoded, sequence = decode_frames(os.read(read_fd, 1 << 16), ServoCalibration())
+
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+    assert stream.dropped == 1 and stream.held == 2
+    np.testing.assert_array_equal(sequence, np.arange(4))
+    np.testing.assert_allclose(decoded[:3], 0.5, atol=1e-4)
+    np.testing.assert_allclose(decoded[3], 0.25, atol=1e-4)
+
+
+@pytest.mark.parametrize("lower, upper", [(-np.pi / 2, np.pi / 2), (0.0, 2.0), (-np.pi, np.pi)])
+def test_angles_past_either_end_saturate_at_that_end(lower, upper):
+
+    calibration = ServoCalibration(lower=lower, upper=upper)
+    angles = np.zeros((4, 6, 3))
+    angles[0] = lower - 0.05
+    angles[1] = upper + 0.05
+    angles[2] = lower + 0.05
+    angles[3] = upper - 0.05
+
+    positions = calibration.quantize(angles)
+
+    if upper - lower < 2 * np.pi:
+        assert (positions[0] == 0).all() and (positions[1] == 0xFFFF).all()
+
+    else:
+        # A whole turn wraps around instead, lower - 0.05 is upper - 0.05.
+        np.testing.assert_array_equal(positions[0], positions[3])
+
+    np.testing.assert_allclose(calibration.dequantize(positions[2:]), angles[2:], atol=(upper - lower) / 0xFFFF)
@@ -0,0 +1,55 @@
+import numpy as np
+from kinematics import support_polygon
+
+
+def square_stance(lifted: float = 5.0) -> np.ndarray:
+
+    """ Four feet on the corners of a 20 x 20 square and two lifted ones."""
+
+    return np.array([[10, 10, 0], [-10, 10, 0], [-10, -10, 0], [10, -10, 0], [0, 12, lifted], [0, -12, lifted]], float)
+
+
+def test_square_stance_margin():
+
+    feet = square_stance()
+    result = support_polygon(np.stack([feet] * 3), np.array([[0, 0, 8], [3, 1, 8], [15, 0, 8]]))
+
+    np.testing.assert_array_equal(result.grounded[0], [True, True, True, True, False, False])
+    np.testing.assert_allclose(result.margin, [10, 7, -5])
+    np.testing.assert_array_equal(result.stable(), [True, True, False])
+    np.testing.assert_array_equal(result.stable(8), [True, False, False])
+    assert result.edges[0].sum() == 4
+    assert list(result.hull(feet)) == [2, 3, 0, 1]
+
+
+def test_degenerate_contacts_are_unstable():
+
+    feet = square_stance()
+    line = feet.copy()
+    line[:4] = [[-10, 0, 0], [0, 0, 0], [10, 0, 0], [20, 0, 0]]
+    center = np.array([0, 1, 8])
+
+    collinear = support_polygon(line, center)
+    two = support_polygon(feet, center, grounded=np.array([True, False, True, False, False, False]))
+    one = support_polygon(feet, center, grounded=np.array([True, False, False, False, False, False]))
+
+    assert not collinear.stable() and collinear.margin == -1
+    assert not two.stable() and two.margin <= 0
+    assert not one.stable() and one.margin == -np.inf
+
+
+def test_batched_frames_match_single_frames():
+
+    rng = np.random.default_rng(0)
+    feet = rng.uniform(-20, 20, (50, 6, 3))
+    feet[..., 2] = np.where(rng.random((50, 6)) < 0.6, 0, 5)
+    centers = rng.uniform(-5, 5, (50, 3))
+
+    batched = support_polygon(feet, centers)
+
+    for frame in range(feet.shape[0]):
+        single = support_polygon(feet[frame], centers[frame])
+
+        assert single.margin == batched.margin[frame]
+        np.testing.assert_array_equal(single.edges, batched.edges[frame])
+        np.testing.assert_array_equal(single.grounded, batched.grounded[frame])
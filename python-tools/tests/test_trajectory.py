@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+import kinematics as ik
+from control import MotionLimits, RateLimiter, Resampler, TrajectoryFilter, smooth_trajectory
+
+
+def crossing_angles(model: ik.HexapodKinematics, frames: int) -> np.ndarray:
+
+    """ Feet moved along y through the default position, the coxa of the leg mounted at 180 degrees crosses +-pi."""
+
+    offsets = np.zeros((frames, 1, 3))
+    offsets[:, 0, 1] = np.linspace(-1, 1, frames)
+
+    return model.angles_from_rel_position(offsets, False).angles
+
+
+def test_resampler_interpolates_across_pi(model):
+
+    angles = crossing_angles(model, 50)
+    coxa = angles[:, 3, 0]
+    assert np.abs(np.diff(coxa)).max() > np.pi
+
+    resampled = Resampler(30, 200).process(angles)
+
+    assert np.abs(ik.wrap_angles(np.diff(resampled[:, 3, 0]))).max() < 0.01
+
+
+def test_limiter_follows_crossing_the_short_way(model):
+
+    angles = crossing_angles(model, 200)
+    limits = MotionLimits(6.0, 60.0)
+    smoothed = smooth_trajectory(angles, 200, limits)
+
+    steps = np.diff(smoothed[:, 3, 0])
+    assert np.abs(steps).max() <= 6.0 / 200 + 1e-12
+    assert np.abs(ik.wrap_angles(smoothed[-1] - angles[-1])).max() < 1e-3
+
+
+def test_chunked_resampling_matches_one_pass():
+
+    angles = np.random.default_rng(1).uniform(-np.pi, np.pi, (1000, 6, 3))
+    whole = Resampler(30, 200).process(angles)
+
+    resampler = Resampler(30, 200)
+    chunked = np.concatenate([resampler.process(chunk) for chunk in np.array_split(angles, 37)])
+
+    np.testing.assert_array_equal(whole, chunked)
+
+
+def test_step_response_does_not_overshoot():
+
+    rng = np.random.default_rng(0)
+    joints = 200
+    velocity = rng.uniform(0.5, 20, (joints, 1))
+    acceleration = rng.uniform(5, 500, (joints, 1))
+    step = rng.uniform(-3, 3, (joints, 1))
+
+    limiter = RateLimiter(MotionLimits(velocity, acceleration), 200)
+    limiter.reset(np.zeros((joints, 1)))
+    angles = limiter.process(np.broadcast_to(step, (3000, joints, 1)))
+
+    assert (np.abs(angles).max(axis=0) <= np.abs(step) + 1e-12).all()
+    np.testing.assert_allclose(angles[-1], step, atol=1e-12)
+
+    speed = np.diff(angles, axis=0, prepend=0) * 200
+    assert (np.abs(speed) <= velocity + 1e-9).all()
+    assert (np.abs(np.diff(speed, axis=0, prepend=0)) * 200 <= acceleration * (1 + 1e-9)).all()
+
+
+def test_unreachable_frames_hold_the_last_target():
+
+    angles = np.zeros((50, 6, 3))
+    angles[10:] = np.nan
+
+    assert not np.isnan(smooth_trajectory(angles, 200)).any()
+
+
+def test_smoothing_into_a_memory_map_matches_in_memory(tmp_path):
+
+    angles = np.random.default_rng(2).uniform(-1, 1, (1001, 6, 3))
+    frames = TrajectoryFilter(rate=200, rate_in=30).output_frames(angles.shape[0])
+    whole = smooth_trajectory(angles, 200, rate_in=30)
+
+    out = np.memmap(str(tmp_path / "smoothed.f8"), dtype=float, mode="w+", shape=(frames, 6, 3))
+    mapped = smooth_trajectory(angles, 200, rate_in=30, chunk_frames=97, out=out)
+
+    assert mapped is out and whole.shape == out.shape
+    np.testing.assert_array_equal(out, whole)
+
+    with pytest.raises(ValueError):
+        smooth_trajectory(angles, 200, rate_in=30, out=np.empty((frames - 1, 6, 3)))
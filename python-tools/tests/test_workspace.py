@@ -0,0 +1,33 @@
+import warnings
+import numpy as np
+from kinematics import JointLimits, WarmStartSolver, Workspace
+
+
+def test_non_finite_targets_are_infeasible(model):
+
+    workspace = Workspace(model, voxel=2.0)
+    leg = workspace.legs[0]
+    targets = np.array([[30.0, 0.0, -20.0], [np.nan, 0.0, 0.0], [np.inf, 0.0, 0.0], [30.0, -np.inf, np.nan]])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        feasible = leg.contains_many(targets)
+        single = [leg.contains(target) for target in targets]
+
+    np.testing.assert_array_equal(feasible, [True, False, False, False])
+    assert single == feasible.tolist()
+
+
+def test_offsets_match_the_solver(model):
+
+    workspace = Workspace(model, JointLimits(), voxel=1.0)
+    offsets = np.random.default_rng(1).uniform(-30, 30, (2000, 3))
+
+    for foot_fixed in (False, True):
+        solved = WarmStartSolver(model).angles_from_rel_position(offsets[:, np.newaxis], foot_fixed).reachable
+        feasible = workspace.feasible_offsets(offsets, foot_fixed)
+
+        # Answers differ only within about a voxel of the workspace boundary.
+        assert np.mean(feasible == solved.all(axis=-1)) > 0.97
+
+    np.testing.assert_array_equal(workspace.feasible_offsets(offsets), workspace.feasible_offsets(offsets, False))
@@ -1,3 +1,11 @@
 from .utils import *
+from . import profiling
+from .profiling import LatencyHistogram, profiled
 
-__all__ = ["time_it"]
\ No newline at end of file
+__all__ = ["time_it",
+           "cache_directory",
+           "save_arrays",
+           "compensated_add",
+           "profiling",
+           "profiled",
+           "LatencyHistogram"]
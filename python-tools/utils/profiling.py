@@ -0,0 +1,182 @@
+import functools
+import json
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+"""Aggregating profiler for the kinematics and animators hot paths. Profiling is switched on and off at runtime with
+enable and disable. While it is off, a profiled function costs a single flag check on top of the call itself. While it
+is on, every call is recorded into an in-memory latency histogram, nothing is printed."""
+
+
+class LatencyHistogram:
+
+    """ Log bucketed histogram of latencies in seconds. Every power of two is split into _SUB_BUCKETS buckets, which
+    keeps the relative error of the reported percentiles around 3% with a memory footprint independent of the number of
+    recorded samples. Latencies below 2 ** _MIN_EXPONENT seconds, including zero ones of clocks too coarse to resolve a
+    call, share an underflow bucket ranked below every other one."""
+
+    __slots__ = {"_buckets",
+                 "count",
+                 "total",
+                 "min",
+                 "max"}
+
+    _SUB_BUCKETS = 16
+    _MIN_EXPONENT = -40
+    _UNDERFLOW = _MIN_EXPONENT * _SUB_BUCKETS
+
+    def __init__(self):
+        self._buckets: Dict[int, int] = {}
+        self.count: int = 0
+        self.total: float = 0.0
+        self.min: float = math.inf
+        self.max: float = 0.0
+
+    def record(self, latency: float):
+
+        mantissa, exponent = math.frexp(latency)
+
+        if latency > 0 and exponent > self._MIN_EXPONENT:
+            bucket = exponent * self._SUB_BUCKETS + int((2 * mantissa - 1) * self._SUB_BUCKETS)
+        else:
+            bucket = self._UNDERFLOW
+
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+        self.count += 1
+        self.total += latency
+
+        if latency < self.min:
+            self.min = latency
+
+        if latency > self.max:
+            self.max = latency
+
+    def merge(self, other: "LatencyHistogram"):
+
+        for bucket, count in other._buckets.items():
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + count
+
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> float:
+
+        """ Latency below which the given percentage of the samples lies, reported as the center of its bucket."""
+
+        if not self.count:
+            return math.nan
+
+        rank = percent / 100 * self.count
+        seen = 0
+
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+
+            if seen >= rank:
+                if bucket == self._UNDERFLOW:
+                    return self.min
+
+                exponent, sub_bucket = divmod(bucket, self._SUB_BUCKETS)
+                mantissa = (1 + (sub_bucket + 0.5) / self._SUB_BUCKETS) / 2
+                return min(max(math.ldexp(mantissa, exponent), self.min), self.max)
+
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+
+        return {"calls": self.count,
+                "total": self.total,
+                "mean": self.total / self.count if self.count else math.nan,
+                "min": self.min if self.count else math.nan,
+                "p50": self.percentile(50),
+                "p99": self.percentile(99),
+                "max": self.max if self.count else math.nan}
+
+
+_enabled: bool = False
+_lock = threading.Lock()
+_histograms: Dict[str, LatencyHistogram] = {}
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def record(name: str, latency: float):
+
+    """ Add a latency measured by the caller, e.g. a whole frame of a loop, under the given name."""
+
+    if not _enabled:
+        return
+
+    with _lock:
+        histogram = _histograms.get(name)
+
+        if histogram is None:
+            histogram = _histograms[name] = LatencyHistogram()
+
+        histogram.record(latency)
+
+
+def profiled(func: Optional[Callable] = None, *, name: Optional[str] = None):
+
+    """ Decorator recording the latency of every call of func while profiling is enabled. The statistics are reported
+    under the qualified name of the function unless a name is given."""
+
+    if func is None:
+        return functools.partial(profiled, name=name)
+
+    key = name or f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def profiled_wrapper(*args, **kwargs):
+
+        if not _enabled:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+
+        try:
+            return func(*args, **kwargs)
+
+        finally:
+            record(key, time.perf_counter() - start)
+
+    return profiled_wrapper
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+
+    """ Summaries (calls, total, mean, min, p50, p99, max, all times in seconds) of every profiled function."""
+
+    with _lock:
+        return {name: histogram.summary() for name, histogram in _histograms.items()}
+
+
+def export(path: str):
+
+    """ Write the current snapshot to a JSON file."""
+
+    with open(path, "w") as file:
+        json.dump({"timestamp": time.time(), "functions": snapshot()}, file, indent=2)
@@ -1,6 +1,8 @@
 import functools
+import os
 import time
 from typing import Callable
+import numpy as np
 
 
 def time_it(func: Callable):
@@ -16,3 +18,39 @@ def time_it(func: Callable):
         return value
 
     return time_it_wrapper
+
+
+def cache_directory(*parts: str) -> str:
+
+    """ Directory for precomputed data, created when missing. HEXAPOD_CACHE_DIR overrides the default location under
+    the user cache directory."""
+
+    root = os.environ.get("HEXAPOD_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "hexapod-ik")
+
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+
+    return path
+
+
+def save_arrays(path: str, compressed: bool = False, **arrays: np.ndarray):
+
+    """ Store arrays in a .npz file under a temporary name and rename it into place, so concurrent processes sharing a
+    cache directory never read a partial file."""
+
+    temporary = f"{path}.{os.getpid()}.tmp.npz"
+    (np.savez_compressed if compressed else np.savez)(temporary, **arrays)
+    os.replace(temporary, path)
+
+
+def compensated_add(state: np.ndarray, delta: np.ndarray):
+
+    """ Kahan summation step, in place. state[0] holds the running sum and state[1] its compensation, delta broadcasts
+    against either row. Long runs of small deltas add up to their exact sum instead of drifting."""
+
+    total, compensation = state
+    step = delta - compensation
+    result = total + step
+    compensation[...] = (result - total) - step
+    total[...] = result